@@ -0,0 +1,54 @@
+"""
+AdaptivePoller: Determine IOLoop poll intervals for Hexitec ODIN control.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+
+class AdaptivePoller():
+    """
+    Calculate the delay before the next status poll.
+
+    While progress is being made the interval tracks the estimated time to
+    completion, tightening to the minimum as completion approaches. While idle
+    the interval backs off geometrically towards the maximum.
+    """
+
+    def __init__(self, minimum=0.01, maximum=0.5, backoff=2.0, fraction=0.5):
+        """
+        Initialize the AdaptivePoller object.
+
+        :param minimum: shortest interval (seconds)
+        :param maximum: longest interval (seconds)
+        :param backoff: factor interval grows by each idle poll
+        :param fraction: fraction of estimated time remaining to wait
+        """
+        if minimum <= 0 or maximum < minimum:
+            raise ValueError("Invalid poll interval range: %s - %s" % (minimum, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.fraction = fraction
+        self.interval = minimum
+
+    def reset(self):
+        """Restart polling at the minimum interval."""
+        self.interval = self.minimum
+        return self.interval
+
+    def next_interval(self, progressed=False, time_remaining=None):
+        """
+        Return interval until the next poll.
+
+        :param progressed: whether the polled quantity changed since last poll
+        :param time_remaining: estimated seconds until completion, if known
+        """
+        if progressed:
+            if time_remaining is None:
+                interval = self.minimum
+            else:
+                interval = max(time_remaining, 0) * self.fraction
+        else:
+            interval = self.interval * self.backoff
+        self.interval = min(max(interval, self.minimum), self.maximum)
+        return self.interval
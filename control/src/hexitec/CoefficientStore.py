@@ -0,0 +1,137 @@
+"""
+CoefficientStore: Per pixel coefficients (threshold, gradient, intercept) files, converted once into .npy files.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+
+class CoefficientStoreError(Exception):
+    """Simple exception class for CoefficientStore to wrap lower-level exceptions."""
+
+    pass
+
+
+def layout_shape(sensors_layout):
+    """Return (rows, columns) of pixels of sensors_layout, i.e. "2x6"."""
+    try:
+        rows_of_sensors, columns_of_sensors = [int(x) for x in sensors_layout.split("x")]
+    except ValueError:
+        raise CoefficientStoreError("Invalid sensors layout: '%s'" % sensors_layout) from None
+    return rows_of_sensors * 80, columns_of_sensors * 80
+
+
+def default_cache_dir():
+    """Return per user cache directory ($XDG_CACHE_HOME, or ~/.cache) of coefficients."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "hexitec", "coefficients")
+
+
+class CoefficientStore():
+    """
+    Convert whitespace separated coefficients files into memory mapped .npy arrays.
+
+    Each array is keyed by the hash of the file contents (and its data type), so
+    a text file is parsed once no matter how often, or by which process, it is loaded.
+    Within a process, a file whose modification time and size are unchanged
+    is not read again at all. Arrays returned are read only.
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        Initialize the CoefficientStore object.
+
+        :param cache_dir: directory .npy files kept in (default: $HEXITEC_COEFFICIENT_CACHE,
+                          or hexitec/coefficients in the user's cache directory)
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get("HEXITEC_COEFFICIENT_CACHE", default_cache_dir())
+        self.cache_dir = cache_dir
+        self.arrays = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, filename, sensors_layout=None, dtype=np.float32, size=None):
+        """
+        Return filename's coefficients as an array of dtype.
+
+        :param sensors_layout: if given, number of values validated against, and
+                               array shaped (rows, columns) of, the sensors layout
+        :param size: if given, number of values expected (without sensors_layout);
+                     a cached .npy file of any other size is converted again
+        """
+        dtype = np.dtype(dtype)
+        if sensors_layout is not None:
+            rows, columns = layout_shape(sensors_layout)
+            size = rows * columns
+        try:
+            stat = os.stat(filename)
+        except OSError as e:
+            raise CoefficientStoreError("Cannot read coefficients from '%s': %s" % (filename, e)) from None
+        key = (os.path.abspath(filename), dtype.str)
+        cached = self.arrays.get(key)
+        if cached and (cached[0] == stat.st_mtime) and (cached[1] == stat.st_size):
+            self.hits += 1
+            values = cached[2]
+        else:
+            values = self._load_contents(filename, dtype, size)
+            self.arrays[key] = (stat.st_mtime, stat.st_size, values)
+        if sensors_layout is None:
+            return values
+        if values.size != rows * columns:
+            raise CoefficientStoreError("Expected %s values but read %s values from file: %s" %
+                                        (rows * columns, values.size, filename))
+        return values.reshape(rows, columns)
+
+    def _load_contents(self, filename, dtype, size=None):
+        """Load array matching filename's contents from .npy file, converting text file if needed.
+
+        The text is only split into values when converting, so a cached .npy file is
+        checked against its own header (by memory mapping it), dtype and size, if given.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                contents = f.read()
+        except OSError as e:
+            raise CoefficientStoreError("Cannot read coefficients from '%s': %s" % (filename, e)) from None
+        digest = hashlib.sha1(contents).hexdigest()
+        npy_filename = os.path.join(self.cache_dir, "%s_%s.npy" % (digest, dtype.str.lstrip("<>|=")))
+        try:
+            # Memory mapping fails for a .npy file shorter than its header claims
+            values = np.load(npy_filename, mmap_mode='r')
+            if (values.dtype == dtype) and (values.ndim == 1) and (size is None or values.size == size):
+                self.hits += 1
+                return values
+            logging.warning("Ignoring mismatched cached coefficients: %s" % npy_filename)
+        except (OSError, ValueError):
+            pass
+        self.misses += 1
+        try:
+            values = np.array(contents.split(), dtype=np.float64).astype(dtype)
+        except ValueError as e:
+            raise CoefficientStoreError("Invalid coefficient in '%s': %s" % (filename, e)) from None
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            # Write under temporary name, so other processes never see a partial file
+            temporary = "%s.%s.tmp" % (npy_filename, os.getpid())
+            with open(temporary, 'wb') as f:
+                np.save(f, values)
+            os.replace(temporary, npy_filename)
+            return np.load(npy_filename, mmap_mode='r')
+        except OSError as e:
+            logging.warning("Cannot cache coefficients of '%s': %s" % (filename, e))
+            values.flags.writeable = False
+            return values
+
+    def clear(self):
+        """Forget arrays loaded by this process (.npy files are kept)."""
+        self.arrays = {}
+
+
+# Shared by everything loading coefficients within a process
+coefficient_store = CoefficientStore()
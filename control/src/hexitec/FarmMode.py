@@ -0,0 +1,168 @@
+"""
+FarmMode: Farm Mode settings, look up tables, and the frame receiver each frame is sent to.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import json
+from json.decoder import JSONDecodeError
+
+
+class FarmModeError(Exception):
+    """Simple exception class for FarmMode to wrap lower-level exceptions."""
+
+    pass
+
+
+def load_farm_mode_targets(filename):
+    """Load Farm Mode targets from file, as HexitecFem's load_farm_mode_json_parameters.
+
+    Returns dictionary of the lists of farm_target_ip, farm_target_mac and farm_target_port,
+    alongside each farm server's IP and Mac address.
+    """
+    try:
+        with open(filename, "r") as f:
+            config = json.load(f)
+        targets = {
+            "farm_target_ip": config.get("farm_target_ip").split(" "),
+            "farm_target_mac": config.get("farm_target_mac").split(" "),
+            "farm_target_port": [int(port) for port in config.get("farm_target_port").split(" ")]
+        }
+        for key in ["farm_server_1_ip", "farm_server_1_mac", "farm_server_2_ip", "farm_server_2_mac"]:
+            targets[key] = config.get(key)
+    except (FileNotFoundError, TypeError) as e:
+        raise FarmModeError("Farm Mode: Config File: {}".format(e)) from None
+    except AttributeError:
+        raise FarmModeError("Farm Mode: Config File lacks farm_target_ip/mac/port") from None
+    except JSONDecodeError as e:
+        raise FarmModeError("Farm Mode: Bad json: {}".format(e)) from None
+    except ValueError as e:
+        raise FarmModeError("Farm Mode: Bad farm_target_port: {}".format(e)) from None
+    if not (len(targets["farm_target_ip"]) == len(targets["farm_target_mac"]) == len(targets["farm_target_port"])):
+        raise FarmModeError("Farm Mode: farm_target_ip, farm_target_mac, farm_target_port lengths differ")
+    return targets
+
+
+def epac_triggering_farm_mode_config(ip_addresses, macs, ports, frames_per_trigger):
+    """Determine Farm Mode configuration, based on Odin instances and frames per trigger.
+
+    Round-robin, N frames (per trigger) to each Odin instance."""
+    lut_entries = frames_per_trigger * (len(ip_addresses) // 2)
+    ip_lut1 = []
+    ip_lut2 = []
+    mac_lut1 = []
+    mac_lut2 = []
+    port_lut1 = []
+    port_lut2 = []
+    frame_count = 0
+    current_instance = 0
+    index = 0
+    offset = 0
+    while index < lut_entries:
+        if (offset % 2) == 0:
+            if (index % 2) == 0:  # Even
+                ip_lut1.append(ip_addresses[current_instance])
+                mac_lut1.append(macs[current_instance])
+                port_lut1.append(ports[current_instance])
+            else:
+                ip_lut2.append(ip_addresses[current_instance+1])
+                mac_lut2.append(macs[current_instance+1])
+                port_lut2.append(ports[current_instance+1])
+        else:
+            if (index % 2) == 0:  # Even
+                ip_lut1.append(ip_addresses[current_instance+1])
+                mac_lut1.append(macs[current_instance+1])
+                port_lut1.append(ports[current_instance+1])
+            else:
+                ip_lut2.append(ip_addresses[current_instance])
+                mac_lut2.append(macs[current_instance])
+                port_lut2.append(ports[current_instance])
+        frame_count += 1
+        if frame_count == frames_per_trigger:
+            frame_count = 0
+            current_instance += 2
+            offset += 1
+        index += 1
+    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+
+
+def nxct_untriggering_farm_mode_config(ip_addresses, macs, ports):
+    """Determine NXCT's Farm Mode configuration, untriggered mode.
+
+    Round-robin, one frame to Odin instance."""
+    lut_entries = len(ip_addresses)
+    ip_lut1 = []
+    ip_lut2 = []
+    mac_lut1 = []
+    mac_lut2 = []
+    port_lut1 = []
+    port_lut2 = []
+    index = 0
+    while index < lut_entries:
+        if (index % 2) == 0:
+            ip_lut1.append(ip_addresses[index])
+            mac_lut1.append(macs[index])
+            port_lut1.append(ports[index])
+        else:
+            ip_lut2.append(ip_addresses[index])
+            mac_lut2.append(macs[index])
+            port_lut2.append(ports[index])
+        index += 1
+    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+
+
+def epac_untriggering_farm_mode_config(ip_addresses, macs, ports):
+    """Determine EPAC's Farm Mode configuration, untriggered mode.
+
+    Round-robin, one frame to Odin instance."""
+    lut_entries = len(ip_addresses)
+    ip_lut1 = []
+    ip_lut2 = []
+    mac_lut1 = []
+    mac_lut2 = []
+    port_lut1 = []
+    port_lut2 = []
+    index = 0
+    added_entries = 0
+    while index < lut_entries:
+        if (added_entries % 2) == 0:
+            ip_lut1.append(ip_addresses[index])
+            mac_lut1.append(macs[index])
+            port_lut1.append(ports[index])
+        else:
+            ip_lut2.append(ip_addresses[index])
+            mac_lut2.append(macs[index])
+            port_lut2.append(ports[index])
+        index += 2
+        added_entries += 1
+    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+
+
+def farm_mode_config(ip_addresses, macs, ports, operating_mode="EPAC", frames_per_trigger=0):
+    """Determine Farm Mode configuration (look up tables), as HexitecFem's setup_farm_mode.
+
+    :param operating_mode: "NXCT" or "EPAC"
+    :param frames_per_trigger: frames per trigger, 0 if untriggered
+    """
+    if operating_mode not in ["NXCT", "EPAC"]:
+        raise FarmModeError("Invalid operating mode: '{}'".format(operating_mode))
+    if operating_mode == "NXCT":
+        # Triggered or not, NXCT sends one frame to each instance in turn
+        return nxct_untriggering_farm_mode_config(ip_addresses, macs, ports)
+    if frames_per_trigger:
+        return epac_triggering_farm_mode_config(ip_addresses, macs, ports, frames_per_trigger)
+    return epac_untriggering_farm_mode_config(ip_addresses, macs, ports)
+
+
+def frame_destinations(ip_lut1, ip_lut2, port_lut1, port_lut2):
+    """Return list of (ip, port) of the frame receiver each frame is sent to, in turn.
+
+    The FEM sends successive frames down alternate data lanes, each lane stepping
+    through its own look up table; Frame n goes to entry n % len(list).
+    """
+    if not ip_lut1 or len(ip_lut1) != len(ip_lut2):
+        raise FarmModeError("Look up tables must be of equal, non-zero, length")
+    destinations = []
+    for lane1, lane2 in zip(zip(ip_lut1, port_lut1), zip(ip_lut2, port_lut2)):
+        destinations.extend([lane1, lane2])
+    return destinations
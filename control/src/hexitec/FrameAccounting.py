@@ -0,0 +1,107 @@
+"""
+FrameAccounting: Account for every frame of an acquisition as processed or lost.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import time
+
+
+class FrameAccounting():
+    """
+    Compare frameReceiver and frameProcessor counters, node by node.
+
+    frameReceiver N feeds frameProcessor N. Once the fem has sent all data, a
+    frame not yet processed is outstanding until the counters show what became
+    of it: dropped by the frameReceiver (no free buffer), never received (all of
+    its packets lost), or received but not processed (i.e. incomplete frame).
+    Accounting completes once all frames are processed or, short of that, once
+    every node has settled (no frame held in a frameReceiver buffer and no counter
+    changing for settle_time seconds) after either the frameReceivers have received
+    (timed out frames included) or dropped every frame, or a frameReceiver's decoder
+    has seen the final frame number. As the fem sends frames in order, frames never
+    received by then were lost in their entirety. Only runs losing the final frame
+    as well end as before (timeout or stop).
+    """
+
+    def __init__(self, settle_time=1.0):
+        """
+        Initialize the FrameAccounting object.
+
+        :param settle_time: seconds counters must remain unchanged before node(s) deemed settled,
+                            beyond any pause in frameProcessor processing
+        """
+        self.settle_time = settle_time
+        self.reset(0)
+
+    def reset(self, number_frames):
+        """Prepare accounting for acquisition of number_frames frames."""
+        self.number_frames = number_frames
+        self.nodes = []
+        self.counters = None
+        self.last_change = time.time()
+        self.complete = False
+
+    def update(self, fr_statuses, fp_statuses, plugin, timestamp=None):
+        """
+        Update accounting from frameReceiver(s) and frameProcessor(s) statuses.
+
+        :param fr_statuses: list of frameReceiver status dictionaries
+        :param fp_statuses: list of frameProcessor status dictionaries
+        :param plugin: frameProcessor plugin whose frames_processed count the frames
+        :param timestamp: time statuses were obtained (default: now)
+        Returns True once all frames are accounted for as processed or lost.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        nodes = []
+        for fr_status, fp_status in zip(fr_statuses, fp_statuses):
+            frames = fr_status.get("frames", {})
+            buffers = fr_status.get("buffers", {})
+            nodes.append({
+                "received": max(frames.get("received", 0), 0),
+                "dropped": max(frames.get("dropped", 0), 0),
+                "timedout": max(frames.get("timedout", 0), 0),
+                "in_flight": buffers.get("total", 0) - buffers.get("empty", 0),
+                "processed": max(fp_status.get(plugin, {}).get("frames_processed", 0), 0),
+                # Highest frame number (from 0) decoder has seen, -1 if none (or not reported)
+                "last_frame": fr_status.get("decoder", {}).get("last_frame_number", -1)
+            })
+        counters = [(n["received"], n["dropped"], n["timedout"], n["processed"], n["in_flight"],
+                     n["last_frame"]) for n in nodes]
+        if counters != self.counters:
+            self.counters = counters
+            self.last_change = timestamp
+        self.nodes = nodes
+        if self.number_frames <= 0 or not nodes:
+            self.complete = False
+            return self.complete
+        idle = all(node["in_flight"] == 0 for node in nodes)
+        settled = idle and (timestamp - self.last_change) >= self.settle_time
+        # Every frame received or dropped; Those not processed are lost, not pending
+        accounted = sum(node["received"] + node["dropped"] for node in nodes) >= self.number_frames
+        # Final frame arrived; Frames still unaccounted for were never received
+        final_frame_seen = max(node["last_frame"] for node in nodes) >= self.number_frames - 1
+        self.complete = (self.get_processed() >= self.number_frames) or \
+            (settled and (accounted or final_frame_seen))
+        return self.complete
+
+    def get_processed(self):
+        """Return number of frames processed across all node(s)."""
+        return sum(node["processed"] for node in self.nodes)
+
+    def get_summary(self):
+        """Summarise what became of the acquisition's frames."""
+        received = sum(node["received"] for node in self.nodes)
+        dropped = sum(node["dropped"] for node in self.nodes)
+        processed = self.get_processed()
+        return {
+            "expected": self.number_frames,
+            "processed": processed,
+            "dropped": dropped,
+            "timedout": sum(node["timedout"] for node in self.nodes),
+            "not_received": max(self.number_frames - received - dropped, 0),
+            "not_processed": max(received - processed, 0),
+            "outstanding": max(self.number_frames - processed, 0) if not self.complete else 0,
+            "complete": self.complete
+        }
@@ -0,0 +1,96 @@
+"""
+FrameWriter: Write frames into a resizable, chunked (optionally Blosc compressed) HDF5 dataset as they arrive.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import h5py
+import numpy as np
+
+# As HexitecDAQ's compression_type options
+COMPRESSION_OPTIONS = ["none", "blosc"]
+# HDF5 Blosc filter, with the settings GenerateConfigFiles gives the hdf plugin:
+#  level 4, no shuffle, LZ4 compressor
+BLOSC_FILTER = 32001
+BLOSC_OPTIONS = (0, 0, 0, 0, 4, 0, 1)
+
+
+class FrameWriterError(Exception):
+    """Simple exception class for FrameWriter to wrap lower-level exceptions."""
+
+    pass
+
+
+def blosc_available():
+    """Return whether the HDF5 Blosc filter is available, registering it through hdf5plugin if installed."""
+    try:
+        import hdf5plugin  # noqa: F401
+    except ImportError:
+        pass
+    return h5py.h5z.filter_avail(BLOSC_FILTER) > 0
+
+
+class FrameWriter():
+    """
+    Append frames to a (frames, rows, columns) dataset, laid out as the DAQ writes raw_frames.
+
+    Frames are gathered into a buffer of batch_frames frames, written (as whole chunks)
+    once full, so memory used is bounded by the buffer regardless of number of frames.
+    """
+
+    def __init__(self, filename, rows, columns, dataset="raw_frames", compression_type="none",
+                 dtype=np.uint16, frames_per_chunk=1, batch_frames=16):
+        """
+        Initialize the FrameWriter object, creating filename (replacing any existing file).
+
+        :param compression_type: one of COMPRESSION_OPTIONS
+        :param frames_per_chunk: frames per HDF5 chunk
+        :param batch_frames: frames buffered between writes (rounded up to whole chunks)
+        """
+        if compression_type not in COMPRESSION_OPTIONS:
+            raise FrameWriterError("Invalid compression type; Valid options: {}".format(COMPRESSION_OPTIONS))
+        compression = {}
+        if compression_type == "blosc":
+            if not blosc_available():
+                raise FrameWriterError("Blosc compression requires the hdf5plugin package")
+            compression = {"compression": BLOSC_FILTER, "compression_opts": BLOSC_OPTIONS}
+        batch_frames = -(-max(batch_frames, 1) // frames_per_chunk) * frames_per_chunk
+        self.buffer = np.empty((batch_frames, rows, columns), dtype=dtype)
+        self.buffered = 0
+        self.frames_written = 0
+        try:
+            self.hdf_file = h5py.File(filename, 'w')
+        except OSError as e:
+            raise FrameWriterError("Couldn't open '{}': {}".format(filename, e)) from None
+        self.dataset = self.hdf_file.create_dataset(dataset, shape=(0, rows, columns), maxshape=(None, rows, columns),
+                                                    chunks=(frames_per_chunk, rows, columns), dtype=dtype,
+                                                    **compression)
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit context, writing any buffered frames and closing file."""
+        self.close()
+
+    def write(self, frame):
+        """Append (rows, columns) frame."""
+        self.buffer[self.buffered] = frame
+        self.buffered += 1
+        if self.buffered == self.buffer.shape[0]:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames to file."""
+        if self.buffered:
+            self.dataset.resize(self.frames_written + self.buffered, axis=0)
+            self.dataset[self.frames_written:] = self.buffer[:self.buffered]
+            self.frames_written += self.buffered
+            self.buffered = 0
+
+    def close(self):
+        """Write any buffered frames, close file."""
+        if self.hdf_file.id.valid:
+            self.flush()
+            self.hdf_file.close()
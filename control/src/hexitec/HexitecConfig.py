@@ -0,0 +1,170 @@
+"""
+HexitecConfig: Compiled hexitec (INI) configuration, cached by file modification time and hash.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import configparser
+import hashlib
+import logging
+import os
+import re
+
+import numpy as np
+
+
+class HexitecConfigError(Exception):
+    """Simple exception class for HexitecConfig to wrap lower-level exceptions."""
+
+    pass
+
+
+class HexitecConfig():
+    """
+    Hexitec configuration, parsed and validated once.
+
+    Keys are "<section>/<key>", i.e. 'Control-Settings/HV_Bias', values strings as in the file.
+    Each ASIC's enables (four 20 bit channels/blocks, i.e. 'Sensor-Config_V1_S1/RowCal1stBlock')
+    are compiled into ten bytes, one per register, ready to load into the VSR.
+    """
+
+    # (parameter, channel_or_block) of every enable held per VSR, ASIC
+    ENABLES = [("ColumnEn_", "Channel"), ("ColumnPwr", "Channel"), ("ColumnCal", "Channel"),
+               ("RowEn_", "Block"), ("RowPwr", "Block"), ("RowCal", "Block")]
+    ORDINALS = ["1st", "2nd", "3rd", "4th"]
+    SENSOR_SECTION = re.compile(r"Sensor-Config_V(\d+)_S\d+/")
+
+    def __init__(self, parameters, filename="", mtime=None, size=None, digest=None):
+        """
+        Initialize the HexitecConfig object, compiling enables.
+
+        :param parameters: dictionary of "<section>/<key>": value strings
+        :param filename: file parameters read from
+        :param mtime: file modification time when read
+        :param size: file size when read
+        :param digest: hash of file contents
+        """
+        self.parameters = parameters
+        self.filename = filename
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.enables_index = {}
+        self.enables = np.zeros((0, 10), dtype=np.uint8)
+        self.compile_enables()
+
+    @classmethod
+    def from_contents(cls, contents, filename="", mtime=None, size=None):
+        """Parse contents (bytes) of INI file, keeping keys case sensitive and values unquoted."""
+        parser = configparser.ConfigParser()
+        # Maintain case-sensitivity:
+        parser.optionxform = str
+        try:
+            parser.read_string(contents.decode("utf-8"), source=filename)
+        except (configparser.Error, UnicodeDecodeError) as e:
+            raise HexitecConfigError("Cannot parse '%s': %s" % (filename, e))
+        parameters = {}
+        for section in parser.sections():
+            for key, value in parser.items(section):
+                parameters[section + "/" + key] = value.strip("\"")
+        return cls(parameters, filename, mtime, size, hashlib.sha1(contents).hexdigest())
+
+    def compile_enables(self):
+        """Convert every complete set of four enable strings into ten (bit reversed) bytes at once."""
+        keys = []
+        strings = []
+        for vsr in range(1, 7):
+            for asic in (1, 2):
+                for param, channel_or_block in self.ENABLES:
+                    channels = []
+                    for ordinal in self.ORDINALS:
+                        key = 'Sensor-Config_V%s_S%s/%s%s%s' % (vsr, asic, param, ordinal, channel_or_block)
+                        if key not in self.parameters:
+                            break
+                        channel = self.parameters[key]
+                        if len(channel) != 20:
+                            logging.error("Invalid length (%s != 20) detected in key: %s" % (len(channel), key))
+                            raise HexitecConfigError("Invalid length of value in '%s'" % key)
+                        channels.append(channel)
+                    else:
+                        keys.append((param, vsr, asic, channel_or_block))
+                        strings.append("".join(channels))
+        if not strings:
+            return
+        # One row of 80 characters per enable, each '0' or '1'
+        bits = np.frombuffer("".join(strings).encode("utf-8"), dtype=np.uint8).reshape(len(strings), 10, 8)
+        bits = bits - ord('0')
+        invalid = np.argwhere(bits > 1)
+        if len(invalid):
+            param, vsr, asic, channel_or_block = keys[invalid[0][0]]
+            raise HexitecConfigError("Invalid enable(s) in 'Sensor-Config_V%s_S%s/%s..%s'" %
+                                     (vsr, asic, param, channel_or_block))
+        # Pixels appear in 8 bit reverse order, i.e. the first character is each byte's LSB
+        self.enables = np.packbits(bits, axis=2, bitorder='little').reshape(len(strings), 10)
+        self.enables_index = {key: index for index, key in enumerate(keys)}
+
+    def get_enables(self, param, vsr, asic, channel_or_block):
+        """Return list of ten bytes of ASIC's row/column enable, [-1] if not configured."""
+        index = self.enables_index.get((param, vsr, asic, channel_or_block))
+        if index is None:
+            return [-1]
+        return self.enables[index].tolist()
+
+    def diff(self, other):
+        """Return set of keys whose values differ from other (None: every key)."""
+        if other is None:
+            return set(self.parameters)
+        keys = set(self.parameters) | set(other.parameters)
+        return {key for key in keys if self.parameters.get(key) != other.parameters.get(key)}
+
+    def changed_vsrs(self, other):
+        """Return sorted list of VSR numbers whose sensor configuration differs from other."""
+        vsrs = set()
+        for key in self.diff(other):
+            match = self.SENSOR_SECTION.match(key)
+            if match:
+                vsrs.add(int(match.group(1)))
+        return sorted(vsrs)
+
+
+class HexitecConfigCache():
+    """
+    Compile each hexitec configuration file only when its contents change.
+
+    A file whose modification time and size are unchanged is not read again;
+    One touched but not changed is read and hashed, but not parsed again.
+    """
+
+    def __init__(self):
+        """Initialize the HexitecConfigCache object."""
+        self.configs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, filename):
+        """Return compiled configuration of filename (no parameters if file unreadable)."""
+        try:
+            stat = os.stat(filename)
+            cached = self.configs.get(filename)
+            if cached and (cached.mtime == stat.st_mtime) and (cached.size == stat.st_size):
+                self.hits += 1
+                return cached
+            with open(filename, 'rb') as f:
+                contents = f.read()
+        except OSError as e:
+            logging.warning("Cannot read hexitec config '%s': %s" % (filename, e))
+            self.configs.pop(filename, None)
+            return HexitecConfig({}, filename)
+        if cached and (cached.digest == hashlib.sha1(contents).hexdigest()):
+            cached.mtime = stat.st_mtime
+            cached.size = stat.st_size
+            self.hits += 1
+            return cached
+        self.misses += 1
+        config = HexitecConfig.from_contents(contents, filename, stat.st_mtime, stat.st_size)
+        self.configs[filename] = config
+        return config
+
+    def clear(self):
+        """Discard all compiled configurations."""
+        self.configs = {}
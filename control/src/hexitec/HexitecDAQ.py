@@ -8,14 +8,19 @@ import logging
 from functools import partial
 
 from tornado.ioloop import IOLoop
+from concurrent import futures
 from odin.adapters.adapter import ApiAdapterRequest
 from odin.adapters.parameter_tree import ParameterTree, ParameterTreeError
 
 from hexitec.GenerateConfigFiles import GenerateConfigFiles
+from hexitec.AdaptivePoller import AdaptivePoller
+from hexitec.MetadataWriter import MetadataWriter
+from hexitec.RateEstimator import RateEstimator
+from hexitec.FrameAccounting import FrameAccounting
 
 import h5py
 import collections.abc
-import numpy as np
+import copy
 import statistics
 from datetime import datetime
 from datetime import timezone
@@ -38,6 +43,9 @@ class HexitecDAQ():
     # Define timestamp format
     DATE_FORMAT = '%Y%m%d_%H%M%S.%f'
 
+    # Thread executor used to stage meta data while acquisition runs
+    thread_executor = futures.ThreadPoolExecutor(max_workers=1)
+
     def __init__(self, parent, save_file_dir="", save_file_name=""):
         """
         Initialize the HexitecDAQ object.
@@ -68,6 +76,16 @@ class HexitecDAQ():
 
         self.hdf_file_location = ""
         self.hdf_retry = 0
+        # Serialise parameter trees into meta data file; Time (s) it took
+        self.metadata_writer = MetadataWriter(error_callback=self._metadata_error)
+        self.metadata_write_time = 0.0
+        # Meta data staged (written ahead) during acquisition; Future, file, tree snapshots
+        self.metadata_staging = None
+        self.staged_file_location = ""
+        self.staged_trees = {}
+        # Seconds to wait for hdf file(s) to close after End of Acquisition
+        self.hdf_close_timeout = 5.0
+        self.hdf_close_deadline = 0
 
         # Construct path to hexitec data config files folder
         self.data_config_path = self.parent.data_config_path
@@ -122,6 +140,24 @@ class HexitecDAQ():
         self.frames_processed = 0
         self.shutdown_processing = False
         self.processing_interruptable = False
+        # Acquisition state machine: Idle, Acquiring, Processing, Flushing, Closing
+        self.acquisition_state = "Idle"
+        self.poller = AdaptivePoller(minimum=0.01, maximum=0.5)
+        # (timeout handle, callback, due time) of next scheduled poll
+        self.pending_poll = None
+        # Per node frame rates (EWMA), processing backlog (frames received less processed)
+        self.received_rates = RateEstimator()
+        self.processed_rates = RateEstimator()
+        self.node_backlog = []
+        self.nodes_falling_behind = []
+        # Flag node whose processing rate trails its receive rate by more than this fraction
+        self.backlog_tolerance = 0.1
+        self.processing_time_remaining = 0.0
+        # Once fem finished, account for every frame as either processed or lost
+        self.frame_accounting = FrameAccounting()
+        # Telemetry written into meta data covers run, plus this many seconds before it
+        self.telemetry_start_time = time.time()
+        self.telemetry_margin = 60
 
         self.lvframes_dataset_name = "raw_frames"
         self.lvframes_socket_addr = ""
@@ -166,7 +202,8 @@ class HexitecDAQ():
             "diagnostics": {
                 "daq_start_time": (lambda: self.daq_start_time, None),
                 "daq_stop_time": (lambda: self.daq_stop_time, None),
-                "fem_not_busy": (lambda: self.fem_not_busy, None)
+                "fem_not_busy": (lambda: self.fem_not_busy, None),
+                "metadata_write_time": (lambda: self.metadata_write_time, None)
             },
             "receiver": {
                 "connected": (partial(self._is_od_connected, adapter="fr"), None),
@@ -186,13 +223,22 @@ class HexitecDAQ():
             "status": {
                 "average_occupancy": (self.calculate_average_occupancy, None),
                 "in_progress": (lambda: self.in_progress, None),
+                "acquisition_state": (lambda: self.acquisition_state, None),
                 "daq_ready": (lambda: self.daq_ready, None),
                 "frames_expected": (lambda: self.frames_expected, None),
                 "frames_received": (lambda: self.frames_received, None),
                 "frames_processed": (lambda: self.frames_processed, None),
                 "processed_remaining": (lambda: self.processed_remaining, None),
                 "received_remaining": (lambda: self.received_remaining, None),
-                "collection_time_remaining": (lambda: self.collection_time_remaining, None)
+                "collection_time_remaining": (lambda: self.collection_time_remaining, None),
+                "processing_time_remaining": (lambda: self.processing_time_remaining, None),
+                "node_rates": {
+                    "received": (lambda: self.received_rates.rates, None),
+                    "processed": (lambda: self.processed_rates.rates, None),
+                    "backlog": (lambda: self.node_backlog, None),
+                    "falling_behind": (lambda: self.nodes_falling_behind, None)
+                },
+                "frame_accounting": (self.frame_accounting.get_summary, None)
             },
             "config": {
                 "addition": {
@@ -258,6 +304,9 @@ class HexitecDAQ():
                 }
             },
             "compression_type": (self._get_compression_type, self._set_compression_type),
+            "metadata_mode": (self._get_metadata_mode, self._set_metadata_mode),
+            "accounting_settle_time": (lambda: self.frame_accounting.settle_time,
+                                       self._set_accounting_settle_time),
             "sensors_layout": (self._get_sensors_layout, self._set_sensors_layout)
         })
         self.update_fp_configuration = True
@@ -375,11 +424,19 @@ class HexitecDAQ():
         self.number_frames = number_frames
         self.frames_expected = self.number_frames
         self.received_remaining = self.number_frames - self.frames_received
+        self.received_rates.reset()
+        self.processed_rates.reset()
+        self.node_backlog = []
+        self.nodes_falling_behind = []
+        self.processing_time_remaining = 0.0
+        self.frame_accounting.reset(number_frames)
+        self.telemetry_start_time = time.time()
         logging.info("FRAME START ACQ: %d END ACQ: %d",
                      self.frame_start_acquisition, number_frames)
         self.in_progress = True
         logging.debug("Starting File Writer")
         self.set_file_writing(True)
+        self.stage_metadata()
         # Diagnostics:
         self.daq_start_time = datetime.now(timezone.utc).astimezone().isoformat()
         self.fem_not_busy = "0"
@@ -387,10 +444,37 @@ class HexitecDAQ():
         # About to receive fem data, daq therefore now busy
         self.daq_ready = False
         # Wait while fem finish sending data
-        IOLoop.instance().call_later(0.3, self.acquisition_check_loop)
+        self.acquisition_state = "Acquiring"
+        self.poller.reset()
+        self._schedule_poll(0.3, self.acquisition_check_loop)
+
+    def _schedule_poll(self, delay, callback):
+        """Schedule next acquisition poll, noting it so status changes may bring it forward."""
+        handle = IOLoop.instance().call_later(delay, callback)
+        self.pending_poll = (handle, callback, time.time() + delay)
+
+    def notify_status_change(self):
+        """Run pending acquisition poll immediately, rather than await its timeout.
+
+        Called when a status change is pushed, i.e. fem finished sending data, so
+        the acquisition state machine advances without waiting out the poll interval.
+        """
+        if self.pending_poll is None:
+            return
+        handle, callback, due = self.pending_poll
+        if time.time() >= due:
+            # Poll already due (or ran), nothing to expedite
+            return
+        self.pending_poll = None
+        IOLoop.instance().remove_timeout(handle)
+        IOLoop.instance().add_callback(callback)
 
     def calculate_remaining_collection_time(self):
         """Calculate time remaining of current collection."""
+        # Prefer measured receive rate, if available
+        remaining_time = self.received_rates.time_remaining(self.received_remaining)
+        if self.in_progress and remaining_time is not None:
+            return remaining_time
         remaining_time = self.parent.fem.duration
         if len(self.parent.fem.acquire_start_time) > 0:
             acquire_start = self.parent.fem.acquire_start_time
@@ -405,51 +489,77 @@ class HexitecDAQ():
         # Reset DAQ watchdog timeout or may fire prematurely
         self.processing_timestamp = time.time()
         if bBusy:
-            self.frames_received = self.get_total_frames_received()
-            self.frames_processed = self.get_total_frames_processed(self.last_plugin_configured)
+            received = self.get_frames_received_per_node()
+            processed = self.get_frames_processed_per_node(self.last_plugin_configured)
+            self.update_node_rates(received, processed)
+            frames_received = sum(received)
+            progressed = frames_received != self.frames_received
+            self.frames_received = frames_received
+            self.frames_processed = sum(processed)
             self.received_remaining = self.number_frames - self.frames_received
             self.processed_remaining = self.number_frames - self.frames_processed
             self.collection_time_remaining = self.calculate_remaining_collection_time()
-            IOLoop.instance().call_later(0.5, self.acquisition_check_loop)
+            delay = self.poller.next_interval(progressed, self.collection_time_remaining)
+            self._schedule_poll(delay, self.acquisition_check_loop)
         else:
             # Allow watchdog to interrupt processing if timed out
             self.processing_interruptable = True
             self.fem_not_busy = datetime.now(timezone.utc).astimezone().isoformat()
-            IOLoop.instance().call_later(0.5, self.processing_check_loop)
+            self.acquisition_state = "Processing"
+            self.processing_check_loop()
 
     def processing_check_loop(self):
         """Check that the processing has completed."""
         # Check HDF/histogram processing progress
-        total_frames_processed = self.get_total_frames_processed(self.last_plugin_configured)
-        self.frames_received = self.get_total_frames_received()
+        fr_statuses = self.get_adapter_status("fr")
+        fp_statuses = self.get_adapter_status("fp")
+        received = self.get_frames_received_per_node(fr_statuses)
+        processed = self.get_frames_processed_per_node(self.last_plugin_configured, fp_statuses)
+        self.update_node_rates(received, processed)
+        total_frames_processed = sum(processed)
+        self.frames_received = sum(received)
         self.received_remaining = self.number_frames - self.frames_received
         if self.collection_time_remaining < 0.9:
             self.collection_time_remaining = 0
         if total_frames_processed == self.number_frames:
+            self.frames_processed = total_frames_processed
+            self.processed_remaining = 0
+            self.processing_time_remaining = 0.0
+            self.acquisition_state = "Flushing"
             IOLoop.instance().add_callback(self.flush_data)
             logging.debug("Acquisition Complete")
-            # All required frames acquired; if either of frames based datasets
-            #   selected, wait for hdf file to close
-            IOLoop.instance().call_later(0.1, self.hdf_closing_loop)
+            return
+        # Not all frames processed yet; Have remaining frames been lost?
+        if self.frame_accounting.update(fr_statuses, fp_statuses, self.last_plugin_configured):
+            summary = self.frame_accounting.get_summary()
+            self.frames_processed = total_frames_processed
+            self.processed_remaining = self.number_frames - self.frames_processed
+            self.processing_interruptable = False
+            self.acquisition_state = "Flushing"
+            IOLoop.instance().add_callback(self.flush_data)
+            logging.warning("Acquisition Complete, {} frame(s) lost: {} dropped, {} not received, "
+                            "{} not processed".format(self.processed_remaining, summary["dropped"],
+                                                      summary["not_received"],
+                                                      summary["not_processed"]))
+            return
+        # Check data still in flow
+        progressed = total_frames_processed != self.frames_processed
+        if not progressed:
+            # No frames processed since previous poll, did processing time out?
+            if self.shutdown_processing:
+                self.shutdown_processing = False
+                self.processing_interruptable = False
+                self.acquisition_state = "Flushing"
+                IOLoop.instance().add_callback(self.flush_data)
+                logging.debug("Acquisition Completing gracefully (packet losses)")
+                return
         else:
-            # Not all frames processed yet; Check data still in flow
-            if total_frames_processed == self.frames_processed:
-                # No frames processed in at least 0.5 sec, did processing time out?
-                if self.shutdown_processing:
-                    self.shutdown_processing = False
-                    self.processing_interruptable = False
-                    IOLoop.instance().add_callback(self.flush_data)
-                    logging.debug("Acquisition Completing gracefully (packet losses)")
-                    # Wait for hdf file(s) to close
-                    IOLoop.instance().call_later(1, self.hdf_closing_loop)
-                    return
-            else:
-                # Data still bein' processed
-                self.processing_timestamp = time.time()
-                self.frames_processed = total_frames_processed
-                self.processed_remaining = self.number_frames - self.frames_processed
-            # Wait 0.5 seconds and check again
-            IOLoop.instance().call_later(.25, self.processing_check_loop)
+            # Data still bein' processed
+            self.processing_timestamp = time.time()
+            self.frames_processed = total_frames_processed
+            self.processed_remaining = self.number_frames - self.frames_processed
+        delay = self.poller.next_interval(progressed, self.processing_time_remaining)
+        self._schedule_poll(delay, self.processing_check_loop)
 
     def flush_data(self):
         """Flush out histograms, ensure complete datasets included."""
@@ -457,22 +567,24 @@ class HexitecDAQ():
         command = "config/inject_eoa"
         request = ApiAdapterRequest("", content_type="application/json")
         self.adapters["fp"].put(command, request)
-        IOLoop.instance().call_later(0.02, self.monitor_eoa_progress)
+        self.poller.reset()
+        self._schedule_poll(self.poller.minimum, self.monitor_eoa_progress)
 
     def monitor_eoa_progress(self):
         """Check whether End of Acquisition completed."""
         if self.get_eoa_processed_status():
+            self.hdf_close_deadline = time.time() + self.hdf_close_timeout
+            self.poller.reset()
             self.stop_acquisition()
         else:
-            IOLoop.instance().call_later(0.25, self.monitor_eoa_progress)
+            self._schedule_poll(self.poller.next_interval(), self.monitor_eoa_progress)
 
     def stop_acquisition(self):
         """Disable file writing so processing can add local Meta data to file."""
         if self.check_hdf_writing_true():
             # hdf file still open
-            if self.hdf_retry < 5:
-                IOLoop.instance().call_later(1.0, self.stop_acquisition)
-                self.hdf_retry += 1
+            if time.time() < self.hdf_close_deadline:
+                self._schedule_poll(self.poller.next_interval(), self.stop_acquisition)
                 return
             else:
                 self.parent.fem.flag_error("DAQ timed out, file didn't close")
@@ -481,6 +593,10 @@ class HexitecDAQ():
         self.set_file_writing(False)
         self.frames_processed = self.get_total_frames_processed(self.last_plugin_configured)
         self.processed_remaining = self.number_frames - self.frames_processed
+        # File writing disabled, wait for hdf file(s) to close
+        self.acquisition_state = "Closing"
+        self.poller.reset()
+        self.hdf_closing_loop()
 
     def check_hdf_writing_true(self):
         """Check hdf node(s) statuses, return True if all FP(s) writing status' True."""
@@ -495,15 +611,144 @@ class HexitecDAQ():
     def hdf_closing_loop(self):
         """Wait for processing to complete but don't block, before prep to write meta data."""
         if self.check_hdf_writing_true():
-            IOLoop.instance().call_later(0.5, self.hdf_closing_loop)
+            self._schedule_poll(self.poller.next_interval(), self.hdf_closing_loop)
         else:
             self.frames_received = self.get_total_frames_received()
             self.received_remaining = self.number_frames - self.frames_received
             self.hdf_file_location = self.file_dir + self.file_name + '.h5'
             self.prepare_hdf_file()
 
+    def stage_metadata(self):
+        """Snapshot parameter trees at start of run, write them into a staging file in the background."""
+        self.metadata_staging = None
+        self.hdf_file_location = self.file_dir + self.file_name + '.h5'
+        self.staged_file_location = self.hdf_file_location + ".staging"
+        try:
+            # Snapshot taken here, as trees and settings may change while written by the executor
+            self.staged_trees = {
+                "hexitec": copy.deepcopy(self.parent.param_tree.get('')),
+                # TODO: Hacked until frame_process_adapter updated to use ParameterTree
+                "hdf": copy.deepcopy(self.adapters['fp']._param),
+                "settings": self._metadata_settings(),
+                "mode": self.metadata_writer.mode
+            }
+        except Exception as e:
+            logging.error("Unable to stage meta data, will write it after acquisition: %s" % e)
+            return
+        self.metadata_staging = self.thread_executor.submit(self.write_staged_metadata,
+                                                            self.staged_file_location, self.staged_trees)
+
+    def write_staged_metadata(self, staged_file_location, staged_trees):
+        """Write staged parameter trees and config files into staging file.
+
+        Runs on the thread executor; Uses its own writer and touches no DAQ state,
+        returning (error_code, errors) so errors are flagged once back on the IOLoop.
+        """
+        errors = []
+        writer = MetadataWriter(mode=staged_trees["mode"],
+                                error_callback=lambda message, error: errors.append((message, error)))
+        with h5py.File(staged_file_location, 'w') as hdf_file:
+            error_code = self._write_metadata(writer, hdf_file.create_group("hexitec"), staged_trees["hexitec"],
+                                              hdf_file, staged_trees["settings"], {})
+            self._write_metadata(writer, hdf_file.create_group("hdf"), staged_trees["hdf"], hdf_file,
+                                 staged_trees["settings"], {})
+        return error_code, errors
+
+    def discard_staged_metadata(self):
+        """Abandon meta data staged for the current run (if any), removing its staging file."""
+        staging = self.metadata_staging
+        self.metadata_staging = None
+        if staging is None:
+            return
+        location = self.staged_file_location
+        if staging.cancel():
+            self._remove_staged_file(location)
+        else:
+            # Still being written; Removed once written, before the (single) executor starts any other staging
+            staging.add_done_callback(lambda _: self._remove_staged_file(location))
+
+    def _remove_staged_file(self, location):
+        """Remove staging file, if present."""
+        try:
+            if os.path.isfile(location):
+                os.remove(location)
+        except OSError as e:
+            logging.error("Unable to remove staged meta data file %s: %s" % (location, e))
+
+    def finalise_staged_metadata(self):
+        """Patch end of run values into staging file, then rename it into place.
+
+        Returns False if the staged file is unusable, so meta data must be written in full.
+        """
+        staging = self.metadata_staging
+        self.metadata_staging = None
+        try:
+            error_code, errors = staging.result()
+            for message, error in errors:
+                self._metadata_error(message, error)
+            self.parent.fem._set_status_message("Adding end of run meta data..")
+            # Patch in the layout the staging file was written in
+            writer = MetadataWriter(mode=self.staged_trees["mode"], error_callback=self._metadata_error)
+            with h5py.File(self.staged_file_location, 'a') as hdf_file:
+                self.metadata_write_time = \
+                    writer.patch(hdf_file, '/', self.staged_trees["hexitec"], self.parent.param_tree.get(''))
+                self.metadata_write_time += \
+                    writer.patch(hdf_file, '/', self.staged_trees["hdf"], self.adapters['fp']._param)
+                hdf_file["hexitec"].attrs['runDate'] = self.parent.fem.acquire_start_time
+                self.write_metadata(hdf_file.create_group("fp"), self.get_fp_instances(), hdf_file)
+                self.write_telemetry(hdf_file)
+        except Exception as e:
+            logging.error("Staged meta data unusable, writing it in full: %s" % e)
+            self._remove_staged_file(self.staged_file_location)
+            return False
+        self.replace_staged_file(error_code)
+        return True
+
+    def replace_staged_file(self, error_code):
+        """Rename finalised staging file into place, writing meta data in full if it cannot be."""
+        try:
+            os.replace(self.staged_file_location, self.hdf_file_location)
+        except OSError as e:
+            # Let's retry a couple of times in case file temporary busy
+            if self.hdf_retry < 6:
+                self.hdf_retry += 1
+                logging.warning(" Re-try attempt: %s Rename staged file, because: %s" %
+                                (self.hdf_retry, e))
+                IOLoop.instance().call_later(0.5, self.replace_staged_file, error_code)
+                return
+            logging.error("Failed to rename '%s' with error: %s" % (self.staged_file_location, e))
+            self.hdf_retry = 0
+            self._remove_staged_file(self.staged_file_location)
+            self.prepare_hdf_file()
+            return
+        self.hdf_retry = 0
+        self.metadata_completed(error_code)
+
+    def write_telemetry(self, hdf_file):
+        """Write telemetry recorded during run (and shortly before it) into hdf_file."""
+        start = self.telemetry_start_time - self.telemetry_margin
+        try:
+            self.parent.telemetry.write(hdf_file, "telemetry", start, time.time())
+        except Exception as e:
+            logging.error("Unable to write telemetry: %s" % e)
+
+    def get_fp_instances(self):
+        """Get status of each frameProcessor, keyed by instance."""
+        status = self.get_adapter_status("fp")
+        fp_instances = {}
+        for index, odin in enumerate(status):
+            fp_instances[f"frameProcessor_{index}"] = odin
+        return fp_instances
+
     def prepare_hdf_file(self):
         """Re-open HDF5 file, prepare meta data."""
+        if self.metadata_staging is not None:
+            if not self.metadata_staging.done():
+                # Meta data still being staged, check back shortly
+                IOLoop.instance().call_later(self.poller.next_interval(), self.prepare_hdf_file)
+                return
+            if self.finalise_staged_metadata():
+                return
         try:
             hdf_file = h5py.File(self.hdf_file_location, 'w')
             self.parent.fem._set_status_message("Reopening file to add meta data..")
@@ -520,11 +765,14 @@ class HexitecDAQ():
             self.hdf_retry = 0
             self.in_progress = False
             self.daq_ready = True
+            self.acquisition_state = "Idle"
+            self.pending_poll = None
             self.parent.fem.flag_error("Reopening HDF file: %s" % e)
             self.parent.software_state = "Error"
             return
 
         error_code = 0
+        self.metadata_write_time = 0.0
         # Create metadata group, add dataset to it and pass to write function
         parent_metadata_group = hdf_file.create_group("hexitec")
         parent_tree_dict = self.parent.param_tree.get('')
@@ -536,27 +784,29 @@ class HexitecDAQ():
         # Only "hexitec" group contain filename entries, ignore return value of write_metadata
         self.write_metadata(hdf_metadata_group, hdf_tree_dict, hdf_file)
 
-        status = self.parent.daq.get_adapter_status("fp")
-        index = 0
-        fp_instances = {}
-        for odin in status:
-            fp_instances[f"frameProcessor_{index}"] = odin
-            index += 1
         fp_metadata_group = hdf_file.create_group("fp")
-        fp_tree_dict = fp_instances
-        self.write_metadata(fp_metadata_group, fp_tree_dict, hdf_file)
+        self.write_metadata(fp_metadata_group, self.get_fp_instances(), hdf_file)
+        self.write_telemetry(hdf_file)
+
+        hdf_file.close()
+        self.metadata_completed(error_code)
 
+    def metadata_completed(self, error_code):
+        """Report meta data outcome, return DAQ to ready."""
+        logging.debug("Meta data (%s mode) written in %.3f seconds" %
+                      (self.metadata_writer.mode, self.metadata_write_time))
         if (error_code == 0):
             self.parent.fem._set_status_message("Meta data added to {}".format(
                 self.hdf_file_location))
         else:
             self.parent.fem.flag_error("Meta data writer unable to access file(s)!")
 
-        hdf_file.close()
         self.parent.software_state = "Ready"
         self.processing_interruptable = False
         self.in_progress = False
         self.daq_ready = True
+        self.acquisition_state = "Idle"
+        self.pending_poll = None
         if self.parent.archiver_configured:
             # Signal archiver to archive data files
             self.signal_archiver()
@@ -593,47 +843,37 @@ class HexitecDAQ():
 
     def save_dict_contents_to_file(self, hdf_file, path, param_tree_dict):
         """Traverse dictionary, write each key as native type to h5file."""
-        for key, item in param_tree_dict.items():
-            item = self._convert_values(item)
-            if isinstance(item, list):
-                if isinstance(item[0], dict):
-                    newdict = {}
-                    for i in range(len(item)):
-                        newdict[key + str(i)] = item[i]
-                    item = newdict
-                    self.save_dict_contents_to_file(hdf_file, path, {})
-                else:
-                    if not isinstance(item[0], str):
-                        item = np.array(item)
-            if isinstance(item, dict):
-                self.save_dict_contents_to_file(hdf_file, path + key + '/', item)
-            else:
-                try:
-                    # Do not include errors, log messages (see error log for such details)
-                    if key == "errors_history" or key == "log_messages":
-                        continue
-                    hdf_file[path + key] = item
-                except TypeError as e:
-                    logging.error("Error: {} Parsing key: {}{} value: {}".format(
-                        e, path, key, item))
-                    self.parent.fem.flag_error("Parsing key: {}{} value: {}".format(
-                        path, key, item), str(e))
-
-    def _convert_values(self, value):
-        """Convert values to correct Python types."""
-        if isinstance(value, list):
-            if len(value) == 0:
-                value = ["(empty)"]
-            else:
-                value = [self._convert_values(v) for v in value]
-        elif isinstance(value, dict):
-            for key, entry in value.items():
-                value[key] = self._convert_values(entry)
-        return str(value) if isinstance(value, type(None)) else value
+        writer = MetadataWriter(mode="legacy", error_callback=self._metadata_error)
+        writer.write(hdf_file, path, param_tree_dict)
+
+    def _metadata_error(self, message, error):
+        """Flag meta data key that couldn't be written."""
+        self.parent.fem.flag_error(message, error)
 
     def write_metadata(self, metadata_group, param_tree_dict, hdf_file):
         """Write parameter tree(s) and config files as meta data."""
-        self.save_dict_contents_to_file(hdf_file, '/', param_tree_dict)
+        config_ds = {}
+        if metadata_group.name == u'/hexitec':
+            self.config_ds = config_ds
+        error_code = self._write_metadata(self.metadata_writer, metadata_group, param_tree_dict, hdf_file,
+                                          self._metadata_settings(), config_ds)
+        self.metadata_write_time += self.metadata_writer.write_time
+        return error_code
+
+    def _metadata_settings(self):
+        """Return settings deciding which config files are written as meta data."""
+        return {
+            "calibration_enable": self.calibration_enable,
+            "threshold_mode": self.threshold_mode,
+            "run_date": self.parent.fem.acquire_start_time
+        }
+
+    def _write_metadata(self, writer, metadata_group, param_tree_dict, hdf_file, settings, config_ds):
+        """Write parameter tree and, into the hexitec group, selected config files using writer.
+
+        Config files' datasets are added to config_ds; Returns 0, or negative error code.
+        """
+        writer.write(hdf_file, '/', param_tree_dict)
 
         # Flatten dictionary, before checking whether any config/xml files selected
         param_tree_dict = self._flatten_dict(param_tree_dict)
@@ -641,17 +881,16 @@ class HexitecDAQ():
         # Only write parent's (Hexitec class) parameter tree's config files once
         if metadata_group.name == u'/hexitec':
             # Add additional attribute to record current date
-            metadata_group.attrs['runDate'] = self.parent.fem.acquire_start_time
+            metadata_group.attrs['runDate'] = settings["run_date"]
             # Write the configuration files into the metadata group
-            self.config_ds = {}
             str_type = h5py.special_dtype(vlen=str)
 
             # Write contents of config file, and selected coefficients file(s)
             file_name = ['detector/fem/hexitec_config']
-            if self.calibration_enable:
+            if settings["calibration_enable"]:
                 file_name.append('detector/daq/config/calibration/gradients_filename')
                 file_name.append('detector/daq/config/calibration/intercepts_filename')
-            if self.threshold_mode == self.THRESHOLDOPTIONS[1]:  # = "filename"
+            if settings["threshold_mode"] == self.THRESHOLDOPTIONS[1]:  # = "filename"
                 file_name.append('detector/daq/config/threshold/threshold_filename')
 
             for param_file in file_name:
@@ -661,11 +900,11 @@ class HexitecDAQ():
                 # Only attempt to open file if it exists
                 file_name = param_tree_dict[param_file]
                 if os.path.isfile(file_name):
-                    self.config_ds[param_file] = \
+                    config_ds[param_file] = \
                         metadata_group.create_dataset(param_file, shape=(1,), dtype=str_type)
                     try:
                         with open(file_name, 'r') as xml_file:
-                            self.config_ds[param_file][:] = xml_file.read()
+                            config_ds[param_file][:] = xml_file.read()
                     except IOError as e:
                         logging.error("Failed to read %s XML file %s : %s " %
                                       (param_file, file_name, e))
@@ -719,12 +958,16 @@ class HexitecDAQ():
 
     def get_total_frames_processed(self, plugin):
         """Count frames_processed across all of 'plugin' process(es)."""
-        fp_statuses = self.get_adapter_status("fp")
-        frames_processed = 0
+        return sum(self.get_frames_processed_per_node(plugin))
+
+    def get_frames_processed_per_node(self, plugin, fp_statuses=None):
+        """List frames_processed by 'plugin' of each frameProcessor."""
+        if fp_statuses is None:
+            fp_statuses = self.get_adapter_status("fp")
+        frames_processed = []
         for fp_status in fp_statuses:
             fw_status = fp_status.get(plugin, None).get('frames_processed')
-            if fw_status > 0:   # TODO: Sort out this better
-                frames_processed = frames_processed + fw_status
+            frames_processed.append(fw_status if fw_status > 0 else 0)   # TODO: Sort out this better
         return frames_processed
 
     def get_eoa_processed_status(self):
@@ -739,13 +982,49 @@ class HexitecDAQ():
 
     def get_total_frames_received(self):
         """Count frames received across all frameReceiver(s)."""
-        fr_statuses = self.get_adapter_status("fr")
-        total_received = 0
+        return sum(self.get_frames_received_per_node())
+
+    def get_frames_received_per_node(self, fr_statuses=None):
+        """List frames received by each frameReceiver."""
+        if fr_statuses is None:
+            fr_statuses = self.get_adapter_status("fr")
+        frames_received = []
         for fr_status in fr_statuses:
             received = fr_status.get("frames", None).get("received", None)
-            if received > 0:
-                total_received = total_received + received
-        return total_received
+            frames_received.append(received if received > 0 else 0)
+        return frames_received
+
+    def update_node_rates(self, received, processed):
+        """Update per node rate estimates, flag node(s) whose processing backlog is growing.
+
+        frameReceiver N feeds frameProcessor N, so node N's backlog is its
+        frames received less frames processed.
+        """
+        timestamp = time.time()
+        self.received_rates.update(received, timestamp)
+        self.processed_rates.update(processed, timestamp)
+        self.parent.telemetry.append({"frames_received_rate": self.received_rates.total_rate(),
+                                      "frames_processed_rate": self.processed_rates.total_rate()},
+                                     timestamp)
+        backlog = [r - p for r, p in zip(received, processed)]
+        falling_behind = []
+        for index, frames in enumerate(backlog):
+            previous = self.node_backlog[index] if index < len(self.node_backlog) else frames
+            receive_rate = self.received_rates.rates[index]
+            process_rate = self.processed_rates.rates[index]
+            lagging = process_rate < receive_rate * (1 - self.backlog_tolerance)
+            falling_behind.append(bool(frames > previous and lagging))
+        was_behind = self.nodes_falling_behind + [False] * len(falling_behind)
+        newly_behind = [index for index, behind in enumerate(falling_behind)
+                        if behind and not was_behind[index]]
+        if newly_behind:
+            logging.warning("Processing node(s) %s falling behind, backlog: %s frames" %
+                            (newly_behind, [backlog[index] for index in newly_behind]))
+        self.node_backlog = backlog
+        self.nodes_falling_behind = falling_behind
+        processed_remaining = self.number_frames - sum(processed)
+        time_remaining = self.processed_rates.time_remaining(processed_remaining)
+        self.processing_time_remaining = time_remaining if time_remaining is not None else 0.0
 
     def _is_od_connected(self, status=None, adapter=""):
         if status is None:
@@ -1173,9 +1452,23 @@ class HexitecDAQ():
         self.update_number_histograms()
         self.update_fp_configuration = True
 
+    def _get_metadata_mode(self):
+        return self.metadata_writer.mode
+
+    def _set_metadata_mode(self, metadata_mode):
+        try:
+            self.metadata_writer.set_mode(metadata_mode)
+        except ValueError as e:
+            raise ParameterTreeError(str(e))
+
     def _get_compression_type(self):
         return self.compression_type
 
+    def _set_accounting_settle_time(self, settle_time):
+        if settle_time <= 0:
+            raise ParameterTreeError("Accounting settle time must be positive")
+        self.frame_accounting.settle_time = settle_time
+
     def _set_compression_type(self, compression_type):
         if compression_type in self.COMPRESSIONOPTIONS:
             self.compression_type = compression_type
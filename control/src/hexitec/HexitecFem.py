@@ -10,10 +10,10 @@ import numpy as np
 import distutils.util
 
 import time
+import threading
 from datetime import datetime
 from datetime import timezone
 import logging
-import configparser
 import psutil
 from json.decoder import JSONDecodeError
 import struct
@@ -23,7 +23,13 @@ from RdmaUdp import *
 from udpcore.UdpCore import *
 from boardcfgstatus.BoardCfgStatus import *
 from hexitec_vsr.VsrModule import VsrModule
-import hexitec.ALL_RDMA_REGISTERS as HEX_REGISTERS
+from hexitec.RegisterMap import HEX_REGISTERS
+from hexitec.AdaptivePoller import AdaptivePoller
+import hexitec.FarmMode as FarmMode
+from hexitec.HexitecConfig import HexitecConfigCache, HexitecConfigError
+from hexitec.RegisterShadow import RegisterShadow
+from hexitec.TelemetryBuffer import TelemetryBuffer
+from hexitec.VsrCommandPlanner import VsrCommandPlanner
 
 from socket import error as socket_error
 from odin.adapters.parameter_tree import ParameterTree, ParameterTreeError
@@ -52,6 +58,14 @@ class HexitecFem():
 
     TRIGGERINGOPTIONS = ["triggered", "none"]
 
+    # Settings requiring full initialisation (every setting staged on every VSR) whenever changed
+    TIMING_SETTINGS = ["row_s1", "s1_sph", "sph_s2", "adc1_delay", "delay_sync_signals",
+                       "gain_string", "vcal_enabled", "vcal2_vcal1"]
+    # DAC settings, written by staging them alone on each VSR before reinitialising it
+    VSR_SETTINGS = ["umid_value", "vcal_value"]
+    # Settings written by (re)configuring hardware triggering
+    TRIGGER_SETTINGS = ["triggering_frames", "enable_trigger_mode", "enable_trigger_input"]
+
     def __init__(self, parent, config):
         """
         Initialize the HexitecFem object.
@@ -63,6 +77,13 @@ class HexitecFem():
         # Give access to parent class (Hexitec)
         self.parent = parent
         self.x10g_rdma = None
+        # Spare read-modify-write round trips when updating control register fields
+        self.register_shadow = RegisterShadow(HEX_REGISTERS, mode=config.get("register_shadow", "cache"))
+        # Status fields polled during acquisition, their masks and shifts looked up once
+        register_map = self.register_shadow.register_map
+        self.trigger_done_field = \
+            register_map.HEXITEC_2X6_HEXITEC_CTRL.get_field("HEXITEC_ACQ_FALSE_TRIGGER_DONE")
+        self.acq_complete_field = register_map.HEXITEC_2X6_HEADER_STATUS.get_field("ACQ_COMPLETE")
 
         # Construct path to hexitec installed config files
         self.control_config_path = self.parent.control_config_path
@@ -108,10 +129,16 @@ class HexitecFem():
         self.number_vsrs = len(self.vsr_addr_mapping.keys())
         self.broadcast_VSRs = None
         self.vsr_list = []
+        # Broadcast commands identical for every VSR, rather than repeat them per VSR
+        self.vsr_planner = VsrCommandPlanner()
+        # Check each VSR still answers after a broadcast; Costs a UART round trip per VSR, so off by default
+        self.verify_broadcasts = bool(distutils.util.strtobool(str(config.get("verify_broadcasts", "false"))))
         self.vcal_enabled = 0
 
         # Acquisition completed, note completion timestamp
         self.acquisition_completed = False
+        # Poll fem more often as expected end of data transmission approaches
+        self.acquire_poller = AdaptivePoller(minimum=0.01, maximum=0.1)
 
         self.debug = False
         # Diagnostics:
@@ -131,8 +158,19 @@ class HexitecFem():
         self.hv_list = [0, 0, 0, 0, 0, 0]
         self.sync_list = [0, 0, 0, 0, 0, 0]
 
+        # Sample sensors in the background every telemetry_interval seconds (0 = off), while idle
+        self.telemetry_interval = float(config.get("telemetry_interval", 10.0))
+        self.telemetry_metrics = ["ambient", "humidity", "asic1", "asic2", "adc", "hv"]
+        self.telemetry = {metric: TelemetryBuffer(channels=6) for metric in self.telemetry_metrics}
+        self.telemetry_handle = None
+        self.telemetry_in_progress = False
+        # Held while a VSR is accessed, so sampling and acquisition never interleave
+        self.hardware_lock = threading.Lock()
+
         self.hv_bias_enabled = False
         self.system_initialised = False
+        # Settings last written into hardware (None: Full initialisation required)
+        self.applied_state = None
 
         self.read_firmware_version = True
         self.firmware_date = "N/A"
@@ -142,6 +180,9 @@ class HexitecFem():
         # Variables supporting handling of ini-style hexitec config file
         self.hexitec_config = self.control_config_path + "hexitec_unified_CSD__performance.ini"
         self.hexitec_parameters = {}
+        # Compiled hexitec_config, recompiled only if file changes
+        self.config_cache = HexitecConfigCache()
+        self.hexitec_config_model = None
 
         self.acquire_start_time = ""
         self.acquire_stop_time = ""
@@ -214,7 +255,13 @@ class HexitecFem():
             "vsr_adc_list": (lambda: self.adc_list, None),
             "vsr_hv_list": (lambda: self.hv_list, None),
             "vcal_enabled": (lambda: self.vcal_enabled, None),
-            "vsr_sync_list": (lambda: self.sync_list, None)
+            "vsr_sync_list": (lambda: self.sync_list, None),
+            "telemetry": {
+                "interval": (lambda: self.telemetry_interval, self.set_telemetry_interval),
+                "in_progress": (lambda: self.telemetry_in_progress, None),
+                "samples": (lambda: self.telemetry["ambient"].count, None),
+                "statistics": (self.get_telemetry_statistics, None)
+            }
         }
 
         self.param_tree = ParameterTree(param_tree_dict)
@@ -515,93 +562,19 @@ class HexitecFem():
         """Determine Farm Mode configuration, based on Odin instances and frames per trigger.
 
         Round-robin, N frames (per trigger) to each Odin instance."""
-        lut_entries = frames_per_trigger * (len(ip_addresses) // 2)
-        ip_lut1 = []
-        ip_lut2 = []
-        mac_lut1 = []
-        mac_lut2 = []
-        port_lut1 = []
-        port_lut2 = []
-        frame_count = 0
-        current_instance = 0
-        index = 0
-        offset = 0
-        while index < lut_entries:
-            if (offset % 2) == 0:
-                if (index % 2) == 0:  # Even
-                    ip_lut1.append(ip_addresses[current_instance])
-                    mac_lut1.append(macs[current_instance])
-                    port_lut1.append(ports[current_instance])
-                else:
-                    ip_lut2.append(ip_addresses[current_instance+1])
-                    mac_lut2.append(macs[current_instance+1])
-                    port_lut2.append(ports[current_instance+1])
-            else:
-                if (index % 2) == 0:  # Even
-                    ip_lut1.append(ip_addresses[current_instance+1])
-                    mac_lut1.append(macs[current_instance+1])
-                    port_lut1.append(ports[current_instance+1])
-                else:
-                    ip_lut2.append(ip_addresses[current_instance])
-                    mac_lut2.append(macs[current_instance])
-                    port_lut2.append(ports[current_instance])
-            frame_count += 1
-            if frame_count == frames_per_trigger:
-                frame_count = 0
-                current_instance += 2
-                offset += 1
-            index += 1
-        return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+        return FarmMode.epac_triggering_farm_mode_config(ip_addresses, macs, ports, frames_per_trigger)
 
     def nxct_untriggering_farm_mode_config(self, ip_addresses, macs, ports):
         """Determine NXCT's Farm Mode configuration, untriggered mode.
 
         Round-robin, one frame to Odin instance."""
-        lut_entries = len(ip_addresses)
-        ip_lut1 = []
-        ip_lut2 = []
-        mac_lut1 = []
-        mac_lut2 = []
-        port_lut1 = []
-        port_lut2 = []
-        index = 0
-        while index < lut_entries:
-            if (index % 2) == 0:
-                ip_lut1.append(ip_addresses[index])
-                mac_lut1.append(macs[index])
-                port_lut1.append(ports[index])
-            else:
-                ip_lut2.append(ip_addresses[index])
-                mac_lut2.append(macs[index])
-                port_lut2.append(ports[index])
-            index += 1
-        return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+        return FarmMode.nxct_untriggering_farm_mode_config(ip_addresses, macs, ports)
 
     def epac_untriggering_farm_mode_config(self, ip_addresses, macs, ports):
         """Determine EPAC's Farm Mode configuration, untriggered mode.
 
         Round-robin, one frame to Odin instance."""
-        lut_entries = len(ip_addresses)
-        ip_lut1 = []
-        ip_lut2 = []
-        mac_lut1 = []
-        mac_lut2 = []
-        port_lut1 = []
-        port_lut2 = []
-        index = 0
-        added_entries = 0
-        while index < lut_entries:
-            if (added_entries % 2) == 0:
-                ip_lut1.append(ip_addresses[index])
-                mac_lut1.append(macs[index])
-                port_lut1.append(ports[index])
-            else:
-                ip_lut2.append(ip_addresses[index])
-                mac_lut2.append(macs[index])
-                port_lut2.append(ports[index])
-            index += 2
-            added_entries += 1
-        return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+        return FarmMode.epac_untriggering_farm_mode_config(ip_addresses, macs, ports)
 
     def populate_lists(self, entries):
         """Spread entries of one list into 2 lists, of equal lengths.
@@ -656,6 +629,8 @@ class HexitecFem():
             self.x10g_rdma = RdmaUDP(local_ip=self.server_ctrl_ip, local_port=self.server_ctrl_port,
                                      rdma_ip=self.camera_ctrl_ip, rdma_port=self.camera_ctrl_port,
                                      udptimeout=2, debug=False, uart_offset=0x0)
+            self.register_shadow.invalidate()
+            self.applied_state = None
             self.broadcast_VSRs = \
                 VsrModule(self.x10g_rdma, slot=0, init_time=0, addr_mapping=self.vsr_addr_mapping)
             self.vsr_list = []
@@ -729,9 +704,11 @@ class HexitecFem():
                 self.firmware_version = fw_version
                 self.read_firmware_version = False
 
-            for vsr in self.vsr_list:
-                self.read_temperatures_humidity_values(vsr)
-                self.read_pwr_voltages(vsr)  # pragma: no cover
+            with self.hardware_lock:
+                for vsr in self.vsr_list:
+                    self.read_temperatures_humidity_values(vsr)
+                    self.read_pwr_voltages(vsr)  # pragma: no cover
+            self.record_telemetry()
         except HexitecFemError as e:
             self.flag_error("Failed to read sensors", str(e))
         except Exception as e:
@@ -742,6 +719,76 @@ class HexitecFem():
         self.environs_in_progress = False
         self.hardware_busy = False
 
+    def set_telemetry_interval(self, interval):
+        """Set seconds between background sensor samples, 0 disables sampling."""
+        if interval < 0:
+            raise ParameterTreeError("Telemetry interval cannot be negative")
+        self.telemetry_interval = interval
+        self.start_telemetry()
+
+    def start_telemetry(self):
+        """(Re)schedule background sensor sampling."""
+        self.stop_telemetry()
+        if self.telemetry_interval > 0:
+            self.telemetry_handle = IOLoop.instance().call_later(self.telemetry_interval,
+                                                                 self.telemetry_tick)
+
+    def stop_telemetry(self):
+        """Cancel background sensor sampling."""
+        if self.telemetry_handle is not None:
+            IOLoop.instance().remove_timeout(self.telemetry_handle)
+            self.telemetry_handle = None
+
+    def telemetry_tick(self):
+        """Sample sensors unless hardware needed elsewhere, then schedule next sample."""
+        self.telemetry_handle = None
+        if not self.hardware_connected:
+            return
+        if not (self.telemetry_in_progress or self.telemetry_should_yield()):
+            self.telemetry_in_progress = True
+            self.sample_telemetry()
+        self.start_telemetry()
+
+    def telemetry_should_yield(self):
+        """Return whether hardware is, or is about to be, in use for anything but sampling."""
+        return self.hardware_busy or self.parent.daq.in_progress or \
+            (self.parent.software_state not in ("Idle", "Ready", "Cleared"))
+
+    @run_on_executor(executor='thread_executor')
+    def sample_telemetry(self):
+        """Read each VSR's sensors into telemetry, abandoning the sample if hardware needed."""
+        try:
+            for vsr in self.vsr_list:
+                if self.telemetry_should_yield():
+                    return
+                with self.hardware_lock:
+                    self.read_temperatures_humidity_values(vsr)
+                    self.read_pwr_voltages(vsr)
+            self.record_telemetry()
+        except Exception as e:
+            logging.warning("Telemetry sampling failed: {}".format(e))
+        finally:
+            self.telemetry_in_progress = False
+
+    def record_telemetry(self, timestamp=None):
+        """Append latest sensor values to their telemetry buffers."""
+        latest = [self.ambient_list, self.humidity_list, self.asic1_list, self.asic2_list,
+                  self.adc_list, self.hv_list]
+        sample = {}
+        for metric, values in zip(self.telemetry_metrics, latest):
+            try:
+                values = [float(value) for value in values]
+            except (TypeError, ValueError):
+                values = [None] * len(values)
+            self.telemetry[metric].append(values, timestamp)
+            sample.update({"vsr{}_{}".format(index + 1, metric): value
+                           for index, value in enumerate(values)})
+        self.parent.telemetry.append(sample, timestamp)
+
+    def get_telemetry_statistics(self):
+        """Return min, max, mean of each sensor, per VSR, across telemetry buffers."""
+        return {metric: self.telemetry[metric].statistics() for metric in self.telemetry_metrics}
+
     def disconnect(self):
         """Disconnect hardware connection."""
         # Close network socket without hardware interactions if leak fault detected
@@ -850,10 +897,8 @@ class HexitecFem():
         """Power up and enable VSRs."""
         try:
             self.data_path_reset()
-            self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr'],
-                                          data=0x0, burst_len=1)
-            self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr'],
-                                          data=0x1, burst_len=1)
+            self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, 0x0)
+            self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, 0x1)
 
             self.hardware_connected = True
             self._set_status_message("Camera connected.")
@@ -897,8 +942,12 @@ class HexitecFem():
         try:
             self.hardware_busy = True
             self.parent.software_state = "Initialising"
+            plan = self.plan_reconfiguration()
+            if plan is not None:
+                # Timing, farm mode unchanged: Skip data lanes, reinitialise only changed VSRs
+                self.reconfigure_system(plan)
             # Seup Farm Mode (again), then initialise
-            if (self.parent.operating_mode == "EPAC") and self.triggering_mode == "triggered":
+            elif (self.parent.operating_mode == "EPAC") and self.triggering_mode == "triggered":
                 # EPAC triggered mode, firmware to handle dummy trigger prior to data arriving
                 success = self.broadcast_VSRs.enable_module()
                 vsr_statuses = self.broadcast_VSRs._get_status(hv=False, all_vsrs=True)
@@ -925,7 +974,9 @@ class HexitecFem():
         try:
             self.hardware_busy = True
             self._set_status_message("Prep to acquire data..")
-            self.acquire_data_prep()
+            # Await any sensor sample in progress
+            with self.hardware_lock:
+                self.acquire_data_prep()
         except Exception as e:
             error = "Data acquisition failed"
             self.flag_error(error, str(e))
@@ -968,12 +1019,14 @@ class HexitecFem():
         logging.debug("Modules Enabled")
         self._set_status_message("VSRs booted")
         self.hardware_busy = False
+        self.start_telemetry()
         self.parent.daq.commit_configuration()
         self.parent.software_state = "Idle"
 
     def cam_disconnect(self):
         """Send commands to disconnect camera."""
         self.hardware_connected = False
+        self.stop_telemetry()
         try:
             # Only disable VSRs if detector is (still) powered
             if self.parent.leak_fault_counter == 0:
@@ -993,6 +1046,7 @@ class HexitecFem():
             self.flag_error(error, str(e))
             raise HexitecFemError("%s; %s" % (e, "No active connection"))
         self.system_initialised = False
+        self.applied_state = None
 
     def acquire_data_prep(self):
         """Acquire data, poll fem for completion."""
@@ -1017,6 +1071,7 @@ class HexitecFem():
             if (self.parent.operating_mode == "EPAC") and self.triggering_mode == "triggered":
                 self.set_bit(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, "HEXITEC_ACQ_TRIGGER_INIT")
                 self.reset_bit(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, "HEXITEC_ACQ_TRIGGER_INIT")
+                self.acquire_poller.reset()
                 IOLoop.instance().call_later(0.2, self.acquire_data_await_dummy_trigger_processed)
             else:
                 # Untriggered mode, don't need handle dummy trigger
@@ -1026,6 +1081,7 @@ class HexitecFem():
             self.flag_error(error, str(e))
             self.hardware_busy = False
             self.parent.daq.in_progress = False
+            self.parent.daq.discard_staged_metadata()
             raise ParameterTreeError(error) from None
 
     def acquire_data_await_dummy_trigger_processed(self):
@@ -1036,8 +1092,8 @@ class HexitecFem():
                 self.x10g_rdma.udp_rdma_read(
                     address=HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr'],
                     burst_len=1)[0]
-            trigger_processed = rdma.decode_field(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL,
-                                                  "HEXITEC_ACQ_FALSE_TRIGGER_DONE", status)
+            field = self.trigger_done_field
+            trigger_processed = (status & field.mask) >> field.shiftr
             # Register bit set (0x1) when dummy trigger processed, cleared otherwise
             if (trigger_processed & 1) == 1:
                 # Dummy trigger processed, start acquisition
@@ -1045,7 +1101,8 @@ class HexitecFem():
                 self.acquire_data_ready()
             else:
                 # Not yet processed
-                IOLoop.instance().call_later(0.1, self.acquire_data_await_dummy_trigger_processed)
+                IOLoop.instance().call_later(self.acquire_poller.next_interval(),
+                                             self.acquire_data_await_dummy_trigger_processed)
         except socket_error as e:
             self.flag_error("Awaiting dummy trigger processing Error", str(e))
             self.hardware_connected = False
@@ -1061,12 +1118,13 @@ class HexitecFem():
             logging.debug("Disable data")
             self.data_en(enable=False)
 
-            IOLoop.instance().call_later(0.1, self.check_acquire_finished)
+            IOLoop.instance().call_later(self.acquire_poller.reset(), self.check_acquire_finished)
         except Exception as e:
             error = "Failed to start acquire_data_ready"
             self.flag_error(error, str(e))
             self.hardware_busy = False
             self.parent.daq.in_progress = False
+            self.parent.daq.discard_staged_metadata()
             raise ParameterTreeError(error) from None
 
     def check_acquire_finished(self):
@@ -1083,9 +1141,12 @@ class HexitecFem():
                         address=HEX_REGISTERS.HEXITEC_2X6_HEADER_STATUS['addr'],
                         burst_len=1)[0]
                 # 0 during data transmission, 65536 when completed
-                self.all_data_sent = (status & 65536)
+                self.all_data_sent = (status & self.acq_complete_field.mask)
                 if self.all_data_sent == 0:
-                    IOLoop.instance().call_later(0.1, self.check_acquire_finished)
+                    time_remaining = self.parent.daq.calculate_remaining_collection_time()
+                    delay = self.acquire_poller.next_interval(progressed=True,
+                                                              time_remaining=time_remaining)
+                    IOLoop.instance().call_later(delay, self.check_acquire_finished)
                     return
                 else:
                     self.acquire_data_completed()
@@ -1122,6 +1183,7 @@ class HexitecFem():
             self.acquisition_completed = True
             self._set_status_message("Acquire cancelled")
             self.system_initialised = False
+            self.applied_state = None
             return
 
         # Workout exact duration of fem data transmission:
@@ -1141,6 +1203,8 @@ class HexitecFem():
 
         # Fem finished sending data/monitoring info, clear hardware busy
         self.hardware_busy = False
+        # Let DAQ move onto processing without waiting for its next poll
+        self.parent.daq.notify_status_change()
 
         # Wrap up by updating GUI
 
@@ -1352,70 +1416,22 @@ class HexitecFem():
             expected_duration = 8192 / self.frame_rate
             timeout = (expected_duration * 1.2) + 1
             self.hardware_busy = True
+            self.applied_state = None
             # Reset sync status
             for vsr in self.vsr_list:
                 index = vsr.addr - self.vsr_base_address
                 self.sync_list[index] = 0
-                # Stop trigger state machine - Otherwise VSRs will not initialise/updated
-                vsr.stop_trigger_sm()
+            # Stop trigger state machine - Otherwise VSRs will not initialise/updated
+            self.send_to_all_vsrs([("stop_trigger_sm", ())])
 
+            # Configure every VSR first, so their dark (DC) captures run concurrently
             for vsr in self.vsr_list:
                 vsr_id = vsr.addr-143
                 logging.debug(" --- Initialising VSR: 0x{0:X} ---".format(vsr_id))
                 self._set_status_message("Initialising VSR{}..".format(vsr_id))
                 vsr.enable_vcal(self.vcal_enabled)
                 self.initialise_vsr(vsr)
-                # Check PLLs locked
-                bPolling = True
-                time_taken = 0
-                beginning = time.time()
-                while bPolling:
-                    pll_lock = vsr.read_pll_status()
-                    if pll_lock & 1:
-                        bPolling = False
-                    else:
-                        time.sleep(0.1)
-                        time_taken += 0.1
-                    if time.time() - beginning > timeout:
-                        logging.error("VSR{0:X} R.89 took long: {1:2.5} s".format(
-                            vsr_id, time_taken))
-                        raise HexitecFemError(f"VSR{vsr_id} Timed out awaiting DC Capture Ready")
-
-                logging.debug("VSR{0:X} DC Capture ready took: {1} s".format(
-                    vsr_id, round(time_taken, 3)))
-
-            logging.debug("LVDS Training")
-            self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL['addr'],
-                                          data=0x10, burst_len=1, comment=" ")  # EN_TRAINING
-            time.sleep(0.2)
-            self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL['addr'],
-                                          data=0x00, burst_len=1, comment=" ")  # Disable training
-
-            lock_status = self.x10g_rdma.udp_rdma_read(address=0x3e8, burst_len=self.number_vsrs)
-            for vsr in self.vsr_list:
-                if lock_status[vsr.slot-1] == 255:
-                    logging.debug(f"VSR{vsr.slot} lock_status: {lock_status[vsr.slot-1]}")
-                else:
-                    logging.error(f"VSR{vsr.slot} lock_status: {lock_status[vsr.slot-1]}")
-
-            vsr_status_addr = HEX_REGISTERS.HEXITEC_2X6_VSR0_STATUS['addr']
-            for vsr in self.vsr_list:
-                index = vsr.addr - self.vsr_base_address
-                locked = self.x10g_rdma.udp_rdma_read(vsr_status_addr, burst_len=1,
-                                                      comment=f"VSR {index} status register")[0]
-                if (locked == 0xFF):
-                    logging.debug("VSR{0} Locked (0x{1:X})".format(index+1, locked))
-                else:
-                    message = "VSR{0} Error".format(index+1)
-                    error = "Incomplete lock (0x{0:X})".format(locked)
-                    self.flag_error(message, error)
-                vsr_status_addr += 4
-                # Record sync status
-                self.sync_list[index] = locked
-
-            logging.debug("Disabling training for vsr(s)..")
-            for vsr in self.vsr_list:
-                vsr._disable_training()
+            self.train_vsrs(self.vsr_list, timeout)
 
             self.start_trigger = True
 
@@ -1427,6 +1443,7 @@ class HexitecFem():
             self._set_status_message("Initialisation completed. VSRs configured.")
             self.parent.software_state = "Ready"
             self.system_initialised = True
+            self.applied_state = self.get_configuration_state()
         except HexitecFemError as e:
             self.flag_error("Failed to initialise camera", str(e))
         except OSError as e:
@@ -1437,6 +1454,151 @@ class HexitecFem():
             self.flag_error("Camera initialisation failed", str(e))
         self.hardware_busy = False
 
+    def train_vsrs(self, vsrs, timeout):
+        """Await vsrs' dark (DC) capture, then train and lock LVDS links.
+
+        Follows vsr.initialise(), which (re-)enables training and starts the DC capture.
+        Returns whether all of vsrs locked.
+        """
+        self._set_status_message("Awaiting VSR(s) DC Capture..")
+        self.await_dc_capture_ready(vsrs, timeout)
+
+        logging.debug("LVDS Training")
+        self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL,
+                                   0x10)  # EN_TRAINING
+        time.sleep(0.2)
+        self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL,
+                                   0x00)  # Disable training
+
+        lock_status = self.x10g_rdma.udp_rdma_read(address=0x3e8, burst_len=self.number_vsrs)
+        for vsr in self.vsr_list:
+            if lock_status[vsr.slot-1] == 255:
+                logging.debug(f"VSR{vsr.slot} lock_status: {lock_status[vsr.slot-1]}")
+            else:
+                logging.error(f"VSR{vsr.slot} lock_status: {lock_status[vsr.slot-1]}")
+
+        all_locked = self.check_vsrs_locked(vsrs)
+
+        logging.debug("Disabling training for vsr(s)..")
+        self.send_to_all_vsrs([("_disable_training", ())])
+        return all_locked
+
+    def check_vsrs_locked(self, vsrs):
+        """Read each of vsrs' status register, flag any VSR without complete lock."""
+        all_locked = True
+        for vsr in vsrs:
+            index = vsr.addr - self.vsr_base_address
+            vsr_status_addr = HEX_REGISTERS.HEXITEC_2X6_VSR0_STATUS['addr'] + (vsr.slot - 1) * 4
+            locked = self.x10g_rdma.udp_rdma_read(vsr_status_addr, burst_len=1,
+                                                  comment=f"VSR {index} status register")[0]
+            if (locked == 0xFF):
+                logging.debug("VSR{0} Locked (0x{1:X})".format(index+1, locked))
+            else:
+                message = "VSR{0} Error".format(index+1)
+                error = "Incomplete lock (0x{0:X})".format(locked)
+                self.flag_error(message, error)
+                all_locked = False
+            # Record sync status
+            self.sync_list[index] = locked
+        return all_locked
+
+    def get_configuration_state(self):
+        """Return snapshot of settings written into hardware by initialisation."""
+        farm_mode_frames = self.triggering_frames if self.triggering_mode == "triggered" else None
+        return {
+            "timing": {setting: getattr(self, setting) for setting in self.TIMING_SETTINGS},
+            "vsr": {setting: getattr(self, setting) for setting in self.VSR_SETTINGS},
+            "triggering": {setting: getattr(self, setting) for setting in self.TRIGGER_SETTINGS},
+            "farm_mode": (self.parent.operating_mode, self.triggering_mode, farm_mode_frames),
+            "vsr_addr_mapping": dict(self.vsr_addr_mapping),
+            "config": self.hexitec_config_model
+        }
+
+    def plan_reconfiguration(self):
+        """Compare current settings against those last applied.
+
+        Returns None if full initialisation required, otherwise dictionary of VSRs to
+        reinitialise ("vsrs"), whether DAC values changed ("dac", every VSR), VSRs whose
+        enables changed ("enables") and whether hardware triggering changed ("triggering").
+        """
+        applied = self.applied_state
+        if applied is None:
+            return None
+        state = self.get_configuration_state()
+        for key in ["timing", "farm_mode", "vsr_addr_mapping"]:
+            if state[key] != applied[key]:
+                return None
+        if (state["config"] is None) or (applied["config"] is None):
+            return None
+        dac = state["vsr"] != applied["vsr"]
+        # VSRs whose enables changed (ini: V1 = 0x90, .., V6 = 0x95)
+        changed = state["config"].changed_vsrs(applied["config"])
+        enables = [vsr for vsr in self.vsr_list if (vsr.addr - 143) in changed]
+        vsrs = list(self.vsr_list) if dac else enables
+        return {"vsrs": vsrs, "dac": dac, "enables": enables,
+                "triggering": state["triggering"] != applied["triggering"]}
+
+    @run_on_executor(executor='thread_executor')
+    def reconfigure_system(self, plan):
+        """Write only changed settings, leaving data lanes and Farm Mode as applied.
+
+        Each VsrModule still holds the settings staged by the last initialisation, so
+        only changed DAC values and enables are staged before vsr.initialise() writes
+        them; Which restarts the DC capture and LVDS training, awaited as in full.
+        """
+        try:
+            expected_duration = 8192 / self.frame_rate
+            timeout = (expected_duration * 1.2) + 1
+            self.hardware_busy = True
+            vsrs = plan["vsrs"]
+            if vsrs or plan["triggering"]:
+                self.applied_state = None
+                self.send_to_all_vsrs([("stop_trigger_sm", ())])
+                for vsr in vsrs:
+                    self._set_status_message("Reconfiguring VSR{}..".format(vsr.addr-143))
+                    if plan["dac"]:
+                        self.write_dac_values(vsr)
+                    if vsr in plan["enables"]:
+                        self.load_pwr_cal_read_enables(vsr)
+                    vsr.initialise()
+                if vsrs and not self.train_vsrs(vsrs, timeout):
+                    raise HexitecFemError("VSR(s) lost lock, initialise in full")
+                self.start_trigger = True
+                self.configure_hardware_triggering()
+            self._set_status_message("Reconfiguration completed. {} VSR(s) updated.".format(len(vsrs)))
+            self.parent.software_state = "Ready"
+            self.system_initialised = True
+            self.applied_state = self.get_configuration_state()
+        except HexitecFemError as e:
+            self.flag_error("Failed to reconfigure camera", str(e))
+        except OSError as e:
+            self.flag_error("Detector reconfiguration failed", str(e))
+            self.parent.leak_fault_counter = 1
+            self.hardware_connected = True
+        except Exception as e:
+            self.flag_error("Camera reconfiguration failed", str(e))
+        self.hardware_busy = False
+
+    def await_dc_capture_ready(self, vsrs, timeout):
+        """Poll each of vsrs' PLL status until all report DC capture ready, or timeout lapses."""
+        pending = list(vsrs)
+        time_taken = 0
+        beginning = time.time()
+        while pending:
+            for vsr in list(pending):
+                if vsr.read_pll_status() & 1:
+                    logging.debug("VSR{0:X} DC Capture ready took: {1} s".format(
+                        vsr.addr-143, round(time_taken, 3)))
+                    pending.remove(vsr)
+            if not pending:
+                break
+            time.sleep(0.1)
+            time_taken += 0.1
+            if time.time() - beginning > timeout:
+                vsr_id = pending[0].addr-143
+                logging.error("VSR{0:X} R.89 took long: {1:2.5} s".format(vsr_id, time_taken))
+                raise HexitecFemError(f"VSR{vsr_id} Timed out awaiting DC Capture Ready")
+
     def initialise_vsr(self, vsr):
         """Initialise a VSR."""
         # Original aSpect VSR config recipe split into sections of block quotes
@@ -1506,27 +1668,43 @@ class HexitecFem():
     def configure_hardware_triggering(self):
         """Configures hardware triggering options."""
         try:
-            for vsr in self.vsr_list:
-                vsr.set_trigger_mode_number_frames(self.triggering_frames)
-                vsr.write_trigger_mode_number_frames()
-
-                if self.enable_trigger_mode:
-                    vsr.enable_trigger_mode_trigger_two_and_three()
-                else:
-                    vsr.disable_trigger_mode_trigger_two_and_three()
+            commands = [("set_trigger_mode_number_frames", (self.triggering_frames,)),
+                        ("write_trigger_mode_number_frames", ())]
+            if self.enable_trigger_mode:
+                commands.append(("enable_trigger_mode_trigger_two_and_three", ()))
+            else:
+                commands.append(("disable_trigger_mode_trigger_two_and_three", ()))
 
-                if self.enable_trigger_input:
-                    vsr.enable_trigger_input_two_and_three()
-                else:
-                    vsr.disable_trigger_input_two_and_three()
+            if self.enable_trigger_input:
+                commands.append(("enable_trigger_input_two_and_three", ()))
+            else:
+                commands.append(("disable_trigger_input_two_and_three", ()))
 
-                if self.start_trigger:
-                    vsr.start_trigger_sm()
-                else:
-                    vsr.stop_trigger_sm()
+            if self.start_trigger:
+                commands.append(("start_trigger_sm", ()))
+            else:
+                commands.append(("stop_trigger_sm", ()))
+            self.send_to_all_vsrs(commands)
         except Exception as e:
             self.flag_error("Configure hardware triggering Error", str(e))
 
+    def send_to_all_vsrs(self, commands):
+        """Send the same commands to every VSR, by broadcast where more than one VSR."""
+        self.vsr_planner.execute(self.broadcast_VSRs, {vsr: commands for vsr in self.vsr_list},
+                                 verify=self.verify_vsr if self.verify_broadcasts else None)
+
+    def verify_vsr(self, vsr):
+        """Check VSR still answers at its own address (by reading its PLL status) after a broadcast.
+
+        This only shows the VSR is responsive, not that it applied the broadcast command(s).
+        """
+        try:
+            vsr.read_pll_status()
+        except Exception as e:
+            logging.warning("VSR{0:X} failed to answer after broadcast: {1}".format(vsr.addr-143, e))
+            return False
+        return True
+
     def display_debugging(self, message):  # pragma: no cover
         timestamp = self.create_iso_timestamp()
         # Append to errors_history list, nested list of timestamp, error message
@@ -1609,8 +1787,9 @@ class HexitecFem():
 
         try:
             logging.debug("Loading INI file settings..")
-            # Read INI file contents, parse key/value pairs into hexitec_parameters argument
-            self.read_ini_file(self.hexitec_config, self.hexitec_parameters, debug=False)
+            # Compile INI file contents (unless unchanged since last loaded)
+            self.hexitec_config_model = self.config_cache.load(self.hexitec_config)
+            self.hexitec_parameters = self.hexitec_config_model.parameters
 
             # Recalculate frame rate
             row_s1 = self._extract_integer(self.hexitec_parameters, 'Control-Settings/Row -> S1',
@@ -1665,7 +1844,7 @@ class HexitecFem():
                                                         'Control-Settings/Uref_mid', bit_range=12)
             self.vcal_value = self._extract_float(self.hexitec_parameters, 'Control-Settings/VCAL')
             self.calculate_frame_rate()
-        except HexitecFemError as e:
+        except (HexitecFemError, HexitecConfigError) as e:
             self.flag_error("INI File Key Error", str(e))
 
     def populate_vsr_addr_mapping(self, vsrs_selected):
@@ -1836,6 +2015,10 @@ class HexitecFem():
 
     def _extract_80_bits(self, param, vsr, asic, channel_or_block):  # noqa: C901
         """Extract 80 bits from four (20 bit) channels, assembling one ASIC's row/column."""
+        config = self.hexitec_config_model
+        if (config is not None) and (config.parameters is self.hexitec_parameters):
+            # Enables already compiled when file loaded
+            return config.get_enables(param, vsr, asic, channel_or_block)
         # vsr = 1
         # asic = 1
         # param = "ColumnEn_"
@@ -1914,16 +2097,6 @@ class HexitecFem():
         low_encoded = self.HEX_ASCII_CODE[low_int]
         return high_encoded, low_encoded
 
-    def read_ini_file(self, filename, parameter_dict, debug=False):
-        """Read filename, parse case sensitive keys decoded as strings into parameter_dict."""
-        parser = configparser.ConfigParser()
-        # Maintain case-sensitivity:
-        parser.optionxform = str
-        parser.read(filename)
-        for section in parser.sections():
-            for key, value in parser.items(section):
-                parameter_dict[section + "/" + key] = value.strip("\"")
-
     def translate_to_normal_hex(self, value):
         """Translate Aspect encoding into 0-F equivalent scale."""
         if value not in self.HEX_ASCII_CODE:
@@ -2014,14 +2187,10 @@ class HexitecFem():
         self.log_messages = [(str(timestamp), log_message) for timestamp, log_message in logs]
 
     def set_bit(self, register, field):
-        reg_value = int(self.x10g_rdma.udp_rdma_read(register['addr'])[0])
-        ctrl_reg = rdma.set_field(register, field, reg_value, 1)
-        self.x10g_rdma.udp_rdma_write(register['addr'], ctrl_reg)
+        self.register_shadow.update_fields(self.x10g_rdma, register, {field: 1})
 
     def reset_bit(self, register, field):
-        reg_value = int(self.x10g_rdma.udp_rdma_read(register['addr'])[0])
-        ctrl_reg = rdma.clr_field(register, field, reg_value)
-        self.x10g_rdma.udp_rdma_write(register['addr'], ctrl_reg)
+        self.register_shadow.update_fields(self.x10g_rdma, register, {field: 0})
 
     def data_path_reset(self):
         """Take Kintex data path out of reset."""
@@ -2030,10 +2199,8 @@ class HexitecFem():
 
     def frame_reset_to_zero(self):
         """Reset Firmware frame number to 0."""
-        self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_FRAME_PRELOAD_LOWER['addr'],
-                                      data=0x0, burst_len=1)
-        self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_FRAME_PRELOAD_UPPER['addr'],
-                                      data=0x0, burst_len=1)
+        self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_FRAME_PRELOAD_LOWER, 0x0)
+        self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_FRAME_PRELOAD_UPPER, 0x0)
         self.set_bit(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL, "FRAME_COUNTER_LOAD")
         self.reset_bit(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL, "FRAME_COUNTER_LOAD")
 
@@ -2041,8 +2208,8 @@ class HexitecFem():
         """Set number of frames in Firmware."""
         # Frame limited mode
         self.set_bit(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL, "ACQ_NOF_FRAMES_EN")
-        self.x10g_rdma.udp_rdma_write(address=HEX_REGISTERS.HEXITEC_2X6_ACQ_NOF_FRAMES_LOWER['addr'],
-                                      data=number_frames, burst_len=1)
+        self.register_shadow.write(self.x10g_rdma, HEX_REGISTERS.HEXITEC_2X6_ACQ_NOF_FRAMES_LOWER,
+                                   number_frames)
 
     def data_en(self, enable=True):
         if enable:
@@ -0,0 +1,154 @@
+"""
+MetadataWriter: Serialise parameter trees into HDF5 meta data.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import logging
+import json
+import time
+
+import h5py
+import numpy as np
+
+
+class MetadataWriter():
+    """
+    Write (nested) dictionaries into an open HDF5 file.
+
+    Two modes are supported:
+    legacy  - each leaf is written as its own dataset (one per key), the default
+    compact - each subtree below group_depth is stored as a single JSON string
+              dataset, scalars above that depth as JSON attributes of their group
+              (opt-in; readers of legacy files cannot read this layout)
+    """
+
+    MODES = ["legacy", "compact"]
+    # Telemetry is written separately, as time-series datasets
+    SKIP_KEYS = ("errors_history", "log_messages", "telemetry")
+
+    def __init__(self, mode="legacy", group_depth=2, error_callback=None):
+        """
+        Initialize the MetadataWriter object.
+
+        :param mode: serialisation mode, one of MODES
+        :param group_depth: compact mode; levels kept as HDF5 groups above JSON blobs
+        :param error_callback: called as callback(message, error) if a key cannot be written
+        """
+        self.mode = None
+        self.set_mode(mode)
+        self.group_depth = group_depth
+        self.error_callback = error_callback
+        self.str_type = h5py.special_dtype(vlen=str)
+        self.write_time = 0.0
+
+    def set_mode(self, mode):
+        """Set serialisation mode."""
+        if mode not in self.MODES:
+            raise ValueError("Invalid metadata mode; Valid options: {}".format(self.MODES))
+        self.mode = mode
+
+    def write(self, hdf_file, path, tree):
+        """Convert tree once, then write it into hdf_file beneath path."""
+        start = time.perf_counter()
+        tree = self.convert(tree)
+        if self.mode == "compact":
+            self._write_compact(hdf_file, path, tree, self.group_depth)
+        else:
+            self._write_legacy(hdf_file, path, tree)
+        self.write_time = time.perf_counter() - start
+        return self.write_time
+
+    def patch(self, hdf_file, path, staged_tree, tree):
+        """Rewrite only the entries of tree that differ from the (already written) staged_tree."""
+        start = time.perf_counter()
+        self._patch(hdf_file, path, self.convert(staged_tree), self.convert(tree), self.group_depth)
+        self.write_time = time.perf_counter() - start
+        return self.write_time
+
+    def _patch(self, hdf_file, path, staged, tree, depth):
+        """Recurse into changed subtrees, replacing changed datasets/attributes."""
+        group = hdf_file.require_group(path)
+        if self.mode == "legacy":
+            staged = self._legacy_tree(staged)
+            tree = self._legacy_tree(tree)
+            # Remove entries no longer present (e.g. a shorter list of dictionaries)
+            for key in set(staged) - set(tree):
+                if key in group:
+                    del group[key]
+        for key, item in tree.items():
+            previous = staged.get(key)
+            if item == previous:
+                continue
+            descend = (self.mode == "legacy") or (depth > 1)
+            if isinstance(item, dict) and isinstance(previous, dict) and descend:
+                self._patch(hdf_file, path + key + '/', previous, item, depth - 1)
+                continue
+            if key in group:
+                del group[key]
+            if self.mode == "compact":
+                self._write_compact(hdf_file, path, {key: item}, depth)
+            else:
+                self._write_legacy(hdf_file, path, {key: item})
+
+    def convert(self, value):
+        """Return a copy of value with types HDF5/JSON can store, less skipped keys."""
+        if isinstance(value, dict):
+            return {key: self.convert(item) for key, item in value.items()
+                    if key not in self.SKIP_KEYS}
+        if isinstance(value, (list, tuple)):
+            if len(value) == 0:
+                return ["(empty)"]
+            return [self.convert(v) for v in value]
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        if value is None:
+            return str(value)
+        return value
+
+    def _write_compact(self, hdf_file, path, tree, depth):
+        """Write subtrees as JSON blobs, scalars as JSON attributes of their group."""
+        group = hdf_file.require_group(path)
+        for key, item in tree.items():
+            try:
+                if isinstance(item, dict) and depth > 1:
+                    self._write_compact(hdf_file, path + key + '/', item, depth - 1)
+                elif isinstance(item, dict):
+                    dataset = hdf_file.create_dataset(path + key, data=json.dumps(item),
+                                                      dtype=self.str_type)
+                    dataset.attrs['format'] = "json"
+                else:
+                    group.attrs[key] = json.dumps(item)
+            except (TypeError, ValueError) as e:
+                self._report_error(e, path, key, item)
+
+    def _legacy_tree(self, tree):
+        """Return tree with lists of dictionaries as dictionaries keyed key0, key1, .. (as legacy writes them)."""
+        return {key: self._legacy_item(key, item) for key, item in tree.items()}
+
+    def _legacy_item(self, key, item):
+        """Return list of dictionaries item as dictionary keyed key0, key1, .., otherwise item."""
+        if isinstance(item, list) and isinstance(item[0], dict):
+            return dict((key + str(i), entry) for i, entry in enumerate(item))
+        return item
+
+    def _write_legacy(self, hdf_file, path, tree):
+        """Traverse dictionary, write each key as native type to h5file."""
+        for key, item in self._legacy_tree(tree).items():
+            if isinstance(item, list) and not isinstance(item[0], str):
+                item = np.array(item)
+            if isinstance(item, dict):
+                self._write_legacy(hdf_file, path + key + '/', item)
+            else:
+                try:
+                    hdf_file[path + key] = item
+                except TypeError as e:
+                    self._report_error(e, path, key, item)
+
+    def _report_error(self, error, path, key, item):
+        """Log (and pass on) failure to write key."""
+        logging.error("Error: {} Parsing key: {}{} value: {}".format(error, path, key, item))
+        if self.error_callback:
+            self.error_callback("Parsing key: {}{} value: {}".format(path, key, item), str(error))
@@ -0,0 +1,154 @@
+"""
+PacketAnalysis: Packet loss, frame gap and timing analysis of a whole capture's Hexitec packet headers.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+from array import array
+import math
+
+import h5py
+import numpy as np
+
+from hexitec.PcapStream import PcapStream, START_OF_FRAME_MASK, END_OF_FRAME_MASK, PACKET_NUMBER_MASK
+
+# Header layouts as PacketHeader, PacketExtendedHeader of HexitecDefinitions.h
+HEADER = np.dtype([("frame_number", "<u4"), ("packet_number_flags", "<u4")])
+EXTENDED_HEADER = np.dtype([("frame_number", "<u8"), ("packet_number", "<u4"), ("packet_flags", "<u4")])
+
+PACKETS = np.dtype([("timestamp", "<i8"), ("frame_number", "<u8"), ("packet_number", "<u4"),
+                    ("start_of_frame", "?"), ("end_of_frame", "?"), ("size", "<u4")])
+
+FRAMES = np.dtype([("frame_number", "<u8"), ("packets", "<u4"), ("missing_packets", "<u4"),
+                   ("duplicate_packets", "<u4"), ("out_of_order_packets", "<u4"), ("start_of_frame", "?"),
+                   ("end_of_frame", "?"), ("complete", "?"), ("first_timestamp", "<i8"),
+                   ("last_timestamp", "<i8"), ("interval", "<i8")])
+
+
+def packets_per_frame(rows, columns, packet_size):
+    """
+    Return number of packets of packet_size (payload) bytes making up a frame of rows x columns pixels.
+
+    I.e. 2x6 frames are 20 packets of 7680 bytes (num_primary_packets of HexitecDefinitions.h),
+    2x2 frames 6 packets of 8000 bytes plus a tail packet of 3200 bytes.
+    """
+    return math.ceil(rows * columns * 2 / packet_size)
+
+
+def primary_packet_size(packets):
+    """Return most common payload size of packets, i.e. size of all but frames' tail packets."""
+    sizes, counts = np.unique(packets["size"], return_counts=True)
+    return int(sizes[np.argmax(counts)]) if sizes.size else 0
+
+
+def read_headers(filename, extended_headers, port=None):
+    """Return (PACKETS) array of timestamp, header and payload size of every packet in capture file."""
+    header_size = EXTENDED_HEADER.itemsize if extended_headers else HEADER.itemsize
+    headers = bytearray()
+    timestamps = array('q')
+    sizes = array('I')
+    with PcapStream(filename) as stream:
+        for timestamp, payload in stream.udp_payloads(port):
+            if len(payload) < header_size:
+                continue
+            headers += payload[:header_size]
+            timestamps.append(timestamp)
+            sizes.append(len(payload) - header_size)
+    if extended_headers:
+        header = np.frombuffer(headers, dtype=EXTENDED_HEADER)
+        packet_number = header["packet_number"]
+        flags = header["packet_flags"]
+    else:
+        header = np.frombuffer(headers, dtype=HEADER)
+        packet_number = header["packet_number_flags"] & PACKET_NUMBER_MASK
+        flags = header["packet_number_flags"]
+    packets = np.empty(header.size, dtype=PACKETS)
+    packets["timestamp"] = np.frombuffer(timestamps, dtype=np.int64)
+    packets["frame_number"] = header["frame_number"]
+    packets["packet_number"] = packet_number
+    packets["start_of_frame"] = (flags & START_OF_FRAME_MASK) != 0
+    packets["end_of_frame"] = (flags & END_OF_FRAME_MASK) != 0
+    packets["size"] = np.frombuffer(sizes, dtype=np.uint32)
+    return packets
+
+
+def analyse_packets(packets, number_packets):
+    """
+    Analyse (PACKETS) array of packets, in order of arrival, each frame of number_packets packets.
+
+    Returns tuple of (summary dictionary, (FRAMES) table of each frame received, in frame number order).
+    A packet is a duplicate if its frame's packet number was already received, out of order
+    if a higher packet number of its frame, or any packet of a later frame, was already received.
+    """
+    frame_numbers, frame_index, packets_received = np.unique(packets["frame_number"], return_inverse=True,
+                                                             return_counts=True)
+    frame_index = frame_index.ravel().astype(np.int64)
+    frames = np.zeros(frame_numbers.size, dtype=FRAMES)
+    frames["frame_number"] = frame_numbers
+    frames["packets"] = packets_received
+    # Key each packet by frame and packet number, keeping them ascending in frame order
+    keys = (frame_index << 32) | packets["packet_number"].astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    duplicate = np.zeros(keys.size, dtype=bool)
+    duplicate[order[1:]] = keys[order[1:]] == keys[order[:-1]]
+    previous_maximum = np.maximum.accumulate(keys)
+    out_of_order = np.zeros(keys.size, dtype=bool)
+    out_of_order[1:] = (keys[1:] < previous_maximum[:-1]) & ~duplicate[1:]
+    valid = ~duplicate & (packets["packet_number"] < number_packets)
+    count = frame_numbers.size
+    frames["duplicate_packets"] = np.bincount(frame_index, weights=duplicate, minlength=count)
+    frames["out_of_order_packets"] = np.bincount(frame_index, weights=out_of_order, minlength=count)
+    frames["missing_packets"] = number_packets - np.bincount(frame_index, weights=valid, minlength=count)
+    frames["start_of_frame"] = np.bincount(frame_index, weights=packets["start_of_frame"], minlength=count) > 0
+    frames["end_of_frame"] = np.bincount(frame_index, weights=packets["end_of_frame"], minlength=count) > 0
+    frames["complete"] = (frames["missing_packets"] == 0) & frames["start_of_frame"] & frames["end_of_frame"]
+    first_timestamp = np.full(count, np.iinfo(np.int64).max)
+    np.minimum.at(first_timestamp, frame_index, packets["timestamp"])
+    last_timestamp = np.full(count, np.iinfo(np.int64).min)
+    np.maximum.at(last_timestamp, frame_index, packets["timestamp"])
+    frames["first_timestamp"] = first_timestamp
+    frames["last_timestamp"] = last_timestamp
+    frames["interval"][1:] = np.diff(first_timestamp)
+    return summarise(packets, frames, duplicate, out_of_order), frames
+
+
+def summarise(packets, frames, duplicate, out_of_order):
+    """Return dictionary summarising packets' per frame analysis."""
+    summary = {
+        "packets": int(packets.size),
+        "frames": int(frames.size),
+        "complete_frames": int(frames["complete"].sum()),
+        "incomplete_frames": int((~frames["complete"]).sum()),
+        "missing_packets": int(frames["missing_packets"].sum()),
+        "duplicate_packets": int(duplicate.sum()),
+        "out_of_order_packets": int(out_of_order.sum()),
+        "frame_number_interval": 0,
+        "frame_gaps": 0,
+        "missing_frames": 0
+    }
+    if frames.size > 1:
+        # Frame numbers expected to advance by the most common interval
+        differences = np.diff(frames["frame_number"].astype(np.int64))
+        values, counts = np.unique(differences, return_counts=True)
+        interval = int(values[np.argmax(counts)])
+        summary["frame_number_interval"] = interval
+        summary["frame_gaps"] = int((differences != interval).sum())
+        summary["missing_frames"] = int(np.maximum(differences // interval - 1, 0).sum())
+        intervals = frames["interval"][1:]
+        summary["mean_interval_ns"] = float(intervals.mean())
+        summary["interval_jitter_ns"] = float(intervals.std())
+        summary["min_interval_ns"] = int(intervals.min())
+        summary["max_interval_ns"] = int(intervals.max())
+    return summary
+
+
+def write_table(filename, frames, summary):
+    """Write (FRAMES) table into CSV file or, if filename ends in .h5/.hdf5, HDF5 file (summary as attributes)."""
+    if filename.endswith((".h5", ".hdf5")):
+        with h5py.File(filename, 'w') as hdf_file:
+            dataset = hdf_file.create_dataset("frames", data=frames)
+            for key, value in summary.items():
+                dataset.attrs[key] = value
+    else:
+        formats = ["%d"] * len(FRAMES.names)
+        np.savetxt(filename, frames, fmt=formats, delimiter=",", header=",".join(FRAMES.names), comments="")
@@ -0,0 +1,317 @@
+"""
+PcapStream: Stream UDP payloads, and Hexitec frames, out of pcap/pcapng captures.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+
+# Hexitec packet headers, see HexitecDefinitions.h
+HEADER = struct.Struct("<II")
+EXTENDED_HEADER = struct.Struct("<QII")
+START_OF_FRAME_MASK = 1 << 31
+END_OF_FRAME_MASK = 1 << 30
+PACKET_NUMBER_MASK = 0x3FFFFFFF
+
+
+class PcapStreamError(Exception):
+    """Simple exception class for PcapStream to wrap lower-level exceptions."""
+
+    pass
+
+
+class PcapStream():
+    """
+    Read a pcap or pcapng capture through a memory map, one record at a time.
+
+    Only record headers and the link, IP and UDP headers are parsed; Payloads are
+    returned as memoryviews into the file, so nothing is copied until used.
+    """
+
+    PCAP_MAGIC = {b"\xd4\xc3\xb2\xa1": ("<", 1000), b"\xa1\xb2\xc3\xd4": (">", 1000),
+                  b"\x4d\x3c\xb2\xa1": ("<", 1), b"\xa1\xb2\x3c\x4d": (">", 1)}
+    PCAPNG_SECTION = b"\x0a\x0d\x0d\x0a"
+    # pcapng block types
+    INTERFACE_BLOCK = 1
+    PACKET_BLOCK = 2
+    SIMPLE_PACKET_BLOCK = 3
+    ENHANCED_PACKET_BLOCK = 6
+    # Link types
+    LINKTYPE_NULL = 0
+    LINKTYPE_ETHERNET = 1
+    LINKTYPE_RAW = 101
+    LINKTYPE_LINUX_SLL = 113
+    LINKTYPE_IPV4 = 228
+    LINKTYPE_IPV6 = 229
+    LINKTYPE_LINUX_SLL2 = 276
+    ETHERTYPE_IPV4 = 0x0800
+    ETHERTYPE_IPV6 = 0x86DD
+    ETHERTYPE_VLAN = (0x8100, 0x88A8)
+    PROTOCOL_UDP = 17
+
+    def __init__(self, filename):
+        """
+        Initialize the PcapStream object, mapping filename into memory.
+
+        :param filename: pcap or pcapng file
+        """
+        self.filename = filename
+        self.non_udp_packets = 0
+        try:
+            with open(filename, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise PcapStreamError("Cannot open '%s': %s" % (filename, e)) from None
+        self.data = memoryview(self.map)
+        magic = bytes(self.data[:4])
+        if magic in self.PCAP_MAGIC:
+            self.format = "pcap"
+        elif magic == self.PCAPNG_SECTION:
+            self.format = "pcapng"
+        else:
+            self.close()
+            raise PcapStreamError("'%s' is neither a pcap nor pcapng file" % filename)
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit context, closing file."""
+        self.close()
+
+    def close(self):
+        """Release memory map."""
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+            try:
+                self.map.close()
+            except BufferError:
+                # Payload(s) still referenced; Map closed once they are released
+                pass
+
+    def records(self):
+        """Yield (timestamp in ns, link type, memoryview of captured data) of every packet."""
+        if self.format == "pcap":
+            return self._pcap_records()
+        return self._pcapng_records()
+
+    def _pcap_records(self):
+        """Yield records of (classic) pcap file."""
+        data = self.data
+        endian, ns_per_tick = self.PCAP_MAGIC[bytes(data[:4])]
+        linktype = struct.unpack_from(endian + "I", data, 20)[0] & 0x0FFFFFFF
+        record = struct.Struct(endian + "IIII")
+        offset = 24
+        size = len(data)
+        while offset + 16 <= size:
+            seconds, fraction, captured, _ = record.unpack_from(data, offset)
+            offset += 16
+            if offset + captured > size:
+                break
+            yield seconds * 1000000000 + fraction * ns_per_tick, linktype, data[offset:offset + captured]
+            offset += captured
+
+    def _pcapng_records(self):
+        """Yield records of pcapng file, of any number of sections and interfaces."""
+        data = self.data
+        size = len(data)
+        offset = 0
+        endian = "<"
+        interfaces = []
+        while offset + 12 <= size:
+            if bytes(data[offset:offset + 4]) == self.PCAPNG_SECTION:
+                # Byte order of section given by its byte-order magic
+                endian = "<" if bytes(data[offset + 8:offset + 12]) == b"\x4d\x3c\x2b\x1a" else ">"
+                interfaces = []
+            block_type, block_length = struct.unpack_from(endian + "II", data, offset)
+            if block_length < 12 or offset + block_length > size:
+                break
+            body = offset + 8
+            if block_type == self.INTERFACE_BLOCK:
+                interfaces.append(self._interface(data, endian, body, offset + block_length - 4))
+            elif block_type in (self.ENHANCED_PACKET_BLOCK, self.PACKET_BLOCK):
+                if block_type == self.ENHANCED_PACKET_BLOCK:
+                    interface, high, low, captured, _ = struct.unpack_from(endian + "IIIII", data, body)
+                else:
+                    interface, _, high, low, captured, _ = struct.unpack_from(endian + "HHIIII", data, body)
+                linktype, snaplen, ns_per_tick, ticks_per_ns = interfaces[interface]
+                ticks = (high << 32) | low
+                timestamp = ticks * ns_per_tick if ns_per_tick else ticks // ticks_per_ns
+                yield timestamp, linktype, data[body + 20:body + 20 + captured]
+            elif block_type == self.SIMPLE_PACKET_BLOCK:
+                linktype, snaplen, _, _ = interfaces[0]
+                original = struct.unpack_from(endian + "I", data, body)[0]
+                captured = min(original, block_length - 16, snaplen or original)
+                yield 0, linktype, data[body + 4:body + 4 + captured]
+            offset += block_length
+
+    def _interface(self, data, endian, body, end):
+        """Return (link type, snap length, ns per tick, ticks per ns) of Interface Description Block."""
+        linktype, _, snaplen = struct.unpack_from(endian + "HHI", data, body)
+        resolution = 6
+        offset = body + 8
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(endian + "HH", data, offset)
+            if code == 0:
+                break
+            if code == 9:   # if_tsresol
+                resolution = data[offset + 4]
+            offset += 4 + ((length + 3) & ~3)
+        if resolution & 0x80:
+            ticks_per_second = 2 ** (resolution & 0x7F)
+        else:
+            ticks_per_second = 10 ** resolution
+        if ticks_per_second <= 1000000000:
+            return linktype, snaplen, 1000000000 // ticks_per_second, 0
+        return linktype, snaplen, 0, ticks_per_second // 1000000000
+
+    def udp_payloads(self, port=None):
+        """
+        Yield (timestamp in ns, memoryview of UDP payload) of every UDP packet.
+
+        :param port: if given, only packets to this destination port
+        """
+        for timestamp, linktype, packet in self.records():
+            located = self.locate_udp(packet, linktype)
+            if located is None:
+                self.non_udp_packets += 1
+                continue
+            destination_port, start, end = located
+            if (port is None) or (destination_port == port):
+                yield timestamp, packet[start:end]
+
+    def locate_udp(self, packet, linktype):
+        """Return (destination port, start, end) of packet's UDP payload, None if not (unfragmented) UDP."""
+        if linktype == self.LINKTYPE_ETHERNET:
+            offset = 12
+            ethertype = (packet[offset] << 8) | packet[offset + 1]
+            while ethertype in self.ETHERTYPE_VLAN:
+                offset += 4
+                ethertype = (packet[offset] << 8) | packet[offset + 1]
+            offset += 2
+        elif linktype == self.LINKTYPE_LINUX_SLL:
+            ethertype = (packet[14] << 8) | packet[15]
+            offset = 16
+        elif linktype == self.LINKTYPE_LINUX_SLL2:
+            ethertype = (packet[0] << 8) | packet[1]
+            offset = 20
+        elif linktype in (self.LINKTYPE_RAW, self.LINKTYPE_IPV4, self.LINKTYPE_IPV6, self.LINKTYPE_NULL):
+            offset = 4 if linktype == self.LINKTYPE_NULL else 0
+            version = packet[offset] >> 4
+            ethertype = self.ETHERTYPE_IPV4 if version == 4 else self.ETHERTYPE_IPV6
+        else:
+            raise PcapStreamError("Unsupported link type: %s" % linktype)
+        if ethertype == self.ETHERTYPE_IPV4:
+            header_length = (packet[offset] & 0x0F) * 4
+            fragment = ((packet[offset + 6] & 0x3F) << 8) | packet[offset + 7]
+            if packet[offset + 9] != self.PROTOCOL_UDP or fragment:
+                return None
+            offset += header_length
+        elif ethertype == self.ETHERTYPE_IPV6:
+            if packet[offset + 6] != self.PROTOCOL_UDP:
+                return None
+            offset += 40
+        else:
+            return None
+        destination_port = (packet[offset + 2] << 8) | packet[offset + 3]
+        length = (packet[offset + 4] << 8) | packet[offset + 5]
+        return destination_port, offset + 8, min(offset + length, len(packet))
+
+
+def parse_header(payload, extended_headers):
+    """
+    Return (frame number, packet number, start of frame, end of frame) of Hexitec packet header.
+
+    Header layouts as PacketHeader, PacketExtendedHeader of HexitecDefinitions.h:
+    Extended (16 byte) headers hold a 64 bit frame number, then 32 bit packet number
+    and flags; Otherwise (8 byte) a 32 bit frame number, then flags sharing 32 bits
+    with the packet number.
+    """
+    if extended_headers:
+        frame_number, packet_number, flags = EXTENDED_HEADER.unpack_from(payload)
+    else:
+        frame_number, flags = HEADER.unpack_from(payload)
+        packet_number = flags & PACKET_NUMBER_MASK
+    return frame_number, packet_number, bool(flags & START_OF_FRAME_MASK), bool(flags & END_OF_FRAME_MASK)
+
+
+class FrameAssembler():
+    """
+    Assemble Hexitec frames from their UDP payloads, into one pre-allocated frame.
+
+    Frames missing packet(s) (packets are numbered from 0 within each frame),
+    or holding excess data, are counted and dropped.
+    """
+
+    def __init__(self, rows, columns, extended_headers=True, header_size=None):
+        """
+        Initialize the FrameAssembler object.
+
+        :param rows: number of rows in frame
+        :param columns: number of columns in frame
+        :param extended_headers: whether packets carry extended (16 byte) headers
+        :param header_size: bytes preceding each packet's data, if padded beyond header (i.e. 64)
+        """
+        self.rows = rows
+        self.columns = columns
+        self.extended_headers = extended_headers
+        if header_size is None:
+            header_size = EXTENDED_HEADER.size if extended_headers else HEADER.size
+        self.header_size = header_size
+        self.frame = np.zeros(rows * columns, dtype=np.uint16)
+        self.frame_bytes = self.frame.view(np.uint8)
+        self.complete_frames = 0
+        self.incomplete_frames = 0
+        self.packets = 0
+
+    def frames(self, payloads):
+        """
+        Yield (frame number, frame) of each complete frame, from iterable of payloads.
+
+        The same (rows, columns) array is filled for every frame; Copy it to keep it.
+        """
+        filled = -1     # No frame begun
+        previous_packet = -1
+        for payload in payloads:
+            self.packets += 1
+            frame_number, packet_number, start, end = parse_header(payload, self.extended_headers)
+            if start:
+                if filled > 0:
+                    self.incomplete_frames += 1
+                filled = 0
+                previous_packet = packet_number - 1
+            if filled < 0:
+                continue
+            data = payload[self.header_size:]
+            if (packet_number != previous_packet + 1) or \
+                    (filled + len(data) > self.frame_bytes.size):
+                # Lost packet(s), or too much data; Drop frame
+                self.incomplete_frames += 1
+                filled = -1
+                continue
+            self.frame_bytes[filled:filled + len(data)] = np.frombuffer(data, dtype=np.uint8)
+            filled += len(data)
+            previous_packet = packet_number
+            if end:
+                if filled == self.frame_bytes.size:
+                    self.complete_frames += 1
+                    yield frame_number, self.frame.reshape(self.rows, self.columns)
+                else:
+                    self.incomplete_frames += 1
+                filled = -1
+        if filled > 0:
+            self.incomplete_frames += 1
+
+
+def read_frames(filename, rows, columns, extended_headers=True, header_size=None):
+    """Return (frames, rows, columns) array of every complete frame in capture file."""
+    assembler = FrameAssembler(rows, columns, extended_headers, header_size)
+    with PcapStream(filename) as stream:
+        frames = [frame.copy() for _, frame in assembler.frames(payload for _, payload in stream.udp_payloads())]
+    return np.array(frames, dtype=np.uint16).reshape(-1, rows, columns)
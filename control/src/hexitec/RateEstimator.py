@@ -0,0 +1,81 @@
+"""
+RateEstimator: Estimate per node frame rates for Hexitec ODIN control.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import time
+
+
+class RateEstimator():
+    """
+    Track frame rate of each (FR or FP) node from successive status snapshots.
+
+    Each node's rate is an exponentially weighted moving average (EWMA) of the
+    frames/s seen between consecutive snapshots of its cumulative frame count.
+    """
+
+    def __init__(self, alpha=0.3):
+        """
+        Initialize the RateEstimator object.
+
+        :param alpha: EWMA weight given to newest rate sample (0 < alpha <= 1)
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("EWMA weight must be within (0, 1], not %s" % alpha)
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        """Forget all nodes, ahead of a new acquisition."""
+        self.counts = []
+        self.timestamps = []
+        self.rates = []
+        self.samples = []
+
+    def update(self, counts, timestamp=None):
+        """
+        Update rates from cumulative frame count of each node.
+
+        :param counts: list of frame counts, one per node
+        :param timestamp: time the counts were obtained (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if len(counts) != len(self.counts):
+            # First snapshot, or node(s) added/removed; Start afresh
+            self.counts = list(counts)
+            self.timestamps = [timestamp] * len(counts)
+            self.rates = [0.0] * len(counts)
+            self.samples = [0] * len(counts)
+            return
+        for index, count in enumerate(counts):
+            elapsed = timestamp - self.timestamps[index]
+            if elapsed <= 0:
+                continue
+            if count < self.counts[index]:
+                # Counter reset (i.e. node restarted), rate unknown
+                self.rates[index] = 0.0
+                self.samples[index] = 0
+            else:
+                rate = (count - self.counts[index]) / elapsed
+                if self.samples[index] == 0:
+                    self.rates[index] = rate
+                else:
+                    self.rates[index] = self.alpha * rate + (1 - self.alpha) * self.rates[index]
+                self.samples[index] += 1
+            self.counts[index] = count
+            self.timestamps[index] = timestamp
+
+    def total_rate(self):
+        """Return combined rate (frames/s) of all nodes."""
+        return sum(self.rates)
+
+    def time_remaining(self, frames_remaining):
+        """Predict seconds until frames_remaining frames seen, None if no rate yet."""
+        if not any(self.samples):
+            return None
+        rate = self.total_rate()
+        if rate <= 0:
+            return None
+        return max(frames_remaining, 0) / rate
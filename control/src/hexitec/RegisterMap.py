@@ -0,0 +1,150 @@
+"""
+RegisterMap: Compiled, lazily built view of the ALL_RDMA_REGISTERS memory map.
+
+HEX_REGISTERS serves the memory map under its existing names (HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL),
+importing the generated module only on first use.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import importlib
+from collections import namedtuple
+
+Field = namedtuple("Field", ["name", "mask", "shiftr", "nof_bits"])
+Field.__doc__ = """Register field, its mask and shift precomputed."""
+
+
+class Register():
+    """
+    Compiled register; its address and fields indexed by name.
+
+    Subscripting (i.e. register['addr']) reads the generated dictionary,
+    so a Register may be used wherever the dictionary was.
+    """
+
+    __slots__ = ("name", "addr", "fields", "definition")
+
+    def __init__(self, name, definition):
+        """
+        Initialize the Register object.
+
+        :param name: register name (i.e. 'HEXITEC_2X6_HEXITEC_CTRL')
+        :param definition: register dictionary from the memory map
+        """
+        self.name = name
+        self.addr = definition["addr"]
+        self.fields = {field["name"]: Field(field["name"], field["mask"], field["shiftr"], field["nof_bits"])
+                       for field in definition.get("fields", [])}
+        self.definition = definition
+
+    def __getitem__(self, key):
+        """Return key of generated register dictionary."""
+        return self.definition[key]
+
+    def __eq__(self, other):
+        """Compare equal to the same register, compiled or as generated dictionary."""
+        if isinstance(other, Register):
+            return self.definition is other.definition
+        return self.definition == other
+
+    def __hash__(self):
+        """Hash by address."""
+        return hash(self.addr)
+
+    def get_field(self, name):
+        """Look up field called name."""
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise KeyError("Register 0x{0:X} has no field '{1}'".format(self.addr, name)) from None
+
+    def decode(self, name, value):
+        """Extract field called name from register value."""
+        field = self.get_field(name)
+        return (value & field.mask) >> field.shiftr
+
+    def encode(self, value, fields):
+        """
+        Return register value with fields modified.
+
+        :param value: current register value
+        :param fields: dictionary of field name: value
+        """
+        for name, field_value in fields.items():
+            field = self.get_field(name)
+            value = (value & ~field.mask) | ((field_value << field.shiftr) & field.mask)
+        return value
+
+
+class RegisterMap():
+    """
+    Registers of a memory map module, each compiled on first use.
+
+    Registers are looked up by their existing names (register_map.HEXITEC_2X6_HEXITEC_CTRL),
+    by address, or by their generated dictionary; Either way it is compiled once. Other
+    names (i.e. IC_OFFSETS) are served from the module unchanged. The memory map module
+    itself is only imported once a register is first looked up.
+    """
+
+    ATTRIBUTES = ("source", "module", "compiled", "names")
+
+    def __init__(self, registers):
+        """
+        Initialize the RegisterMap object.
+
+        :param registers: memory map module, or its name (i.e. "hexitec.ALL_RDMA_REGISTERS")
+        """
+        self.source = registers
+        self.module = None if isinstance(registers, str) else registers
+        self.compiled = {}
+        self.names = None
+
+    def __getattr__(self, name):
+        """Return compiled register called name, or the module's (non register) attribute."""
+        if name.startswith("_") or name in self.ATTRIBUTES:
+            raise AttributeError(name)
+        definition = getattr(self.get_module(), name, None)
+        if (definition is not None) and not (isinstance(definition, dict) and "addr" in definition):
+            return definition
+        return self.get(name)
+
+    def get_module(self):
+        """Return memory map module, importing it on first use."""
+        if self.module is None:
+            self.module = importlib.import_module(self.source)
+        return self.module
+
+    def get(self, name):
+        """Return register called name, compiling it if not done before."""
+        register = self.compiled.get(name)
+        if register is None:
+            definition = getattr(self.get_module(), name, None)
+            if not (isinstance(definition, dict) and "addr" in definition):
+                raise AttributeError("Memory map has no register '{}'".format(name))
+            register = Register(name, definition)
+            self.compiled[name] = register
+        return register
+
+    def lookup(self, register):
+        """Return compiled register of register (Register, dictionary or address)."""
+        if isinstance(register, Register):
+            return register
+        if isinstance(register, dict):
+            return self.get(register["name"])
+        if self.names is None:
+            # Address: name index, only built if a register is looked up by address
+            self.names = {}
+            for name, definition in vars(self.get_module()).items():
+                if isinstance(definition, dict) and "addr" in definition:
+                    self.names.setdefault(definition["addr"], name)
+        try:
+            return self.get(self.names[register])
+        except KeyError:
+            raise KeyError("Memory map has no register at 0x{0:X}".format(register)) from None
+
+    def decode(self, register, name, value):
+        """Extract field called name from register's value."""
+        return self.lookup(register).decode(name, value)
+
+
+HEX_REGISTERS = RegisterMap("hexitec.ALL_RDMA_REGISTERS")
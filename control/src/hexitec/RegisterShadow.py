@@ -0,0 +1,130 @@
+"""
+RegisterShadow: Cache control register values written over RDMA.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import logging
+import time
+
+from hexitec.RegisterMap import RegisterMap
+
+
+class RegisterShadow():
+    """
+    Shadow the control registers of the ALL_RDMA_REGISTERS memory map.
+
+    Most control registers only change when software writes them, so their last
+    written (or read) value can be modified without reading the register back first.
+    Status registers, control registers with fields the firmware sets (i.e.
+    HEXITEC_2X6_HEXITEC_CTRL's HEXITEC_ACQ_FALSE_TRIGGER_DONE), and control registers
+    also written outside of HexitecFem (i.e. by hexitec_vsr.VsrModule) are never
+    cached; Their fields are updated by read-modify-write, as before.
+
+    Modes:
+    off    - every field update reads the register first (no caching)
+    cache  - cached value used for as long as the connection lasts
+    verify - cached value re-read from hardware if older than verify_interval
+    """
+
+    MODES = ["off", "cache", "verify"]
+    CONTROL_SUFFIXES = ("_CTRL", "_CFG", "_PRELOAD_LOWER", "_PRELOAD_UPPER",
+                        "_NOF_FRAMES_LOWER", "_NOF_FRAMES_UPPER")
+    EXTERNAL_REGISTERS = ("HEXITEC_2X6_UART_TX_CTRL", "HEXITEC_2X6_UART_RX_CTRL",
+                          "HEXITEC_2X6_VSR_CTRL", "HEXITEC_2X6_VSR_MODE_CTRL")
+    # Control registers with fields driven by the firmware
+    VOLATILE_REGISTERS = ("HEXITEC_2X6_HEXITEC_CTRL",)
+
+    def __init__(self, registers, mode="cache", verify_interval=10.0):
+        """
+        Initialize the RegisterShadow object.
+
+        :param registers: RegisterMap (i.e. hexitec.RegisterMap.HEX_REGISTERS), or memory map module
+        :param mode: caching mode, one of MODES
+        :param verify_interval: verify mode; seconds before cached value re-read
+        """
+        self.mode = None
+        self.set_mode(mode)
+        self.verify_interval = verify_interval
+        self.register_map = registers if isinstance(registers, RegisterMap) else RegisterMap(registers)
+        # Address: whether control register, classified on first use
+        self.control_addresses = {}
+        self.values = {}
+        self.timestamps = {}
+        self.reads_avoided = 0
+
+    def set_mode(self, mode):
+        """Set caching mode, forgetting all cached values."""
+        if mode not in self.MODES:
+            raise ValueError("Invalid register shadow mode; Valid options: {}".format(self.MODES))
+        self.mode = mode
+        self.invalidate()
+
+    def is_cached(self, register):
+        """Return whether register's value may be cached."""
+        return (self.mode != "off") and self.is_control(register)
+
+    def is_control(self, register):
+        """Return whether register is a control register only HexitecFem changes."""
+        address = register["addr"]
+        control = self.control_addresses.get(address)
+        if control is None:
+            name = self.register_map.lookup(register).name
+            control = name.endswith(self.CONTROL_SUFFIXES) and \
+                name not in self.EXTERNAL_REGISTERS + self.VOLATILE_REGISTERS
+            self.control_addresses[address] = control
+        return control
+
+    def invalidate(self, register=None):
+        """Forget cached value of register (default: all registers)."""
+        if register is None:
+            self.values = {}
+            self.timestamps = {}
+        else:
+            self.values.pop(register["addr"], None)
+            self.timestamps.pop(register["addr"], None)
+
+    def read(self, rdma, register):
+        """Return register's value, from the cache where possible."""
+        address = register["addr"]
+        if self.is_cached(register) and address in self.values:
+            stale = (self.mode == "verify") and \
+                (time.time() - self.timestamps[address] >= self.verify_interval)
+            if not stale:
+                self.reads_avoided += 1
+                return self.values[address]
+            value = int(rdma.udp_rdma_read(address, burst_len=1)[0])
+            if value != self.values[address]:
+                logging.warning("Register 0x{0:X} read 0x{1:X}, expected 0x{2:X}".format(
+                    address, value, self.values[address]))
+        else:
+            value = int(rdma.udp_rdma_read(address, burst_len=1)[0])
+        self._remember(register, value)
+        return value
+
+    def write(self, rdma, register, value):
+        """Write value to register, remembering it if register cached."""
+        rdma.udp_rdma_write(register["addr"], value, burst_len=1)
+        self._remember(register, value)
+
+    def update_fields(self, rdma, register, fields):
+        """
+        Update several fields of register with a single write.
+
+        :param fields: dictionary of field name: value
+        Returns value written.
+        """
+        value = self.read(rdma, register)
+        value = self.register_map.lookup(register).encode(value, fields)
+        self.write(rdma, register, value)
+        return value
+
+    def get_field(self, register, name):
+        """Look up register's field called name."""
+        return self.register_map.lookup(register).get_field(name)
+
+    def _remember(self, register, value):
+        """Cache value of register, if a control register."""
+        if self.is_cached(register):
+            self.values[register["addr"]] = value
+            self.timestamps[register["addr"]] = time.time()
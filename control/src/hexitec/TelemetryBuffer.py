@@ -0,0 +1,95 @@
+"""
+TelemetryBuffer: Fixed size time-series of (sensor) samples.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import time
+
+import numpy as np
+
+
+class TelemetryBuffer():
+    """
+    Ring buffer of timestamped samples, one column per channel (i.e. VSR).
+
+    Memory is allocated once; Once full, each new sample overwrites the oldest.
+    Missing values are held as NaN, and ignored by the statistics.
+    """
+
+    def __init__(self, channels, capacity=360):
+        """
+        Initialize the TelemetryBuffer object.
+
+        :param channels: number of values per sample
+        :param capacity: number of samples held
+        """
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1, not %s" % capacity)
+        self.channels = channels
+        self.capacity = capacity
+        self.timestamps = np.full(capacity, np.nan)
+        self.values = np.full((capacity, channels), np.nan)
+        self.clear()
+
+    def clear(self):
+        """Discard all samples."""
+        self.timestamps.fill(np.nan)
+        self.values.fill(np.nan)
+        self.index = 0
+        self.count = 0
+
+    def append(self, values, timestamp=None):
+        """
+        Add a sample, overwriting the oldest sample if buffer full.
+
+        :param values: list of values, one per channel (None if missing)
+        :param timestamp: time sample taken (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.timestamps[self.index] = timestamp
+        self.values[self.index] = [np.nan if value is None else value for value in values]
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def get(self, start=None, end=None):
+        """
+        Return samples, oldest first, optionally limited to time range [start, end].
+
+        Returns tuple of (timestamps, values) arrays.
+        """
+        order = np.arange(self.index - self.count, self.index) % self.capacity
+        timestamps = self.timestamps[order]
+        values = self.values[order]
+        selected = np.ones(len(order), dtype=bool)
+        if start is not None:
+            selected &= timestamps >= start
+        if end is not None:
+            selected &= timestamps <= end
+        return timestamps[selected], values[selected]
+
+    def latest(self):
+        """Return most recent sample's values, None if no sample yet."""
+        if self.count == 0:
+            return None
+        return self._to_list(self.values[(self.index - 1) % self.capacity])
+
+    def statistics(self, start=None, end=None):
+        """Return per channel min, max, mean (None for channel without data) of samples."""
+        _, values = self.get(start, end)
+        if len(values) == 0:
+            empty = [None] * self.channels
+            return {"min": empty, "max": empty, "mean": empty}
+        samples = np.sum(~np.isnan(values), axis=0)
+        mean = np.divide(np.nansum(values, axis=0), samples,
+                         out=np.full(self.channels, np.nan), where=samples > 0)
+        return {
+            "min": self._to_list(np.fmin.reduce(values, axis=0)),
+            "max": self._to_list(np.fmax.reduce(values, axis=0)),
+            "mean": self._to_list(mean)
+        }
+
+    def _to_list(self, array):
+        """Convert array into list of floats, with None in place of NaN."""
+        return [None if np.isnan(value) else float(value) for value in array]
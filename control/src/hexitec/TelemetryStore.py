@@ -0,0 +1,136 @@
+"""
+TelemetryStore: Tiered time-series of detector telemetry (sensors, health, rates).
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+from hexitec.TelemetryBuffer import TelemetryBuffer
+
+
+class TelemetryStore():
+    """
+    Hold telemetry at several resolutions, in constant memory.
+
+    Each tier averages samples into buckets of its resolution (seconds), and keeps
+    its most recent buckets in a TelemetryBuffer. Appending costs the same however
+    much history is held; Each sample may provide any subset of the columns.
+    Samples arrive from both the IOLoop and executor threads, so appending and
+    querying hold a lock.
+    """
+
+    # (resolution in seconds, number of buckets): 1 hour of 1 s, 1 day of 1 min, 30 days of 1 h
+    TIERS = [(1.0, 3600), (60.0, 1440), (3600.0, 720)]
+
+    def __init__(self, columns, tiers=None):
+        """
+        Initialize the TelemetryStore object.
+
+        :param columns: list of column names (i.e. "vsr1_ambient")
+        :param tiers: list of (resolution, capacity) tuples, finest first
+        """
+        self.columns = list(columns)
+        self.column_index = {column: index for index, column in enumerate(self.columns)}
+        self.tiers = tiers if tiers is not None else self.TIERS
+        self.buffers = [TelemetryBuffer(len(self.columns), capacity) for (_, capacity) in self.tiers]
+        self.sums = np.zeros((len(self.tiers), len(self.columns)))
+        self.counts = np.zeros((len(self.tiers), len(self.columns)))
+        self.buckets = [None] * len(self.tiers)
+        self.lock = threading.Lock()
+
+    def append(self, values, timestamp=None):
+        """
+        Add a sample to every tier.
+
+        :param values: dictionary of column: value, unknown columns ignored
+        :param timestamp: time sample taken (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        row = np.full(len(self.columns), np.nan)
+        for column, value in values.items():
+            if column in self.column_index and value is not None:
+                row[self.column_index[column]] = value
+        valid = ~np.isnan(row)
+        with self.lock:
+            for tier, (resolution, _) in enumerate(self.tiers):
+                bucket = math.floor(timestamp / resolution)
+                if self.buckets[tier] != bucket:
+                    self._flush(tier)
+                    self.buckets[tier] = bucket
+                self.sums[tier][valid] += row[valid]
+                self.counts[tier][valid] += 1
+
+    def _flush(self, tier):
+        """Close tier's current bucket, storing its mean."""
+        if self.buckets[tier] is None:
+            return
+        timestamp, mean = self._pending(tier)
+        self.buffers[tier].append(mean, timestamp)
+        self.sums[tier].fill(0)
+        self.counts[tier].fill(0)
+
+    def _pending(self, tier):
+        """Return (timestamp, mean) of tier's open bucket."""
+        counts = self.counts[tier]
+        mean = np.divide(self.sums[tier], counts, out=np.full(len(self.columns), np.nan),
+                         where=counts > 0)
+        return self.buckets[tier] * self.tiers[tier][0], mean
+
+    def select_tier(self, start=None):
+        """Return finest tier still holding samples from start onwards."""
+        if start is None:
+            return 0
+        for tier, buffer in enumerate(self.buffers):
+            timestamps, _ = buffer.get()
+            if (len(timestamps) < buffer.capacity) or (timestamps[0] <= start):
+                return tier
+        return len(self.tiers) - 1
+
+    def query(self, start=None, end=None, resolution=None):
+        """
+        Return telemetry within time range [start, end].
+
+        :param resolution: resolution (seconds) of tier to use (default: finest covering start)
+        Returns tuple of (resolution, timestamps, values) with one values column per column.
+        """
+        if resolution is None:
+            tier = self.select_tier(start)
+        else:
+            resolutions = [tier_resolution for (tier_resolution, _) in self.tiers]
+            if resolution not in resolutions:
+                raise ValueError("Invalid resolution; Valid options: {}".format(resolutions))
+            tier = resolutions.index(resolution)
+        with self.lock:
+            timestamps, values = self.buffers[tier].get(start, end)
+            if self.buckets[tier] is not None:
+                timestamp, mean = self._pending(tier)
+                if ((start is None) or (timestamp >= start)) and ((end is None) or (timestamp <= end)):
+                    timestamps = np.append(timestamps, timestamp)
+                    values = np.vstack([values, mean])
+        return self.tiers[tier][0], timestamps, values
+
+    def as_dict(self, start=None, end=None, resolution=None):
+        """Return telemetry within time range as (JSON friendly) dictionary, keyed by column."""
+        resolution, timestamps, values = self.query(start, end, resolution)
+        return {
+            "resolution": resolution,
+            "timestamps": timestamps.tolist(),
+            "values": {column: [None if np.isnan(value) else float(value) for value in values[:, index]]
+                       for index, column in enumerate(self.columns)}
+        }
+
+    def write(self, hdf_file, path, start=None, end=None):
+        """Write telemetry within time range into hdf_file group at path."""
+        resolution, timestamps, values = self.query(start, end)
+        group = hdf_file.require_group(path)
+        group.create_dataset("timestamps", data=timestamps)
+        group.create_dataset("values", data=values.reshape(len(timestamps), len(self.columns)))
+        group.attrs["columns"] = self.columns
+        group.attrs["resolution"] = resolution
+        return len(timestamps)
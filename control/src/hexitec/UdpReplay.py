@@ -0,0 +1,423 @@
+"""
+UdpReplay: Replay frames as Hexitec UDP packets, built once, in paced batches.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import time
+
+import numpy as np
+
+from hexitec.PcapStream import HEADER, EXTENDED_HEADER, START_OF_FRAME_MASK, END_OF_FRAME_MASK
+
+
+RESULT_POLL_SECONDS = 1.0
+
+
+class UdpReplayError(Exception):
+    """Simple exception class for UdpReplay to wrap lower-level exceptions."""
+
+    pass
+
+
+class PacketSet():
+    """
+    Every packet of a set of frames, headers included, built once into a single buffer.
+
+    Packets are numbered from 0 within each frame, header layouts as HexitecDefinitions.h;
+    Each packet is available as a memoryview into the buffer.
+    """
+
+    def __init__(self, frames, packet_size=8000, extended_headers=True, header_size=None):
+        """
+        Initialize the PacketSet object.
+
+        :param frames: (frames, rows, columns) array of frames
+        :param packet_size: bytes of frame data per packet (last packet of frame takes the remainder)
+        :param extended_headers: whether packets carry extended (16 byte) headers
+        :param header_size: bytes preceding each packet's data, if padded beyond header (i.e. 64)
+        """
+        frames = np.ascontiguousarray(frames, dtype=np.uint16)
+        minimum_header_size = EXTENDED_HEADER.size if extended_headers else HEADER.size
+        if header_size is None:
+            header_size = minimum_header_size
+        if (header_size < minimum_header_size) or (header_size % 8):
+            raise UdpReplayError("Header size must be a multiple of 8 bytes, of at least %s bytes" %
+                                 minimum_header_size)
+        if (frames.ndim != 3) or (frames.shape[0] == 0):
+            raise UdpReplayError("Expected (frames, rows, columns) array of at least one frame")
+        self.extended_headers = extended_headers
+        self.number_frames = frames.shape[0]
+        frame_size = frames[0].nbytes
+        self.packets_per_frame = -(-frame_size // packet_size)
+        sizes = [packet_size] * (self.packets_per_frame - 1) + [frame_size - packet_size * (self.packets_per_frame - 1)]
+        self.frame_bytes = self.packets_per_frame * header_size + frame_size
+        self.buffer = np.zeros((self.number_frames, self.frame_bytes), dtype=np.uint8)
+        data = frames.reshape(self.number_frames, -1).view(np.uint8)
+        frame_numbers = np.arange(self.number_frames, dtype=np.uint64)
+        # Start, length of each packet within a frame's bytes
+        self.layout = []
+        offset = 0
+        for number, size in enumerate(sizes):
+            flags = (START_OF_FRAME_MASK if number == 0 else 0) | \
+                (END_OF_FRAME_MASK if number == self.packets_per_frame - 1 else 0)
+            header = np.zeros((self.number_frames, header_size // 8), dtype=np.uint64)
+            if extended_headers:
+                header[:, 0] = frame_numbers
+                header[:, 1] = number | (flags << 32)
+            else:
+                header[:, 0] = frame_numbers | ((number | flags) << 32)
+            self.buffer[:, offset:offset + header_size] = header.view(np.uint8)
+            start = number * packet_size
+            self.buffer[:, offset + header_size:offset + header_size + size] = data[:, start:start + size]
+            self.layout.append((offset, header_size + size))
+            offset += header_size + size
+        flat = memoryview(self.buffer.reshape(-1))
+        self.packets = [flat[frame * self.frame_bytes + start:frame * self.frame_bytes + start + length]
+                        for frame in range(self.number_frames) for start, length in self.layout]
+        self.frame_numbers = list(range(self.number_frames))
+
+    def renumber(self, index, frame_number):
+        """Set frame number in headers of every packet of frame index (i.e. when replayed again)."""
+        if self.frame_numbers[index] == frame_number:
+            return
+        frame = self.buffer[index]
+        for start, _ in self.layout:
+            if self.extended_headers:
+                struct.pack_into("<Q", frame, start, frame_number)
+            else:
+                struct.pack_into("<I", frame, start, frame_number & 0xFFFFFFFF)
+        self.frame_numbers[index] = frame_number
+
+
+class TokenBucket():
+    """Pace consumption to rate (per second), allowing bursts of up to burst once idle."""
+
+    # Sleep only when waiting at least this long (s), otherwise spin
+    MINIMUM_SLEEP = 0.0002
+
+    def __init__(self, rate, burst):
+        """Initialize the TokenBucket object, empty (so N tokens take N / rate seconds)."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = 0
+        self.time = time.perf_counter()
+
+    def consume(self, amount):
+        """Wait until amount of tokens are available, then take them."""
+        while True:
+            now = time.perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.time) * self.rate)
+            self.time = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            wait = (amount - self.tokens) / self.rate
+            if wait > self.MINIMUM_SLEEP:
+                time.sleep(wait - self.MINIMUM_SLEEP / 2)
+
+
+class iovec(ctypes.Structure):
+    """struct iovec."""
+
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class msghdr(ctypes.Structure):
+    """struct msghdr."""
+
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.c_void_p), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class mmsghdr(ctypes.Structure):
+    """struct mmsghdr."""
+
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+
+def load_sendmmsg():
+    """Return libc's sendmmsg function, None if unavailable (i.e. not Linux)."""
+    try:
+        sendmmsg = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).sendmmsg
+    except (OSError, AttributeError, TypeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+class UdpReplay():
+    """
+    Send a PacketSet's frames, round robin across destinations, in batches of packets.
+
+    Batches are sent with a single sendmmsg call where available, otherwise a
+    sendmsg call per packet. Transmission is paced by a token bucket (bytes),
+    one batch's worth deep, at the lower of gigabits_per_second and the rate
+    frame_interval implies; Unpaced if neither specified.
+    """
+
+    # Send again on full socket buffer, interruption, or (previous packet's) port unreachable
+    RETRY_ERRORS = (errno.EAGAIN, errno.ENOBUFS, errno.EINTR, errno.ECONNREFUSED)
+
+    def __init__(self, packet_set, destinations, gigabits_per_second=None, frame_interval=None,
+                 batch_packets=64, use_sendmmsg=True):
+        """
+        Initialize the UdpReplay object, opening a socket per destination.
+
+        :param packet_set: PacketSet of frames to send
+        :param destinations: list of (host, port) tuples, frame n sent to destination n % len(destinations)
+        """
+        self.packet_set = packet_set
+        self.batch_packets = max(1, batch_packets)
+        self.sendmmsg = load_sendmmsg() if use_sendmmsg else None
+        rates = []
+        if gigabits_per_second:
+            rates.append(gigabits_per_second * 1e9 / 8)
+        if frame_interval:
+            rates.append(packet_set.frame_bytes / frame_interval)
+        self.rate = min(rates) if rates else None
+        self.sockets = []
+        try:
+            for host, port in destinations:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.sockets.append(sock)
+                sock.connect((host, port))
+        except (OSError, ValueError) as e:
+            self.close()
+            raise UdpReplayError("Cannot send to %s: %s" % (destinations, e)) from None
+        if not self.sockets:
+            raise UdpReplayError("No destination specified")
+        lengths = np.array([len(packet) for packet in packet_set.packets], dtype=np.int64)
+        self.cumulative_bytes = np.concatenate(([0], np.cumsum(lengths)))
+        if self.sendmmsg:
+            self.messages = self._build_messages(lengths)
+        self.statistics = {}
+
+    def _build_messages(self, lengths):
+        """Build (once) an mmsghdr, iovec pair per packet, pointing into packet set's buffer."""
+        count = lengths.size
+        self.iovecs = (iovec * count)()
+        messages = (mmsghdr * count)()
+        base = self.packet_set.buffer.ctypes.data
+        frame_bytes = self.packet_set.frame_bytes
+        iovec_base = ctypes.addressof(self.iovecs)
+        index = 0
+        for frame in range(self.packet_set.number_frames):
+            for start, length in self.packet_set.layout:
+                self.iovecs[index].iov_base = base + frame * frame_bytes + start
+                self.iovecs[index].iov_len = length
+                messages[index].msg_hdr.msg_iov = iovec_base + index * ctypes.sizeof(iovec)
+                messages[index].msg_hdr.msg_iovlen = 1
+                index += 1
+        return messages
+
+    def close(self):
+        """Close sockets."""
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+    def run(self, frames, first_frame=0, frame_numbers=None):
+        """
+        Send frames frames, numbered from first_frame, cycling through packet set's frames.
+
+        frame_numbers, if given, numbers each frame instead (e.g. the share of frames one of several senders sends).
+        Returns dictionary of frames, packets, bytes sent, seconds taken, gigabits and frames per second.
+        """
+        packet_set = self.packet_set
+        per_frame = packet_set.packets_per_frame
+        burst = self.batch_packets * max(length for _, length in packet_set.layout)
+        bucket = TokenBucket(self.rate, burst) if self.rate else None
+        destinations = len(self.sockets)
+        start = time.perf_counter()
+        batch_start = batch_end = 0
+        batch_socket = None
+        for frame in range(frames):
+            index = frame % packet_set.number_frames
+            sock = self.sockets[frame % destinations]
+            first = index * per_frame
+            if (sock is not batch_socket) or (first != batch_end):
+                self._send(batch_socket, batch_start, batch_end, bucket)
+                batch_socket, batch_start = sock, first
+            packet_set.renumber(index, first_frame + frame if frame_numbers is None else int(frame_numbers[frame]))
+            batch_end = first + per_frame
+            if batch_end - batch_start >= self.batch_packets:
+                self._send(batch_socket, batch_start, batch_end, bucket)
+                batch_start = batch_end
+        self._send(batch_socket, batch_start, batch_end, bucket)
+        elapsed = time.perf_counter() - start
+        cycles, remainder = divmod(frames, packet_set.number_frames)
+        sent_bytes = int(cycles * self.cumulative_bytes[-1] + self.cumulative_bytes[remainder * per_frame])
+        self.statistics = {
+            "frames": frames,
+            "packets": frames * per_frame,
+            "bytes": sent_bytes,
+            "seconds": elapsed,
+            "gigabits_per_second": sent_bytes * 8 / elapsed / 1e9 if elapsed else 0.0,
+            "frames_per_second": frames / elapsed if elapsed else 0.0
+        }
+        return self.statistics
+
+    def report(self):
+        """Return last run's statistics, as a string."""
+        return format_statistics(self.statistics)
+
+    def _send(self, sock, first, last, bucket):
+        """Send packets first to last (exclusive) through sock, batch_packets at a time."""
+        while first < last:
+            end = min(first + self.batch_packets, last)
+            if bucket:
+                bucket.consume(self.cumulative_bytes[end] - self.cumulative_bytes[first])
+            if self.sendmmsg:
+                self._sendmmsg(sock, first, end)
+            else:
+                for packet in self.packet_set.packets[first:end]:
+                    self._retry(sock.sendmsg, [packet])
+            first = end
+
+    def _sendmmsg(self, sock, first, last):
+        """Send packets first to last (exclusive) through sock, with as few sendmmsg calls as possible."""
+        address = ctypes.addressof(self.messages)
+        size = ctypes.sizeof(mmsghdr)
+        while first < last:
+            sent = self.sendmmsg(sock.fileno(), address + first * size, last - first, 0)
+            if sent < 0:
+                error = ctypes.get_errno()
+                if error not in self.RETRY_ERRORS:
+                    raise UdpReplayError("sendmmsg failed: %s" % os.strerror(error))
+                continue
+            first += sent
+
+    def _retry(self, function, *args):
+        """Call function, retrying while socket buffer is full."""
+        while True:
+            try:
+                return function(*args)
+            except OSError as e:
+                if e.errno not in self.RETRY_ERRORS:
+                    raise UdpReplayError("sendmsg failed: %s" % e) from None
+
+
+def format_statistics(statistics):
+    """Return (run's) statistics, as a string."""
+    return "%d frames (%d packets, %d bytes) sent in %.3f s: %.3f Gb/s, %.1f frames/s" % (
+        statistics["frames"], statistics["packets"], statistics["bytes"], statistics["seconds"],
+        statistics["gigabits_per_second"], statistics["frames_per_second"])
+
+
+def sender_frame_numbers(frames, slots, number_destinations):
+    """Return (ascending) numbers of those of frames frames sent to destinations slots, out of number_destinations."""
+    numbers = [np.arange(slot, frames, number_destinations) for slot in slots]
+    return np.sort(np.concatenate(numbers)) if numbers else np.empty(0, dtype=np.int64)
+
+
+def _sender(index, barrier, results, frames, destinations, frame_numbers, packet_settings, replay_settings):
+    """Replay frame_numbers to destinations in turn, once every sender is ready, putting (index, statistics) on results."""
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, {cores[index % len(cores)]})
+        replay = UdpReplay(PacketSet(frames, **packet_settings), destinations, **replay_settings)
+        barrier.wait()
+        statistics = replay.run(len(frame_numbers), frame_numbers=frame_numbers)
+        replay.close()
+        results.put((index, statistics))
+    except BaseException as e:
+        barrier.abort()
+        results.put((index, "%s: %s" % (type(e).__name__, e)))
+
+
+def _collect_results(results, senders):
+    """Return each sender's result, raising UdpReplayError should a sender exit without putting one on results."""
+    statistics = [None] * len(senders)
+    pending = set(range(len(senders)))
+    while pending:
+        try:
+            index, result = results.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            exited = [index for index in sorted(pending) if senders[index].exitcode is not None]
+            if not exited:
+                continue
+            # An exiting sender flushes its result first; Allow it one more poll to arrive
+            try:
+                index, result = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                raise UdpReplayError("Sender failed: Sender %s exited (exit code %s) without a result" %
+                                     (exited[0], senders[exited[0]].exitcode)) from None
+        statistics[index] = result
+        pending.discard(index)
+    return statistics
+
+
+def farm_replay(frames, destinations, frame_count, processes=None, packet_size=8000, extended_headers=True,
+                header_size=None, gigabits_per_second=None, frame_interval=None, batch_packets=64,
+                use_sendmmsg=True):
+    """
+    Replay frame_count frames across destinations, frame n to destination n % len(destinations), from several processes.
+
+    destinations lists (host, port) once per look up table entry (see FarmMode.frame_destinations), so a frame
+    receiver may appear more than once. Destination entries are shared among processes (default: one per core,
+    at most one per entry), each pinned to a core and paced at its share of gigabits_per_second / frame_interval.
+    Each process sends every frame of its entries, cycling through frames (a (frames, rows, columns) array).
+
+    Returns dictionary of overall frames, packets, bytes sent, seconds taken, gigabits and frames per second,
+    with each process' own statistics under "senders".
+    """
+    if not destinations:
+        raise UdpReplayError("No destination specified")
+    number_destinations = len(destinations)
+    processes = min(processes or os.cpu_count() or 1, number_destinations)
+    packet_settings = {"packet_size": packet_size, "extended_headers": extended_headers, "header_size": header_size}
+    # Validate settings before starting any process
+    PacketSet(frames[:1], **packet_settings)
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    senders = []
+    for index in range(processes):
+        slots = list(range(index, number_destinations, processes))
+        share = len(slots) / number_destinations
+        replay_settings = {
+            "gigabits_per_second": gigabits_per_second * share if gigabits_per_second else None,
+            "frame_interval": frame_interval / share if frame_interval else None,
+            "batch_packets": batch_packets,
+            "use_sendmmsg": use_sendmmsg
+        }
+        frame_numbers = sender_frame_numbers(frame_count, slots, number_destinations)
+        sender = context.Process(target=_sender, args=(index, barrier, results, frames,
+                                                       [destinations[slot] for slot in slots], frame_numbers,
+                                                       packet_settings, replay_settings))
+        sender.start()
+        senders.append(sender)
+    try:
+        statistics = _collect_results(results, senders)
+    finally:
+        for sender in senders:
+            if sender.exitcode is None:
+                sender.terminate()
+            sender.join()
+    errors = [result for result in statistics if isinstance(result, str)]
+    if errors:
+        raise UdpReplayError("Sender failed: %s" % "; ".join(errors))
+    sent_bytes = sum(result["bytes"] for result in statistics)
+    elapsed = max(result["seconds"] for result in statistics)
+    return {
+        "frames": sum(result["frames"] for result in statistics),
+        "packets": sum(result["packets"] for result in statistics),
+        "bytes": sent_bytes,
+        "seconds": elapsed,
+        "gigabits_per_second": sent_bytes * 8 / elapsed / 1e9 if elapsed else 0.0,
+        "frames_per_second": frame_count / elapsed if elapsed else 0.0,
+        "senders": statistics
+    }
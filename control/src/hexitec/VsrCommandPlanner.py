@@ -0,0 +1,111 @@
+"""
+VsrCommandPlanner: Send VSR commands common to all VSRs once, by broadcast.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import logging
+
+
+class VsrCommandPlannerError(Exception):
+    """Simple exception class for VsrCommandPlanner to wrap lower-level exceptions."""
+
+    pass
+
+
+class VsrCommandPlanner():
+    """
+    Plan VSR commands, broadcasting those every VSR would otherwise be sent in turn.
+
+    A command is a (method name, arguments) tuple, called on a VsrModule. Setters
+    (set_*) only stage a value within the VsrModule, so they are applied to every
+    VSR module; Write-only commands (BROADCAST_COMMANDS) are sent once through the
+    broadcast module rather than once per VSR. Any other command, i.e. anything
+    expecting a reply, is sent to each VSR in turn. An optional verify callback then
+    checks each VSR once per batch of broadcast commands, any VSR failing it is sent
+    the batch individually. Verifying costs a round trip per VSR, so leave it off
+    unless broadcasts are suspected of going astray.
+    """
+
+    BROADCAST_COMMANDS = ["stop_trigger_sm", "start_trigger_sm", "_disable_training",
+                          "write_trigger_mode_number_frames",
+                          "enable_trigger_mode_trigger_two_and_three",
+                          "disable_trigger_mode_trigger_two_and_three",
+                          "enable_trigger_input_two_and_three",
+                          "disable_trigger_input_two_and_three"]
+
+    def __init__(self, minimum_vsrs=2):
+        """
+        Initialize the VsrCommandPlanner object.
+
+        :param minimum_vsrs: fewest VSRs worth broadcasting to
+        """
+        self.minimum_vsrs = minimum_vsrs
+        self.commands_sent = 0
+        self.commands_saved = 0
+
+    def can_broadcast(self, command):
+        """Return whether command can be broadcast, i.e. is a setter or write-only command."""
+        name, _ = command
+        return name.startswith("set_") or name in self.BROADCAST_COMMANDS
+
+    def plan(self, commands_per_vsr):
+        """
+        Split commands into those common to all VSRs and those particular to each VSR.
+
+        :param commands_per_vsr: dictionary of VsrModule: list of commands, in order
+        Returns tuple of (common commands, dictionary of VsrModule: remaining commands).
+        Common commands are the leading (broadcastable) commands shared by every VSR,
+        so that the order each VSR receives its commands in is preserved.
+        """
+        command_lists = list(commands_per_vsr.values())
+        common = []
+        if len(command_lists) >= self.minimum_vsrs:
+            for commands in zip(*command_lists):
+                if any(command != commands[0] for command in commands[1:]) or not self.can_broadcast(commands[0]):
+                    break
+                common.append(commands[0])
+        remaining = {vsr: commands[len(common):] for vsr, commands in commands_per_vsr.items()}
+        return common, remaining
+
+    def execute(self, broadcast_vsr, commands_per_vsr, verify=None):
+        """
+        Send commands to VSRs, broadcasting those common to all of them.
+
+        :param broadcast_vsr: VsrModule addressing all VSRs (slot 0)
+        :param commands_per_vsr: dictionary of VsrModule: list of commands, in order
+        :param verify: if given, called with each VsrModule after common commands broadcast,
+                       returning False if that VSR did not apply them
+        """
+        common, remaining = self.plan(commands_per_vsr)
+        if common:
+            logging.debug("Broadcasting {} command(s) to {} VSRs".format(len(common), len(commands_per_vsr)))
+            for name, args in common:
+                if name.startswith("set_"):
+                    for vsr in commands_per_vsr:
+                        getattr(vsr, name)(*args)
+                else:
+                    self.commands_saved += len(commands_per_vsr) - 1
+                    self.commands_sent += 1
+                getattr(broadcast_vsr, name)(*args)
+            if verify:
+                for vsr in commands_per_vsr:
+                    if not verify(vsr):
+                        self.resend(vsr, common, verify)
+        for vsr, commands in remaining.items():
+            self.send(vsr, commands)
+
+    def resend(self, vsr, commands, verify):
+        """Send vsr commands it missed by broadcast individually, failing if it still fails verify."""
+        logging.warning("VSR 0x{0:X} failed verification, resending {1} command(s)".format(vsr.addr, len(commands)))
+        self.send(vsr, commands)
+        if not verify(vsr):
+            raise VsrCommandPlannerError("VSR 0x{0:X} did not apply command(s): {1}".format(
+                vsr.addr, ", ".join(name for name, _ in commands)))
+
+    def send(self, vsr, commands):
+        """Send commands to a single VSR."""
+        for name, args in commands:
+            getattr(vsr, name)(*args)
+            if not name.startswith("set_"):
+                self.commands_sent += 1
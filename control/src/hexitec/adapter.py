@@ -22,6 +22,7 @@ import json
 
 from .HexitecFem import HexitecFem
 from .HexitecDAQ import HexitecDAQ
+from .TelemetryStore import TelemetryStore
 
 
 class HexitecAdapter(ApiAdapter):
@@ -182,6 +183,8 @@ class Hexitec():
     PROCESSING_NODES = 'processing_nodes'
     ODIN_CONTROL_NODE = 'odin_control_node'
     OPERATING_MODE = 'operating_mode'
+    METADATA_MODE = 'metadata_mode'
+    ACCOUNTING_SETTLE_TIME = 'accounting_settle_time'
 
     def __init__(self, options):
         """Initialise the Hexitec object.
@@ -218,6 +221,17 @@ class Hexitec():
             self.data_config_path = self.DEFAULT_DATA_DIR
 
         self.daq = HexitecDAQ(self, self.file_dir, self.file_name)
+        # Meta data layout; legacy (dataset per key) unless compact opted into
+        try:
+            self.daq._set_metadata_mode(options.get(self.METADATA_MODE, "legacy"))
+        except ParameterTreeError as e:
+            logging.error("Ignoring metadata_mode option: %s", e)
+        # Seconds counters must settle for, once frames lost, before a run ends short of its frames
+        if self.ACCOUNTING_SETTLE_TIME in options:
+            try:
+                self.daq._set_accounting_settle_time(float(options[self.ACCOUNTING_SETTLE_TIME]))
+            except (ParameterTreeError, ValueError) as e:
+                logging.error("Ignoring accounting_settle_time option: %s", e)
 
         self.adapters = {}
 
@@ -246,6 +260,17 @@ class Hexitec():
             )
         self.fem_health = True
 
+        # Telemetry history of sensors (per VSR), fem health and DAQ rates
+        columns = ["vsr{}_{}".format(vsr, metric) for vsr in range(1, 7)
+                   for metric in self.fem.telemetry_metrics]
+        columns += ["fem_health", "frames_received_rate", "frames_processed_rate"]
+        self.telemetry = TelemetryStore(columns)
+        self.telemetry_start = 0
+        self.telemetry_end = 0
+        self.telemetry_span = 600
+        self.telemetry_resolution = 0
+        self.telemetry_data = {}
+
         # Watchdog variables
         self.daq_idle_timeout = 6
 
@@ -306,6 +331,15 @@ class Hexitec():
                     "leak_error": (self._get_leak_error, None)
                 }
             },
+            "telemetry": {
+                "columns": (lambda: self.telemetry.columns, None),
+                "start": (lambda: self.telemetry_start, self.set_telemetry_start),
+                "end": (lambda: self.telemetry_end, self.set_telemetry_end),
+                "span": (lambda: self.telemetry_span, self.set_telemetry_span),
+                "resolution": (lambda: self.telemetry_resolution, self.set_telemetry_resolution),
+                "fetch": (None, self.fetch_telemetry_data),
+                "data": (lambda: self.telemetry_data, None)
+            },
             "triggering_frames": (lambda: self.fem.triggering_frames, self.set_triggering_frames),
             "triggering_mode": (lambda: self.fem.triggering_mode, self.set_triggering_mode)
         })
@@ -426,6 +460,7 @@ class Hexitec():
                 self.fem.acquisition_completed = False
         fem_health = self.fem.get_health()
         self.fem_health = fem_health
+        self.telemetry.append({"fem_health": float(fem_health)})
 
         # Any leak detector error?
         try:
@@ -467,6 +502,41 @@ class Hexitec():
         # Determine system health
         self.system_health = self.fem_health and self.leak_health
 
+    def set_telemetry_start(self, start):
+        """Set start (seconds since epoch) of telemetry time range, 0 = end less span."""
+        if start < 0:
+            raise ParameterTreeError("Telemetry start cannot be negative")
+        self.telemetry_start = start
+
+    def set_telemetry_end(self, end):
+        """Set end (seconds since epoch) of telemetry time range, 0 = now."""
+        if end < 0:
+            raise ParameterTreeError("Telemetry end cannot be negative")
+        self.telemetry_end = end
+
+    def set_telemetry_span(self, span):
+        """Set duration (seconds) of telemetry time range, used if start is 0."""
+        if span <= 0:
+            raise ParameterTreeError("Telemetry span must be positive")
+        self.telemetry_span = span
+
+    def set_telemetry_resolution(self, resolution):
+        """Set resolution (seconds) of telemetry returned, 0 = finest available."""
+        resolutions = [0] + [tier_resolution for (tier_resolution, _) in self.telemetry.tiers]
+        if resolution not in resolutions:
+            raise ParameterTreeError("Invalid telemetry resolution; Valid options: {}".format(resolutions))
+        self.telemetry_resolution = resolution
+
+    def get_telemetry_data(self):
+        """Return telemetry within selected time range."""
+        end = self.telemetry_end if self.telemetry_end else time.time()
+        start = self.telemetry_start if self.telemetry_start else end - self.telemetry_span
+        return self.telemetry.as_dict(start, end, self.telemetry_resolution or None)
+
+    def fetch_telemetry_data(self, msg=None):
+        """Fetch telemetry within selected time range into data, read back on request only."""
+        self.telemetry_data = self.get_telemetry_data()
+
     def _set_leak_error(self, error):
         self.leak_error = str(error)
 
@@ -476,6 +546,7 @@ class Hexitec():
     def shutdown_processing(self):
         """Stop processing in DAQ."""
         self.daq.shutdown_processing = True
+        self.daq.notify_status_change()
 
     def _get_od_status(self, adapter):
         """Get status from adapter."""
@@ -575,6 +646,7 @@ class Hexitec():
         config["daq/lvspectra_frequency"] = self.daq.lvspectra_frequency
         config["daq/lvspectra_per_second"] = self.daq.lvspectra_per_second
         config["daq/max_frames_received"] = self.daq.max_frames_received
+        config["daq/metadata_mode"] = self.daq._get_metadata_mode()
         config["daq/pass_processed"] = self.daq.pass_processed
         config["daq/pass_raw"] = self.daq.pass_raw
         config["daq/pixel_grid_size"] = self.daq.pixel_grid_size
@@ -631,6 +703,9 @@ class Hexitec():
                 self.daq._set_threshold_mode(config["daq/threshold_mode"])
                 self.daq._set_threshold_value(config["daq/threshold_value"])
                 self.daq._set_compression_type(config["daq/compression_type"])
+                # Settings saved before meta data modes were introduced lack this key
+                if "daq/metadata_mode" in config:
+                    self.daq._set_metadata_mode(config["daq/metadata_mode"])
                 if not_triggered:
                     if config["duration_enable"]:
                         self.set_duration(config["duration"])
@@ -882,6 +957,8 @@ class Hexitec():
             request = ApiAdapterRequest("", content_type="application/json")
             self.adapters["fp"].put(command, request)
             self.shutdown_processing()
+            # Cancelled run's meta data written in full once processing stops
+            self.daq.discard_staged_metadata()
             self.software_state = "Idle"
 
     def collect_offsets(self, msg=None):
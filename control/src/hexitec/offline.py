@@ -0,0 +1,444 @@
+"""
+offline: Reprocess raw_frames without the odin-data stack, mirroring the frameProcessor plugins.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent import futures
+
+import h5py
+import numpy as np
+
+from hexitec.CoefficientStore import CoefficientStoreError, coefficient_store
+
+
+class HexitecOfflineError(Exception):
+    """Simple exception class for HexitecOffline to wrap lower-level exceptions."""
+
+    pass
+
+
+def read_coefficients(filename, pixels, default_value, dtype=np.float32):
+    """
+    Read one value per pixel from whitespace separated text file, through the coefficient store.
+
+    As the frameProcessor plugins; A file not holding exactly pixels values
+    is rejected, and every pixel assigned default_value instead.
+    Returns tuple of (array of values, whether read successfully).
+    """
+    try:
+        values = coefficient_store.load(filename, dtype=dtype, size=pixels)
+    except CoefficientStoreError as e:
+        logging.error(str(e))
+        values = np.zeros(0, dtype=dtype)
+    if values.size != pixels:
+        logging.error("Expected %s values but read %s values from file: %s" % (pixels, values.size, filename))
+        logging.warning("Using default values instead")
+        return np.full(pixels, default_value, dtype=dtype), False
+    return values, True
+
+
+def neighbour_offsets(pixel_grid_size):
+    """Return (row, column) offsets of neighbours in pixel_grid_size grid, in plugins' scan order."""
+    distance = int(pixel_grid_size) // 2
+    return [(row, column) for row in range(-distance, distance + 1)
+            for column in range(-distance, distance + 1) if (row, column) != (0, 0)]
+
+
+def pad_frames(frames, distance):
+    """Return copy of (N, rows, columns) frames, surrounded by distance pixels of zeros."""
+    number_frames, rows, columns = frames.shape
+    extended = np.zeros((number_frames, rows + 2 * distance, columns + 2 * distance), dtype=np.float32)
+    extended[:, distance:distance + rows, distance:distance + columns] = frames
+    return extended
+
+
+def shared_events(extended, distance):
+    """
+    Return mask of padded frames' non-zero pixels having a non-zero neighbour within distance.
+
+    Neighbours are counted by adding the padded frames' shifted views, a row then a column
+    at a time. Any other non-zero pixel is isolated; Neither charge sharing algorithm changes
+    it (pixels only ever become zero), nor does it affect any other pixel.
+    """
+    positive = extended > 0
+    number_frames, rows, columns = extended.shape
+    rows, columns = rows - 2 * distance, columns - 2 * distance
+    counts = positive[:, :, 0:columns].astype(np.uint8)
+    for offset in range(1, 2 * distance + 1):
+        counts += positive[:, :, offset:offset + columns]
+    window = counts[:, 0:rows].copy()
+    for offset in range(1, 2 * distance + 1):
+        window += counts[:, offset:offset + rows]
+    shared = np.zeros_like(positive)
+    interior = positive[:, distance:distance + rows, distance:distance + columns]
+    shared[:, distance:distance + rows, distance:distance + columns] = interior & (window > 1)
+    return shared
+
+
+def event_steps(mask):
+    """
+    Yield (frames, rows, columns) of every frame's k:th masked pixel, for k = 0, 1, ..
+
+    Within each frame, pixels are yielded in raster order (as the plugins visit them);
+    Each step holds at most one pixel per frame, so frames are updated independently.
+    """
+    frame_index, row_index, column_index = np.nonzero(mask)
+    if frame_index.size == 0:
+        return
+    counts = np.bincount(frame_index)
+    first = np.cumsum(counts) - counts
+    rank = np.arange(frame_index.size) - first[frame_index]
+    order = np.argsort(rank, kind='stable')
+    boundaries = np.cumsum(np.bincount(rank))
+    start = 0
+    for end in boundaries:
+        step = order[start:end]
+        yield frame_index[step], row_index[step], column_index[step]
+        start = end
+
+
+def process_addition(frames, pixel_grid_size=3):
+    """
+    Apply charge sharing addition to (N, rows, columns) batch of frames, in place.
+
+    Identical to HexitecAdditionPlugin::process_addition; Each non-zero pixel
+    scans its neighbourhood in raster order, moving the running total onto
+    whichever of the two pixels is (so far) the largest. Only shared events
+    are scanned, one per frame of the batch at a time.
+    """
+    distance = int(pixel_grid_size) // 2
+    extended = pad_frames(frames, distance)
+    offsets = neighbour_offsets(pixel_grid_size)
+    for frame, row, column in event_steps(shared_events(extended, distance)):
+        # Pixel may have been absorbed by a neighbour since
+        live = extended[frame, row, column] > 0
+        frame, row, column = frame[live], row[live], column[live]
+        max_row, max_column = row.copy(), column.copy()
+        for row_offset, column_offset in offsets:
+            neighbour_row, neighbour_column = row + row_offset, column + column_offset
+            neighbour = extended[frame, neighbour_row, neighbour_column]
+            positive = neighbour > 0
+            if not positive.any():
+                continue
+            maximum = extended[frame, max_row, max_column]
+            move = positive & (neighbour >= maximum)
+            keep = positive & ~move
+            # Neighbour is the larger; Add maximum onto neighbour, which becomes maximum
+            extended[frame[move], neighbour_row[move], neighbour_column[move]] = neighbour[move] + maximum[move]
+            extended[frame[move], max_row[move], max_column[move]] = 0
+            max_row[move] = neighbour_row[move]
+            max_column[move] = neighbour_column[move]
+            # Otherwise add neighbour onto maximum
+            extended[frame[keep], max_row[keep], max_column[keep]] = maximum[keep] + neighbour[keep]
+            extended[frame[keep], neighbour_row[keep], neighbour_column[keep]] = 0
+    frames[:] = extended[:, distance:extended.shape[1] - distance, distance:extended.shape[2] - distance]
+    return frames
+
+
+def process_discrimination(frames, pixel_grid_size=3):
+    """
+    Apply charge sharing discrimination to (N, rows, columns) batch of frames, in place.
+
+    Identical to HexitecDiscriminationPlugin::process_discrimination; A non-zero
+    pixel with any non-zero neighbour is cleared, together with its neighbourhood.
+    Only shared events are scanned, one per frame of the batch at a time.
+    """
+    distance = int(pixel_grid_size) // 2
+    extended = pad_frames(frames, distance)
+    offsets = neighbour_offsets(pixel_grid_size)
+    for frame, row, column in event_steps(shared_events(extended, distance)):
+        live = extended[frame, row, column] > 0
+        frame, row, column = frame[live], row[live], column[live]
+        shared = np.zeros(frame.size, dtype=bool)
+        for row_offset, column_offset in offsets:
+            shared |= extended[frame, row + row_offset, column + column_offset] > 0
+        frame, row, column = frame[shared], row[shared], column[shared]
+        for row_offset in range(-distance, distance + 1):
+            for column_offset in range(-distance, distance + 1):
+                extended[frame, row + row_offset, column + column_offset] = 0
+    frames[:] = extended[:, distance:extended.shape[1] - distance, distance:extended.shape[2] - distance]
+    return frames
+
+
+def plan_shards(filenames, dataset="raw_frames", frames_per_shard=10000):
+    """
+    Split every file's dataset into (filename, first, last) frame ranges.
+
+    Shards are rounded up to a whole number of the dataset's HDF5 chunks,
+    so no chunk is read (and decompressed) by more than one worker.
+    """
+    shards = []
+    for filename in filenames:
+        with h5py.File(filename, 'r') as hdf_file:
+            if dataset not in hdf_file:
+                raise HexitecOfflineError("'%s' has no dataset '%s'" % (filename, dataset))
+            number_frames = hdf_file[dataset].shape[0]
+            chunk_frames = hdf_file[dataset].chunks[0] if hdf_file[dataset].chunks else 1
+        shard_frames = -(-max(frames_per_shard, 1) // chunk_frames) * chunk_frames
+        for first in range(0, number_frames, shard_frames):
+            shards.append((filename, first, min(first + shard_frames, number_frames)))
+    return shards
+
+
+def process_shards(config, sensors_layout, batch_size, dataset, shards):
+    """Process shards in a worker process, returning the accumulated (partial) HexitecOffline."""
+    offline = HexitecOffline(config, sensors_layout, batch_size)
+    for filename, first, last in shards:
+        offline.process_range(filename, first, last, dataset)
+    # Only the accumulated results need pickling back, not the per pixel coefficients
+    offline.thresholds = offline.gradients = offline.intercepts = None
+    return offline
+
+
+class HexitecOffline():
+    """
+    Reprocess raw_frames through the plugin chain GenerateConfigFiles configures.
+
+    Reorder, threshold, [calibration], [addition], [discrimination], summed_image and
+    histogram are applied to batches of frames at once, accumulating the summed_images,
+    spectra_bins, pixel_spectra and summed_spectra datasets the frameProcessor writes.
+    """
+
+    OPTIONAL_PLUGINS = ["calibration", "addition", "discrimination"]
+    THRESHOLD_MODES = ["none", "value", "filename"]
+
+    def __init__(self, config, sensors_layout="2x6", batch_size=1000):
+        """
+        Initialize the HexitecOffline object.
+
+        :param config: dictionary shaped as HexitecDAQ's "config" branch
+        :param sensors_layout: sensors layout, i.e. "2x6"
+        :param batch_size: number of frames processed at once
+        """
+        self.config = config
+        self.sensors_layout = sensors_layout
+        self.batch_size = batch_size
+        try:
+            rows_of_sensors, columns_of_sensors = [int(x) for x in sensors_layout.split("x")]
+        except ValueError:
+            raise HexitecOfflineError("Invalid sensors layout: '%s'" % sensors_layout) from None
+        self.rows = rows_of_sensors * 80
+        self.columns = columns_of_sensors * 80
+        self.pixels = self.rows * self.columns
+        self.plugin_chain = ["reorder", "threshold"]
+        for plugin in self.OPTIONAL_PLUGINS:
+            if self._setting(plugin, "enable"):
+                self.plugin_chain.append(plugin)
+        self.plugin_chain += ["summed_image", "histogram"]
+        self.configure()
+        self.reset()
+
+    def _setting(self, plugin, key):
+        """Look up plugin's setting called key."""
+        try:
+            return self.config[plugin][key]
+        except KeyError:
+            raise HexitecOfflineError("Config missing '%s/%s' setting" % (plugin, key)) from None
+
+    def configure(self):
+        """Load threshold(s), calibration coefficients and histogram settings."""
+        self.threshold_mode = self._setting("threshold", "threshold_mode")
+        if self.threshold_mode not in self.THRESHOLD_MODES:
+            raise HexitecOfflineError("Invalid threshold mode; Valid options: %s" % self.THRESHOLD_MODES)
+        self.threshold_value = int(self._setting("threshold", "threshold_value"))
+        self.thresholds = None
+        if self.threshold_mode == "filename":
+            thresholds, read_ok = read_coefficients(self._setting("threshold", "threshold_filename"),
+                                                    self.pixels, 0, np.uint16)
+            self.thresholds = thresholds.reshape(self.rows, self.columns)
+        self.gradients = self.intercepts = None
+        if "calibration" in self.plugin_chain:
+            gradients, read_ok = read_coefficients(self._setting("calibration", "gradients_filename"),
+                                                   self.pixels, 1)
+            intercepts, read_ok = read_coefficients(self._setting("calibration", "intercepts_filename"),
+                                                    self.pixels, 0)
+            self.gradients = gradients.reshape(self.rows, self.columns)
+            self.intercepts = intercepts.reshape(self.rows, self.columns)
+        self.addition_grid_size = int(self.config.get("addition", {}).get("pixel_grid_size", 3))
+        self.discrimination_grid_size = int(self.config.get("discrimination", {}).get("pixel_grid_size", 3))
+        self.threshold_lower = int(self._setting("summed_image", "threshold_lower"))
+        self.threshold_upper = int(self._setting("summed_image", "threshold_upper"))
+        self.bin_start = self._setting("histogram", "bin_start")
+        self.bin_end = self._setting("histogram", "bin_end")
+        self.bin_width = float(self._setting("histogram", "bin_width"))
+        if self.bin_width <= 0:
+            raise HexitecOfflineError("Histogram bin width must be positive")
+        self.number_bins = int(((self.bin_end - self.bin_start) / self.bin_width) + 0.5)
+        self.spectra_bins = (self.bin_start + np.arange(self.number_bins) * self.bin_width).astype(np.float32)
+
+    def reset(self):
+        """Clear summed image and histograms, as at the start of an acquisition."""
+        self.summed_image = np.zeros((self.rows, self.columns), dtype=np.uint32)
+        self.pixel_spectra = np.zeros((self.rows, self.columns, self.number_bins), dtype=np.float32)
+        self.summed_spectra = np.zeros(self.number_bins, dtype=np.uint64)
+        self.frames_processed = 0
+        self.events_in_frames = 0
+        self.frames_per_second = 0.0
+
+    def process(self, raw_frames):
+        """
+        Process (N, rows, columns) batch of raw frames, accumulating summed image and histograms.
+
+        Returns the batch's processed_frames.
+        """
+        # Reorder: pixels are not reordered, only converted into floats
+        frames = np.asarray(raw_frames).astype(np.float32).reshape(-1, self.rows, self.columns)
+        self.apply_threshold(frames)
+        self.events_in_frames += int(np.count_nonzero(frames > 0))
+        if "calibration" in self.plugin_chain:
+            self.apply_calibration(frames)
+        if "addition" in self.plugin_chain:
+            process_addition(frames, self.addition_grid_size)
+        if "discrimination" in self.plugin_chain:
+            process_discrimination(frames, self.discrimination_grid_size)
+        self.add_to_summed_image(frames)
+        self.add_to_histograms(frames)
+        self.frames_processed += len(frames)
+        return frames
+
+    def apply_threshold(self, frames):
+        """Clear pixels below threshold value, or their pixel's threshold from file."""
+        if self.threshold_mode == "value":
+            frames[frames < self.threshold_value] = 0
+        elif self.threshold_mode == "filename":
+            frames[frames < self.thresholds] = 0
+
+    def apply_calibration(self, frames):
+        """Convert non-zero pixels into energies."""
+        events = frames > 0
+        frames[:] = np.where(events, frames * self.gradients + self.intercepts, frames)
+
+    def add_to_summed_image(self, frames):
+        """Count each pixel's events between lower and upper thresholds."""
+        values = frames.astype(np.int64)
+        self.summed_image += np.count_nonzero((values > self.threshold_lower) & (values < self.threshold_upper),
+                                              axis=0).astype(np.uint32)
+
+    def add_to_histograms(self, frames):
+        """Histogram every non-zero pixel's energy, per pixel and summed across all pixels."""
+        frame_pixels = frames.reshape(len(frames), self.pixels)
+        frame_index, pixel = np.nonzero(frame_pixels > 0)
+        # Bins count from 0 (not bin_start) as HexitecHistogramPlugin's
+        bins = (frame_pixels[frame_index, pixel].astype(np.float64) / self.bin_width).astype(np.int64)
+        in_range = bins < self.number_bins
+        bins, pixel = bins[in_range], pixel[in_range]
+        self.summed_spectra += np.bincount(bins, minlength=self.number_bins).astype(np.uint64)
+        indices, counts = np.unique(pixel * self.number_bins + bins, return_counts=True)
+        self.pixel_spectra.reshape(-1)[indices] += counts.astype(np.float32)
+
+    def merge(self, other):
+        """Add other's (partial) summed image, histograms and counters onto this one's."""
+        self.summed_image += other.summed_image
+        self.pixel_spectra += other.pixel_spectra
+        self.summed_spectra += other.summed_spectra
+        self.frames_processed += other.frames_processed
+        self.events_in_frames += other.events_in_frames
+        return self
+
+    def process_range(self, filename, first, last, dataset="raw_frames"):
+        """Process frames first..last (exclusive) of filename's dataset, through own file handle."""
+        with h5py.File(filename, 'r') as hdf_file:
+            raw_frames = hdf_file[dataset]
+            for start in range(first, last, self.batch_size):
+                self.process(raw_frames[start:min(start + self.batch_size, last)])
+
+    def process_files(self, filenames, output_filename, dataset="raw_frames", workers=None,
+                      frames_per_shard=10000):
+        """
+        Reprocess every (node) file's dataset across worker processes, writing results into output_filename.
+
+        Each worker accumulates its share of (file, chunk range) shards into one partial
+        result. Each partial is folded into this one as soon as its worker completes, and
+        then dropped, so at most one partial is held here at a time.
+        Returns number of frames processed per second.
+        """
+        start = time.perf_counter()
+        self.reset()
+        shards = plan_shards(filenames, dataset, frames_per_shard)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(shards)))
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            # as_completed releases each future once yielded; Only the loop holds it after
+            jobs = futures.as_completed([executor.submit(process_shards, self.config, self.sensors_layout,
+                                                         self.batch_size, dataset, shards[worker::workers])
+                                         for worker in range(workers)])
+            for job in jobs:
+                self.merge(job.result())
+                del job
+        with h5py.File(output_filename, 'w') as output_file:
+            self.write(output_file)
+        elapsed = time.perf_counter() - start
+        self.frames_per_second = self.frames_processed / elapsed if elapsed > 0 else 0.0
+        logging.info("Processed %s frames from %s file(s), %s workers: %.1f frames/s" %
+                     (self.frames_processed, len(filenames), workers, self.frames_per_second))
+        return self.frames_per_second
+
+    def process_file(self, input_filename, output_filename, dataset="raw_frames", pass_processed=False):
+        """
+        Reprocess every frame of input_filename's dataset, writing results into output_filename.
+
+        Returns number of frames processed per second.
+        """
+        start = time.perf_counter()
+        self.reset()
+        with h5py.File(input_filename, 'r') as input_file, h5py.File(output_filename, 'w') as output_file:
+            if dataset not in input_file:
+                raise HexitecOfflineError("'%s' has no dataset '%s'" % (input_filename, dataset))
+            raw_frames = input_file[dataset]
+            number_frames = raw_frames.shape[0]
+            processed = None
+            if pass_processed:
+                processed = output_file.create_dataset("processed_frames", (number_frames, self.rows, self.columns),
+                                                       dtype=np.float32, chunks=(1, self.rows, self.columns))
+            for first in range(0, number_frames, self.batch_size):
+                last = min(first + self.batch_size, number_frames)
+                frames = self.process(raw_frames[first:last])
+                if processed is not None:
+                    processed[first:last] = frames
+            self.write(output_file)
+        elapsed = time.perf_counter() - start
+        self.frames_per_second = self.frames_processed / elapsed if elapsed > 0 else 0.0
+        return self.frames_per_second
+
+    def write(self, hdf_file):
+        """Write summed_images, spectra_bins, pixel_spectra and summed_spectra datasets into open hdf_file."""
+        hdf_file.create_dataset("summed_images", data=self.summed_image[np.newaxis])
+        hdf_file.create_dataset("spectra_bins", data=self.spectra_bins[np.newaxis])
+        hdf_file.create_dataset("pixel_spectra", data=self.pixel_spectra[np.newaxis])
+        hdf_file.create_dataset("summed_spectra", data=self.summed_spectra[np.newaxis])
+        hdf_file.attrs["plugin_chain"] = ",".join(self.plugin_chain)
+        hdf_file.attrs["frames_processed"] = self.frames_processed
+
+
+def main():
+    """Reprocess a raw_frames file according to a json file of HexitecDAQ's config settings."""
+    parser = argparse.ArgumentParser(description="Reprocess Hexitec raw_frames offline")
+    parser.add_argument("input", nargs="+", help="HDF5 file(s) containing raw_frames, i.e. one per node")
+    parser.add_argument("output", help="HDF5 file to write processed datasets into")
+    parser.add_argument("--config", required=True, help="json file of HexitecDAQ's config branch")
+    parser.add_argument("--sensors-layout", default="2x6", help="sensors layout, i.e. 2x6")
+    parser.add_argument("--batch-size", type=int, default=1000, help="frames processed at once")
+    parser.add_argument("--pass-processed", action="store_true", help="also write processed_frames (single file)")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0: one per core, 1: no workers)")
+    parser.add_argument("--frames-per-shard", type=int, default=10000, help="frames per worker task")
+    args = parser.parse_args()
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    offline = HexitecOffline(config, args.sensors_layout, args.batch_size)
+    if args.pass_processed or args.workers == 1:
+        if len(args.input) > 1:
+            parser.error("Multiple input files require worker processes")
+        rate = offline.process_file(args.input[0], args.output, pass_processed=args.pass_processed)
+    else:
+        rate = offline.process_files(args.input, args.output, workers=args.workers or None,
+                                     frames_per_shard=args.frames_per_shard)
+    print("Processed %s frames, %.1f frames/s" % (offline.frames_processed, rate))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,139 @@
+"""
+rebin: Derive coarser (or narrower) histograms from a run's stored pixel_spectra.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import argparse
+import logging
+import time
+
+import h5py
+import numpy as np
+
+from hexitec.offline import HexitecOfflineError
+
+
+def rebin_indices(spectra_bins, bin_start, bin_end, bin_width):
+    """
+    Map stored spectra_bins onto new histogram settings.
+
+    The histogram plugin fills bin k with energies from k * bin_width to (k + 1) * bin_width,
+    counting from 0 whatever bin_start is; bin_start only labels the bins (spectra_bins)
+    and, with bin_end, sets their number. So stored bin k holds the same energies under any
+    bin_start, and new bin k sums stored bins from k * (bin_width / stored width) onwards.
+    A bin_start other than the stored one would relabel bins without changing their energies,
+    so it is rejected. New bins must each span a whole number of stored bins, within the
+    stored range. Returns tuple of (slice of stored bins used, index of each new bin's first
+    stored bin within that slice, new spectra_bins).
+    """
+    spectra_bins = np.asarray(spectra_bins, dtype=np.float64)
+    if spectra_bins.size < 2:
+        raise HexitecOfflineError("Cannot determine stored bin width from %s bin(s)" % spectra_bins.size)
+    stored_width = spectra_bins[1] - spectra_bins[0]
+    factor = bin_width / stored_width
+    if (factor < 1) or not np.isclose(factor, round(factor)):
+        raise HexitecOfflineError("Bin width %s not a multiple of stored bin width %s" % (bin_width, stored_width))
+    if not np.isclose(bin_start, spectra_bins[0]):
+        raise HexitecOfflineError("Bin start %s differs from stored bin start %s" % (bin_start, spectra_bins[0]))
+    factor = int(round(factor))
+    number_bins = int(((bin_end - bin_start) / bin_width) + 0.5)
+    if number_bins < 1:
+        raise HexitecOfflineError("Bin end must exceed bin start by at least one bin width")
+    if number_bins * factor > spectra_bins.size:
+        raise HexitecOfflineError("Bin end %s beyond stored bins' end %s" %
+                                  (bin_end, spectra_bins[-1] + stored_width))
+    indices = np.arange(number_bins) * factor
+    new_bins = (bin_start + np.arange(number_bins) * bin_width).astype(np.float32)
+    return slice(0, number_bins * factor), indices, new_bins
+
+
+def rebin(spectra, stored_bins, indices):
+    """Sum (last axis) stored_bins of spectra into new bins."""
+    return np.add.reduceat(spectra[..., stored_bins], indices, axis=-1)
+
+
+def open_block_cached(run_file, name, rows_per_block):
+    """
+    Open run_file's (entries, rows, ...) dataset name with a chunk cache sized to a block of rows.
+
+    The cache holds every chunk one entry's block of rows spans, so each chunk is read once per
+    block however the dataset is chunked, and memory stays bounded by those chunks.
+    """
+    dataset = run_file[name]
+    shape, chunks, itemsize = dataset.shape, dataset.chunks, dataset.dtype.itemsize
+    if chunks is None:
+        return dataset
+    # An open dataset keeps its chunk cache, so close it before reopening
+    dataset.id.close()
+    # A block may straddle chunk boundaries, so may span one chunk (of rows) more than it fills
+    spanned = min(-(-rows_per_block // chunks[1]) + 1, -(-shape[1] // chunks[1]))
+    for length, chunk_length in zip(shape[2:], chunks[2:]):
+        spanned *= -(-length // chunk_length)
+    chunk_bytes = int(np.prod(chunks)) * itemsize
+    _, slots, _, preemption = run_file.id.get_access_plist().get_cache()
+    access = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+    access.set_chunk_cache(slots, spanned * chunk_bytes, preemption)
+    return h5py.Dataset(h5py.h5d.open(run_file.id, name.encode(), access))
+
+
+def rebin_spectra(filename, bin_start, bin_end, bin_width, output_filename=None, group="rebinned",
+                  rows_per_block=16):
+    """
+    Rebin a run's pixel_spectra and summed_spectra into new histogram settings.
+
+    pixel_spectra is read a block of rows at a time, so memory is bounded by the block size
+    (or, if larger, the chunks a block spans).
+    Datasets are written beneath group, either into the run file (output_filename None)
+    or a sidecar file. Returns seconds taken.
+    """
+    start = time.perf_counter()
+    with h5py.File(filename, 'r' if output_filename else 'a') as run_file:
+        for dataset in ("spectra_bins", "pixel_spectra", "summed_spectra"):
+            if dataset not in run_file:
+                raise HexitecOfflineError("'%s' has no dataset '%s'" % (filename, dataset))
+        stored_bins, indices, new_bins = rebin_indices(run_file["spectra_bins"][0], bin_start, bin_end, bin_width)
+        output_file = h5py.File(output_filename, 'a') if output_filename else run_file
+        try:
+            destination = output_file.require_group(group)
+            for dataset in ("spectra_bins", "pixel_spectra", "summed_spectra"):
+                if dataset in destination:
+                    del destination[dataset]
+            # Keep the chunks of the block of rows being read cached
+            pixel_spectra = open_block_cached(run_file, "pixel_spectra", rows_per_block)
+            entries, rows, columns = pixel_spectra.shape[:3]
+            destination.create_dataset("spectra_bins", data=np.tile(new_bins, (entries, 1)))
+            destination.create_dataset("summed_spectra", data=rebin(run_file["summed_spectra"][()], stored_bins, indices))
+            rebinned = destination.create_dataset("pixel_spectra", (entries, rows, columns, new_bins.size),
+                                                  dtype=pixel_spectra.dtype, chunks=(1, rows, columns, new_bins.size))
+            for entry in range(entries):
+                for first in range(0, rows, rows_per_block):
+                    last = min(first + rows_per_block, rows)
+                    rebinned[entry, first:last] = rebin(pixel_spectra[entry, first:last], stored_bins, indices)
+            destination.attrs["bin_start"] = bin_start
+            destination.attrs["bin_end"] = bin_end
+            destination.attrs["bin_width"] = bin_width
+        finally:
+            if output_file is not run_file:
+                output_file.close()
+    elapsed = time.perf_counter() - start
+    logging.info("Rebinned %s into %s bins in %.2f s" % (filename, new_bins.size, elapsed))
+    return elapsed
+
+
+def main():
+    """Rebin a run file's histograms, without reprocessing its frames."""
+    parser = argparse.ArgumentParser(description="Rebin Hexitec pixel_spectra, summed_spectra")
+    parser.add_argument("input", help="HDF5 file containing spectra_bins, pixel_spectra, summed_spectra")
+    parser.add_argument("--bin-start", type=float, required=True)
+    parser.add_argument("--bin-end", type=float, required=True)
+    parser.add_argument("--bin-width", type=float, required=True)
+    parser.add_argument("--output", default=None, help="sidecar HDF5 file (default: write into input file)")
+    parser.add_argument("--group", default="rebinned", help="group new datasets are written beneath")
+    args = parser.parse_args()
+    elapsed = rebin_spectra(args.input, args.bin_start, args.bin_end, args.bin_width, args.output, args.group)
+    print("Rebinned in %.2f s" % elapsed)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,137 @@
+"""
+Takes a pcap (or HDF5) file and transmits frames across frame receivers as the FEM does in Farm Mode.
+
+Frames are spread across the Farm Mode config file's farm targets according to the look up tables
+the FEM is given (see FarmMode), by one sender process per core (at most one per look up table entry).
+
+@author: Christian Angelsen
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import sys
+import os
+
+import h5py
+
+from hexitec.FarmMode import load_farm_mode_targets, farm_mode_config, frame_destinations, FarmModeError
+from hexitec.PcapStream import read_frames, PcapStreamError
+from hexitec.UdpReplay import farm_replay, format_statistics, UdpReplayError
+
+
+class HexitecFarmProducer(object):
+    """Produce and transmit frames to Farm Mode's frame receivers."""
+
+    def __init__(self, config, filename, frames, rows, columns, interval, gigabits, processes, operating_mode,
+                 frames_per_trigger, packet_size, normal_headers, header_size, quiet):
+        """Initialise object with command line arguments."""
+        self.frames = frames
+        self.NROWS = rows
+        self.NCOLS = columns
+        self.interval = interval
+        self.gigabits = gigabits
+        self.processes = processes
+        self.packet_size = packet_size
+        self.extended_headers = not normal_headers
+        self.header_size = header_size
+        self.quiet = quiet
+        self.filename = filename
+
+        try:
+            targets = load_farm_mode_targets(config)
+            ips1, ips2, _, _, ports1, ports2 = \
+                farm_mode_config(targets["farm_target_ip"], targets["farm_target_mac"],
+                                 targets["farm_target_port"], operating_mode, frames_per_trigger)
+            self.destinations = frame_destinations(ips1, ips2, ports1, ports2)
+        except FarmModeError as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
+
+        if os.access(self.filename, os.R_OK):
+            self.file_contents = self.load_frames()
+        else:
+            print("Unable to open: {}. Does it exist?".format(self.filename))
+            sys.exit(1)
+
+    def load_frames(self):
+        """Load frames from HDF5 file's raw_frames, or from pcap file's UDP data."""
+        try:
+            if self.filename.endswith(".h5"):
+                with h5py.File(self.filename, 'r') as f:
+                    frames = f["raw_frames"][()]
+            else:
+                frames = read_frames(self.filename, self.NROWS, self.NCOLS, extended_headers=self.extended_headers,
+                                     header_size=self.header_size)
+        except (PcapStreamError, OSError, KeyError) as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
+
+        print("Loaded {} frames from {}".format(len(frames), self.filename))
+
+        return frames
+
+    def run(self):
+        """Transmit frames across frame receivers."""
+        if not self.quiet:
+            print("Farm Mode look up tables send frames to, in turn:")
+            for index, (host, port) in enumerate(self.destinations):
+                print("  {}: {}:{}".format(index, host, port))
+        try:
+            statistics = farm_replay(self.file_contents, self.destinations, self.frames, processes=self.processes,
+                                     packet_size=self.packet_size, extended_headers=self.extended_headers,
+                                     header_size=self.header_size, gigabits_per_second=self.gigabits,
+                                     frame_interval=self.interval)
+        except UdpReplayError as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
+
+        if not self.quiet:
+            for index, sender in enumerate(statistics["senders"]):
+                print("  Sender {}: {}".format(index, format_statistics(sender)))
+            receivers = collections.Counter()
+            for slot, destination in enumerate(self.destinations):
+                receivers[destination] += len(range(slot, self.frames, len(self.destinations)))
+            for (host, port), frames in sorted(receivers.items()):
+                print("  {}:{} sent {} frames".format(host, port, frames))
+
+        print(format_statistics(statistics))
+
+
+if __name__ == '__main__':
+
+    desc = "HexitecFarmProducer - generate Farm Mode UDP data streams from pcap (or HDF5) file"
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('config', help="Farm Mode config file (farm_target_ip/mac/port)")
+    parser.add_argument('filename', help='PCAP (Wireshark) file, or HDF5 file (raw_frames), to load')
+    parser.add_argument('--frames', '-n', type=int, default=1,
+                        help='select number of frames to transmit')
+    parser.add_argument('--rows', '-r', type=int, default=160,
+                        help='set number of rows in frame')
+    parser.add_argument('--columns', '-c', type=int, default=160,
+                        help='set number of columns in frame')
+    parser.add_argument('--interval', '-t', type=float, default=None,
+                        help="select (overall) frame interval in seconds")
+    parser.add_argument('--gigabits', '-g', type=float, default=None,
+                        help="select (overall) rate in Gb/s")
+    parser.add_argument('--processes', '-p', type=int, default=None,
+                        help="select number of sender processes (default: one per core)")
+    parser.add_argument('--operating_mode', '-o', choices=["EPAC", "NXCT"], default="EPAC",
+                        help="select operating mode")
+    parser.add_argument('--frames_per_trigger', '-f', type=int, default=0,
+                        help="select frames per trigger (0: untriggered)")
+    parser.add_argument('--packet_size', '-s', type=int, default=8000,
+                        help="select packet size (excluding header)")
+    parser.add_argument('--normal_headers', action="store_true",
+                        help="Use (8 byte) headers instead of (16 byte) extended headers")
+    parser.add_argument('--header_size', type=int, default=None,
+                        help="select header size, if padded (e.g. 64)")
+    parser.add_argument('--quiet', "-q", action="store_true",
+                        help="Suppress detailed print during operation")
+
+    args = parser.parse_args()
+
+    producer = HexitecFarmProducer(**vars(args))
+    producer.run()
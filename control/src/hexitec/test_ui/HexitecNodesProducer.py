@@ -11,13 +11,12 @@ Created on April 22, 2022
 from __future__ import print_function
 
 import argparse
-from scapy.all import PcapReader, UDP
-import numpy as np
-import socket
-import time
 import sys
 import os
 
+from hexitec.PcapStream import read_frames, PcapStreamError
+from hexitec.UdpReplay import PacketSet, UdpReplay
+
 
 class HexitecNodesProducerError(Exception):
     """Customised exception class."""
@@ -50,8 +49,6 @@ class HexitecNodesProducer(object):
     def __init__(self, host, port, frames, rows,
                  columns, interval, quiet, filename):
         """Initialise object with command line arguments."""
-        self.SOF = 1 << 63
-        self.EOF = 1 << 62
         # Default IP address?
         if host == "127.0.0.1":
             self.host = [host]
@@ -75,64 +72,22 @@ class HexitecNodesProducer(object):
         bytesPerPixel = 2
         bytesToRead = self.NPIXELS * bytesPerPixel
 
-        # Workout number of primary packets, size of trailing packet
-
-        totalFrameSize = self.NPIXELS * bytesPerPixel
-        self.primaryPackets = totalFrameSize // 8000
-        self.trailingPacketSize = totalFrameSize % 8000
-        # print("primaryPackets: {} trailingPacketSize: {}".format(
-        #     self.primaryPackets, self.trailingPacketSize))
-
         if os.access(self.filename, os.R_OK):
             print("Selected", self.frames, "frames, ", bytesToRead, "bytes.")
-            file_contents = self.decode_pcap()
-            self.byteStream = file_contents.tobytes()
+            self.file_contents = self.decode_pcap()
         else:
             print("Unable to open: {}. Does it exist?".format(self.filename))
             sys.exit(1)
 
     def decode_pcap(self):
-        """Extract extended header-sized UDP data from file."""
-        HEADER_SIZE = 8
-
-        # Initialise frame list and counters
-        frames = []
-        num_packets = 0
-        num_frames = 0
-
-        # Create a PCAP reader instance
-        packets = PcapReader(self.filename)
-
-        # Iterate through packets in reader
-        for packet in packets:
-            num_packets += 1
-
-            # Extract UDP packet payload
-            payload = bytes(packet[UDP].payload)
-
-            # Read frame header
-            header = np.frombuffer(payload[:HEADER_SIZE], dtype=np.uint64)
-            # print([hex(val) for val in header])
-
-            # If this is a start of frame packet, reset frame data
-            if int(header[0]) & self.SOF:
-                frame_data = bytes()
-
-            # Append frame payload to frame data, including header
-            frame_data += payload[HEADER_SIZE:]
-
-            # If end of frame packet, convert frame data to numpy array and append to frame list
-            if int(header[0]) & self.EOF:
-                frame = np.frombuffer(frame_data, dtype=np.uint16)
-                assert frame.size == self.NPIXELS
-                frames.append(frame)
-                num_frames += 1
-
-        # Convert frame list to 3D numpy array
-        frames = np.array(frames)
+        """Extract frames from file's UDP data, packets carrying (8 byte) headers."""
+        try:
+            frames = read_frames(self.filename, self.NROWS, self.NCOLS, extended_headers=False)
+        except PcapStreamError as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
 
-        print("Decoded {} frames from {} packets in PCAP file {}".format(
-            num_frames, num_packets, self.filename))
+        print("Decoded {} frames from PCAP file {}".format(len(frames), self.filename))
 
         return frames
 
@@ -140,91 +95,20 @@ class HexitecNodesProducer(object):
         """Transmit data to address, port."""
         print("Transmitting Hexitec data to address {} port(s) {} ...".format(self.host, self.port))
 
-        # Open UDP socket
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-        # Create packet header
-        header = np.zeros(1, dtype=np.uint64)
-
-        self.framesSent = 0
-        self.packetsSent = 0
-        self.totalBytesSent = 0
-
-        streamPosn = 0
-
-        runStartTime = time.time()
-
-        bytesRemaining = len(self.byteStream)
-        # TODO: BEWARE Merging with script supporting multiple port(s) transmission!
-        nodes = len(self.host)
-
-        # Loop over selected number of frame(s)
-        for frame in range(self.frames):
-
-            packetCounter = 0
-            bytesSent = 0
-
-            frameStartTime = time.time()
-
-            # Loop over packets within current frame
-            while (packetCounter < (self.primaryPackets + 1)):
-                header[0] = frame
-
-                if (packetCounter < self.primaryPackets):
-                    bytesToSend = 8000
-                    if (packetCounter == 0):
-                        header = header | (packetCounter << 32) | self.SOF
-                    else:
-                        header = header | (packetCounter << 32)
-                else:
-                    bytesToSend = self.trailingPacketSize
-                    header = header | (packetCounter << 32) | self.EOF
-
-                # Prepend header to current packet
-                packet = header.tobytes() + self.byteStream[streamPosn:streamPosn + bytesToSend]
-                # if (frame < 2):
-                #     print(" header: {0}".format(' '.join("0x{0:016X}".format(x) for x in header)))
-
-                if not self.quiet:
-                    print("bytesRemaining: {0:8} Sent: {1:8}".format(bytesRemaining, bytesSent),
-                          "Sending data {0:8} through {1:8}..".format(streamPosn,
-                                                                      streamPosn + bytesToSend))
-
-                # Transmit packet
-                # bytesSent += sock.sendto(packet, (self.host, self.port[frame % nodes]))
-                # # print("Sending frame {} to port {}".format(frame, self.port[frame % nodes]))
-                bytesSent += sock.sendto(packet, (self.host[frame % nodes], self.port[0]))
-                # print("Sending frame {} to host:port {}:{}".format(
-                #     frame, self.host[frame % nodes], self.port[0]))
-
-                bytesRemaining -= bytesToSend
-                packetCounter += 1
-                streamPosn += bytesToSend
-                # Start over if out of data to send
-                if (bytesRemaining == 0):
-                    bytesRemaining = len(self.byteStream)
-                    streamPosn = 0
-
-            if not self.quiet:
-                print("  Sent frame {} packets {} bytes {}".format(frame, packetCounter, bytesSent))
-
-            self.framesSent += 1
-            self.packetsSent += packetCounter
-            self.totalBytesSent += bytesSent
-
-            # Calculate wait time and sleep so that frames are sent at requested intervals
-            frameEndTime = time.time()
-            waitTime = (frameStartTime + self.interval) - frameEndTime
-            if waitTime > 0:
-                time.sleep(waitTime)
-
-        runTime = time.time() - runStartTime
+        # Build every packet once, (8 byte) headers renumbered for each frame sent
+        packet_set = PacketSet(self.file_contents, packet_size=8000, extended_headers=False)
+        replay = UdpReplay(packet_set, [(host, self.port[0]) for host in self.host], frame_interval=self.interval)
+        statistics = replay.run(self.frames)
+        replay.close()
 
-        # Close socket
-        sock.close()
+        self.framesSent = statistics["frames"]
+        self.packetsSent = statistics["packets"]
+        self.totalBytesSent = statistics["bytes"]
+        if not self.quiet:
+            print(replay.report())
 
         print("%d frames completed, %d bytes (including headers) sent in %.3f secs" %
-              (self.framesSent, self.totalBytesSent, runTime))
+              (self.framesSent, self.totalBytesSent, statistics["seconds"]))
 
 
 if __name__ == '__main__':
@@ -219,6 +219,127 @@ class RdmaUDP(object):
             print(" *** Write Ack Error: {} ***".format(e))
             raise struct.error("Write: bad reply: {}".format(e))
 
+    def read_many(self, addresses, burst_len=1, window=16, retries=2):
+        """
+        Read data from a number of addresses, keeping up to window reads in flight.
+
+        Replies are matched to their read by command number; A read without reply
+        within the UDP timeout is sent again (up to retries times).
+        :param addresses: The addresses of the registers to read
+        :param burst_len: Number of words to read from each address
+        :param window: Maximum number of outstanding reads
+        :param retries: Number of times an unanswered read is resent
+        Returns list of read data, one tuple per address.
+        """
+        commands = [(1, address, burst_len, []) for address in addresses]
+        return self.transact_many(commands, window, retries)
+
+    def transact_many(self, commands, window=16, retries=2):
+        """
+        Pipeline RDMA commands, matching replies to commands by (rolling) command number.
+
+        Command numbers roll over from the last one used if unique command numbers
+        are on, otherwise they are local to this call and cmd_no is left untouched.
+        :param commands: List of (op_code, address, burst_len, data) tuples
+        :param window: Maximum number of outstanding commands (1 - 255)
+        :param retries: Number of times an unanswered command is resent
+        Returns list of results in commands' order; read data for reads, ack for writes.
+        """
+        if not 0 < window < 256:
+            raise HexitecRdmaError("transact_many: window must be 1-255, not {}".format(window))
+        timeout = self.socket.gettimeout()
+        results = [None] * len(commands)
+        attempts = [0] * len(commands)
+        outstanding = {}    # cmd_no: (command index, deadline)
+        waiting = list(range(len(commands)))
+        waiting.reverse()
+        cmd_no = self.cmd_no if self.unique_cmd_no else 0
+        try:
+            while waiting or outstanding:
+                while waiting and len(outstanding) < window:
+                    index = waiting.pop()
+                    # Skip numbers still awaiting a reply (window < 256 leaves one free)
+                    cmd_no = (cmd_no + 1) & 0xFF
+                    while cmd_no in outstanding:
+                        cmd_no = (cmd_no + 1) & 0xFF
+                    self.send_command(commands[index], cmd_no)
+                    attempts[index] += 1
+                    outstanding[cmd_no] = (index, time.time() + timeout)
+                remaining = min(deadline for (_, deadline) in outstanding.values()) - time.time()
+                self.socket.settimeout(max(remaining, 0.001))
+                try:
+                    response = self.socket.recv(self.UDPMTU)
+                except socket.timeout:
+                    waiting.extend(self.expire_commands(commands, outstanding, attempts, retries))
+                    continue
+                reply_cmd_no, op_code, address, result = self.decode_reply(response)
+                if reply_cmd_no not in outstanding:
+                    # Late reply to a command since resent (or not ours); Discard it
+                    continue
+                index, _ = outstanding[reply_cmd_no]
+                if (op_code, address) != commands[index][:2]:
+                    # Late reply to an earlier command sharing this (wrapped) number
+                    continue
+                del outstanding[reply_cmd_no]
+                results[index] = self.strip_padding(commands[index], result)
+        finally:
+            self.socket.settimeout(timeout)
+            if self.unique_cmd_no:
+                self.cmd_no = cmd_no
+        return results
+
+    def expire_commands(self, commands, outstanding, attempts, retries):
+        """Remove outstanding commands past their deadline, returning (indices of) those to resend."""
+        now = time.time()
+        expired = []
+        for cmd_no, (index, deadline) in list(outstanding.items()):
+            if deadline > now:
+                continue
+            del outstanding[cmd_no]
+            if attempts[index] > retries:
+                op_code, address, _, _ = commands[index]
+                raise socket.error("No reply to op_code: {0:X} address: 0x{1:X} after {2} attempt(s)".format(
+                    op_code, address, attempts[index]))
+            expired.append(index)
+        return expired
+
+    def strip_padding(self, command, payload):
+        """Check a read reply carries burst_len words, omitting any padding word."""
+        op_code, _, burst_len, _ = command
+        if op_code == 0:
+            return payload
+        padding = (burst_len % 2)
+        if len(payload) != (burst_len + padding):
+            raise struct.error("expected {}, received {} words!".format(burst_len, len(payload)))
+        return payload[:burst_len]
+
+    def send_command(self, command, cmd_no):
+        """Send a single (read or write) command, tagged with command number cmd_no."""
+        op_code, address, burst_len, data = command
+        if self.debug:   # pragma: no coverage
+            print("T. burst_len: {0:X} cmd_no: {1:0X} op_code: {2:0X} address: 0x{3:0X}".format(
+                  burst_len, cmd_no, op_code, address))
+        packet_str = "=HBBI" + "I" * len(data)
+        packet = struct.pack(packet_str, burst_len, cmd_no, op_code, address, *data)
+        try:
+            self.socket.sendto(packet, (self.rdma_ip, self.rdma_port))
+        except socket.error as e:
+            print(" *** Send Error: {0}. cmd_no: {1:X} op_code: {2:0X} address: 0x{3:0X} ***".format(
+                e, cmd_no, op_code, address))
+            raise socket.error(e)
+
+    def decode_reply(self, response):
+        """Decode reply packet into its command number, op_code, address and payload (words)."""
+        payload_length = (len(response) - self.header_size) // self.bytes_per_word
+        try:
+            decoded = struct.unpack("=HBBI" + "I" * payload_length, response)
+        except struct.error as e:
+            raise struct.error("bad reply: {}".format(e))
+        if self.ack:
+            decoded_str = ' '.join("0x{0:X}".format(x) for x in decoded)
+            print("T decoded: {0}.".format(decoded_str))
+        return decoded[1], decoded[2], decoded[3], decoded[4:]
+
     def convert_to_list(self, data, burst_len):
         """
         Turn data into reverse ordered list of 32 bit words.
@@ -242,8 +363,16 @@ class RdmaUDP(object):
         """Set debugging."""
         self.debug = enabled
 
-    def uart_rx(self, uart_address):
-        """Receive all data available in the UART."""
+    def uart_rx(self, uart_address, bulk=False):
+        """Receive all data available in the UART.
+
+        In bulk mode, the RX buffer level is read once and that many bytes drained without
+        reading back the control register or the level, before the count is verified.
+        :param uart_address: UART's base address
+        :param bulk: Drain reported level (True), or poll status after every byte (False)
+        """
+        if bulk:
+            return self.uart_rx_bulk(uart_address)
         debug = False    # True
 # #
 #        uart_status, tx_buff_full, tx_buff_empty, rx_buff_full, rx_buff_empty, rx_pkt_done \
@@ -290,6 +419,43 @@ class RdmaUDP(object):
         # print("(RdmaUDP) UART RX'd: {}".format(' '.join("0x{0:02X}".format(x) for x in rx_data)))
         return rx_data
 
+    def uart_rx_bulk(self, uart_address, window=16):
+        """Receive all data available in the UART, draining the reported RX buffer level.
+
+        Each byte costs a strobe, a deassert and a status read (carrying the byte), rather
+        than the seven transactions of the legacy sequence; Those of every byte of the
+        reported level are pipelined through transact_many, up to window at a time.
+        """
+        debug = False    # True
+        uart_status_addr = uart_address + uart_status_offset
+        uart_rx_ctrl_addr = uart_address + uart_rx_ctrl_offset
+        uart_status = self.read(uart_status_addr, burst_len=1, comment='Read UART Buffer Status 0')
+        rx_data = []
+        expected = 0
+        while not (uart_status[0] & rx_buff_empty_mask):
+            buff_level = (uart_status[0] & rx_buff_level_mask) >> 8
+            if debug:   # pragma: no coverage
+                print(" RX buff status: 0x{0:08X} level: {1}".format(uart_status[0], buff_level))
+            # Level may read 0 while (not empty) flag set; Take one byte, then look again
+            count = max(buff_level, 1)
+            expected += count
+            commands = []
+            for index in range(count):
+                commands.extend([(0, uart_rx_ctrl_addr, 1, [rx_buff_strb_mask]),
+                                 (0, uart_rx_ctrl_addr, 1, [deassert_all]),
+                                 (1, uart_status_addr, 1, [])])
+            # A strobe takes a byte, so is never resent
+            results = self.transact_many(commands, window=window, retries=0)
+            for uart_status in results[2::3]:
+                rx_data.append((uart_status[0] & rx_buff_data_mask) >> 16)
+                if uart_status[0] & rx_buff_empty_mask:
+                    break
+            # Status read after last byte tells whether more arrived meanwhile
+        if len(rx_data) != expected:
+            raise HexitecRdmaError("uart_rx: Expected {} byte(s), received {}".format(
+                expected, len(rx_data)))
+        return rx_data
+
     def reset_uart_rx_buffer(self):  # pragma: no coverage
         """Clear all RX data from the UART."""
         debug = False   # True
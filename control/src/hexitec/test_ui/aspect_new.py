@@ -649,9 +649,11 @@ if __name__ == '__main__':  # noqa: C901
             hxt.x10g_rdma.write(0x00000020, 0x00, burst_len=1, comment="Enabling training")
 
             vsr_status_addr = 0x000003E8  # Flags of interest: locked, +4 to get to the next VSR, et cetera for all VSRs
-            for vsr in VSR_ADDRESS:
+            # Read every VSR's status in one pipelined exchange
+            vsr_status_addrs = [vsr_status_addr + 4 * offset for offset in range(len(VSR_ADDRESS))]
+            vsr_statuses = hxt.x10g_rdma.read_many(vsr_status_addrs)
+            for vsr, vsr_status_addr, vsr_status in zip(VSR_ADDRESS, vsr_status_addrs, vsr_statuses):
                 index = vsr - 144
-                vsr_status = hxt.x10g_rdma.read(vsr_status_addr, burst_len=1, comment="Read vsr{}_status".format(index))
                 vsr_status = vsr_status[0]
                 locked = vsr_status & 0xFF
                 # print("vsr{0}_status 0x{1:08X} = 0x{2:08X}. Locked? 0x{3:X}".format(index, vsr_status_addr, vsr_status, locked))
@@ -662,7 +664,6 @@ if __name__ == '__main__':  # noqa: C901
                     # raise HexitecFemError("VSR{0} failed to lock! (0x{1:X})".format(vsr-143, locked))
                     fails += 1
                     which_ones.append( "{0}".format(vsr-143))
-                vsr_status_addr += 4
 
             reg07 = []
             reg89 = []
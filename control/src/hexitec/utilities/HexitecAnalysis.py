@@ -16,50 +16,50 @@ Created on November 15, 2023
 from __future__ import print_function
 
 import argparse
-from scapy.all import PcapReader, UDP
-import numpy as np
 import datetime
 import sys
 import os
 
+from hexitec.PcapStream import PcapStream, PcapStreamError, parse_header, HEADER, EXTENDED_HEADER
+from hexitec.PacketAnalysis import read_headers, analyse_packets, write_table, \
+    packets_per_frame, primary_packet_size
+
 
 class HexitecAnalysis(object):
     """Read packet by packet from file and examine their headers."""
 
-    def __init__(self, extended_headers, rows, columns, filename):
+    def __init__(self, extended_headers, rows, columns, filename, summary=False, table=None,
+                 packets_per_frame=None):
         """Initialise object with command line argument."""
-        self.SOF = 1 << 63
-        self.EOF = 1 << 62
         self.extended_headers = extended_headers
         self.NROWS = rows
         self.NCOLS = columns
         self.filename = filename
-        if self.extended_headers:
-            self.HEADER_SIZE = 16
-        else:
-            self.HEADER_SIZE = 8
+        self.table = table
+        # Packets making up each frame, determined from packets' size unless specified
+        self.packets_per_frame = packets_per_frame
 
         if os.access(self.filename, os.R_OK):
             print("Starting PCAP File Analysis", datetime.datetime.now())
-            self.decode_pcap()
+            if summary or table:
+                self.analyse()
+            else:
+                self.decode_pcap()
             print("Completed PCAP File Analysis", datetime.datetime.now())
         else:
             print("Unable to open: {}. Does it exist?".format(self.filename))
             sys.exit(1)
 
-    def extract_packet_number(self, header):
-        """Extract packet number from header."""
-        packet_number = 0
-        index = 0
-        if self.extended_headers:
-            index = 1
-            packet_number = int(header[index]) & 0xFF
-        return packet_number
+    def packet_follows(self, previous_packet_number, current_packet_number):
+        """Determine whether current packet follows previous packet, within or across frames."""
+        if (current_packet_number - 1) == previous_packet_number:
+            return True
+        return (previous_packet_number == self.packets_per_frame - 1) and (current_packet_number == 0)
 
     def count_lost_packets(self, previous_packet_number, current_packet_number):
         """Determine how many packets are missing between the two packet numbers."""
         if (current_packet_number < previous_packet_number):
-            current_packet_number += 20
+            current_packet_number += self.packets_per_frame
         # Ex: If packet 5 gone, previous_packet_number = 4, current_packet_number = 6 and
         # current_packet_number - previous_packet_number = 2 (but only 1 packet lost),
         # hence increase previous_packet_number by 1
@@ -67,6 +67,14 @@ class HexitecAnalysis(object):
         number_lost_packets = (current_packet_number - previous_packet_number)
         return number_lost_packets
 
+    def open_stream(self):
+        """Open file as PcapStream, exiting if not a pcap/pcapng file."""
+        try:
+            return PcapStream(self.filename)
+        except PcapStreamError as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
+
     def decode_pcap(self):
         """Extract extended header-sized UDP data from file."""
         # Initialise frame list and counters
@@ -80,21 +88,20 @@ class HexitecAnalysis(object):
         frame_number = -1
         check_frame_interval = False
         number_lost_packets = 0
+        header_size = EXTENDED_HEADER.size if self.extended_headers else HEADER.size
 
         print(" Type  Current {0:6}/{1:6} Last {0:6}/{1:6}".format("Packet", "Frame"))
 
         # Create a PCAP reader instance
-        packets = PcapReader(self.filename)
+        stream = self.open_stream()
 
-        # Iterate through packets in reader
-        for packet in packets:
+        # Iterate through UDP payloads in file
+        for _, payload in stream.udp_payloads():
 
-            # Extract UDP packet payload
-            payload = bytes(packet[UDP].payload)
             # Read frame header
-            header = np.frombuffer(payload[:self.HEADER_SIZE], dtype=np.uint64)
-            current_packet_number = self.extract_packet_number(header)
-            frame_number = int(header[0]) & 0xFFFFFFFF
+            frame_number, current_packet_number, _, _ = parse_header(payload, self.extended_headers)
+            if self.packets_per_frame is None:
+                self.packets_per_frame = packets_per_frame(self.NROWS, self.NCOLS, len(payload) - header_size)
 
             if (current_frame_number != frame_number):
                 # New frame - Check interval between this and last frame number
@@ -115,11 +122,7 @@ class HexitecAnalysis(object):
                         ))
 
             # Packet number follow last packet numbers or it's a new frame?
-            if (current_packet_number - 1) == previous_packet_number:
-                pass
-            elif (previous_packet_number == 19) and (current_packet_number == 0):
-                pass
-            else:
+            if not self.packet_follows(previous_packet_number, current_packet_number):
                 print(" {0}           {1:6}/{2:5}       {3:6}/{4:5}".format("Pkt",
                     current_packet_number, current_frame_number,
                     previous_packet_number, previous_frame_number))
@@ -132,12 +135,31 @@ class HexitecAnalysis(object):
             previous_packet_number = current_packet_number
             previous_frame_number = current_frame_number
             num_packets += 1
+        stream.close()
 
         print("Counted {} frames from {} packets in PCAP file {}".format(
              frame_counter+1, num_packets, self.filename))
         if number_lost_packets > 0:
             print(f"Found {number_lost_packets} missing packet")
 
+    def analyse(self):
+        """Analyse all packets' headers at once, summarising and optionally tabulating each frame."""
+        try:
+            packets = read_headers(self.filename, self.extended_headers)
+        except PcapStreamError as e:
+            print(" *** Error: {}".format(e))
+            sys.exit(1)
+        if self.packets_per_frame is None:
+            self.packets_per_frame = packets_per_frame(self.NROWS, self.NCOLS, primary_packet_size(packets))
+        summary, frames = analyse_packets(packets, self.packets_per_frame)
+        print("Analysed {} frames ({} packets each) from {} packets in PCAP file {}".format(
+            summary["frames"], self.packets_per_frame, summary["packets"], self.filename))
+        for key, value in summary.items():
+            print(" {0:22} {1}".format(key, value))
+        if self.table:
+            write_table(self.table, frames, summary)
+            print("Written per frame table to {}".format(self.table))
+
 
 if __name__ == '__main__':
 
@@ -150,6 +172,12 @@ if __name__ == '__main__':
                         help='set number of rows in frame')
     parser.add_argument('--columns', '-c', type=int, default=160,
                         help='set number of columns in frame')
+    parser.add_argument('--summary', "-s", action="store_true",
+                        help='analyse all headers at once, summarising packet loss, frame gaps and timing')
+    parser.add_argument('--table', '-t', default=None,
+                        help='write per frame table to CSV (or .h5) file (implies --summary)')
+    parser.add_argument('--packets_per_frame', '-p', type=int, default=None,
+                        help='packets per frame (default: from rows, columns and packet size)')
     parser.add_argument(
         'filename',
         default="hexitec_triangle_100G.pcapng",
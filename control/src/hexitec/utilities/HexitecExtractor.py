@@ -12,12 +12,12 @@ Created on November 14, 2022
 from __future__ import print_function
 
 import argparse
-from scapy.all import PcapReader, UDP
-import numpy as np
-import h5py
 import sys
 import os
 
+from hexitec.PcapStream import PcapStream, PcapStreamError, FrameAssembler
+from hexitec.FrameWriter import FrameWriter, FrameWriterError, COMPRESSION_OPTIONS
+
 
 class HexitecExtractorError(Exception):
     """Customised exception class."""
@@ -34,25 +34,21 @@ class HexitecExtractorError(Exception):
 class HexitecExtractor(object):
     """Produce and transmit specified UDP frames."""
 
-    def __init__(self, extended_headers, rows, columns, filename):
+    def __init__(self, extended_headers, rows, columns, filename, compression_type="none"):
         """Initialise object with command line argument."""
-        self.SOF = 1 << 63
-        self.EOF = 1 << 62
         self.extended_headers = extended_headers
         self.NROWS = rows
         self.NCOLS = columns
         self.filename = filename
         self.filename_h5 = self.determine_h5_file(filename)
+        self.compression_type = compression_type
         if self.extended_headers:
             self.HEADER_SIZE = 16
         else:
             self.HEADER_SIZE = 8
 
         if os.access(self.filename, os.R_OK):
-            self.file_contents = self.decode_pcap()
-            dshape = self.file_contents.shape
-            assert dshape[1] == self.NROWS * self.NCOLS  # rows*columns must match PCAPNG' dims
-            self.write_data_to_disc()
+            self.decode_pcap()
         else:
             print("Unable to open: {}. Does it exist?".format(self.filename))
             sys.exit(1)
@@ -63,131 +59,38 @@ class HexitecExtractor(object):
         h5_file = file[:extension] + ".h5"
         return h5_file
 
-    def sof_detected(self, header):
-        """Determine whether Start of Frame detected."""
-        sof_detected = False
-        index = 0
-        if self.extended_headers:
-            index = 1
-        if int(header[index]) & self.SOF:
-            sof_detected = True
-        # print(f"  SoF - header[index]: {header[1]:X} & SOF: {self.SOF:X} rets: {sof_detected}")
-        return sof_detected
-
-    def eof_detected(self, header):
-        """Determine whether End of Frame detected."""
-        eof_detected = False
-        index = 0
-        if self.extended_headers:
-            index = 1
-        if int(header[index]) & self.EOF:
-            eof_detected = True
-        # print(f"  EoF - header[index]: {header[1]:X} & EOF: {self.EOF:X} rets: {eof_detected}")
-        return eof_detected
-
-    def extract_packet_number(self, header):
-        """Extract packet number from header."""
-        packet_number = 0
-        index = 0
-        if self.extended_headers:
-            index = 1
-            packet_number = int(header[index]) & 0xFF
-        return packet_number
+    def frames(self):
+        """Yield (frame number, frame) of each complete frame in file, filling the same array each time."""
+        with PcapStream(self.filename) as stream:
+            self.assembler = FrameAssembler(self.NROWS, self.NCOLS, self.extended_headers)
+            payloads = (payload for _, payload in stream.udp_payloads())
+            for frame_number, frame in self.assembler.frames(payloads):
+                yield frame_number, frame
 
     def decode_pcap(self):
-        """Extract extended header-sized UDP data from file."""
-        # Initialise frame list and counters
-        frames = []
-        num_packets = 0
-        num_frames = 0
-        previous_packet_number = -1
-        current_packet_number = 0
-
-        packet_loss = False
-        packet_size = 0
-
-        # Create a PCAP reader instance
-        packets = PcapReader(self.filename)
-        frame_data = bytes()
-        # Iterate through packets in reader
-        for packet in packets:
-
-            # Extract UDP packet payload
-            payload = bytes(packet[UDP].payload)
-            # Read frame header
-            header = np.frombuffer(payload[:self.HEADER_SIZE], dtype=np.uint64)
-            current_packet_number = self.extract_packet_number(header)
-            # Packet number follow last packet numbers or it's a new frame?
-            if (current_packet_number - 1) == previous_packet_number:
-                pass
-            elif (previous_packet_number == 19) and (current_packet_number == 0):
-                pass
-            else:
-                if (previous_packet_number == -1) and (current_packet_number != 0):
-                    print(f"First packet: 0x{current_packet_number:X} (frame: 0x{header[0]:X})")
-                    print("Exiting..")
-                    import sys
-                    sys.exit(-1)
-                print(" *** Packet Loss! Last packet number: 0x{0:02X} Current: 0x{1:02X}. Frame: 0x{2:X}".format(
-                    previous_packet_number, current_packet_number, header[0]))
-                packet_size = len(payload[self.HEADER_SIZE:])
-                packet_loss = True
-                break
-            previous_packet_number = current_packet_number
-
-            # If this is a start of frame packet, reset frame data
-            if self.sof_detected(header):
-                frame_data = bytes()
-
-            # Append frame payload to frame data, without header
-            frame_data += payload[self.HEADER_SIZE:]
-
-            # If end of frame packet, convert frame to numpy array and append to frame list
-            if self.eof_detected(header):
-                frame = np.frombuffer(frame_data, dtype=np.uint16)
-                frames.append(frame)
-                num_frames += 1
-            num_packets += 1
-
-        # If packet loss, remove data from incomplete frame
-        if packet_loss:
-            print("packet loss detected - Make amends")
-            if previous_packet_number < 13:
-                print(f"Chopping off {previous_packet_number} packets worth")
-                packet_fragment = packet_size * previous_packet_number
-                frame_data = frame_data[:-packet_fragment]
-
+        """Extract extended header-sized UDP data from file, writing each frame as it's decoded."""
+        maximum = 0
         try:
-            # Convert frame list to 3D numpy array
-            frames = np.array(frames)
-            print(f" Maximum value: {frames.max()}")
-        except ValueError as e:
-            print("Cannot convert data into numpy array - Missing packet(s)?")
-            print(f"Python Exception: {e}")
-            import sys
+            with FrameWriter(self.filename_h5, self.NROWS, self.NCOLS,
+                             compression_type=self.compression_type) as writer:
+                for _, frame in self.frames():
+                    writer.write(frame)
+                    maximum = max(maximum, frame.max())
+        except (PcapStreamError, FrameWriterError) as e:
+            print(" *** Error: {}".format(e))
             sys.exit(1)
 
-        print("Decoded {} frames from {} packets in PCAP file {}".format(num_frames,
-                                                                         num_packets,
-                                                                         self.filename))
-
-        return frames
+        if self.assembler.incomplete_frames:
+            print(" *** Packet Loss! Dropped {} incomplete frame(s)".format(self.assembler.incomplete_frames))
+        if writer.frames_written == 0:
+            print("No complete {}x{} frame found - Missing packet(s)?".format(self.NROWS, self.NCOLS))
+            sys.exit(1)
+        print(f" Maximum value: {maximum}")
 
-    def write_data_to_disc(self):
-        """Write data to h5 file."""
-        try:
-            hdf_file = h5py.File(self.filename_h5, 'w')
-        except IOError as e:
-            print(" *** Error: Couldn't open '{}' : {}".format(self.filename_h5, e))
-            return
-        dshape = self.file_contents.shape
-        try:
-            hdf_file.create_dataset("raw_frames", shape=(dshape[0], self.NROWS, self.NCOLS),
-                                    data=self.file_contents, dtype=np.uint16)
-            print("Finished writing {}".format(self.filename_h5))
-        except ValueError as e:
-            print(" *** Error: Writing dataset to disk: {}".format(e))
-        hdf_file.close()
+        print("Decoded {} frames from {} packets in PCAP file {}".format(self.assembler.complete_frames,
+                                                                         self.assembler.packets,
+                                                                         self.filename))
+        print("Finished writing {}".format(self.filename_h5))
 
 
 if __name__ == '__main__':
@@ -201,6 +104,8 @@ if __name__ == '__main__':
                         help='set number of rows in frame')
     parser.add_argument('--columns', '-c', type=int, default=160,
                         help='set number of columns in frame')
+    parser.add_argument('--compression_type', choices=COMPRESSION_OPTIONS, default="none",
+                        help='compress raw_frames (blosc requires hdf5plugin package)')
     parser.add_argument(
         'filename',
         default="hexitec_triangle_100G.pcapng",
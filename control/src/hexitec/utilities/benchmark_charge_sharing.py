@@ -0,0 +1,57 @@
+"""
+Benchmark charge sharing addition, discrimination on batches of frames, in frames/s.
+
+Usage: python benchmark_charge_sharing.py [sensors_layout] [occupancy] [frames]
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from hexitec.offline import process_addition, process_discrimination
+
+
+def generate_frames(sensors_layout, occupancy, number_frames, seed=0):
+    """Generate frames of random events, occupancy the fraction of non-zero pixels."""
+    rows_of_sensors, columns_of_sensors = [int(x) for x in sensors_layout.split("x")]
+    rng = np.random.default_rng(seed)
+    frames = np.zeros((number_frames, rows_of_sensors * 80, columns_of_sensors * 80), dtype=np.float32)
+    events = rng.random(frames.shape) < occupancy
+    frames[events] = rng.integers(1, 8000, events.sum())
+    return frames
+
+
+def benchmark(function, frames, pixel_grid_size, batch_size):
+    """Return frames/s of function applied to frames, batch_size frames at a time."""
+    frames = frames.copy()
+    start = time.perf_counter()
+    for first in range(0, len(frames), batch_size):
+        function(frames[first:first + batch_size], pixel_grid_size)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def benchmark_charge_sharing(sensors_layout="2x6", occupancy=0.01, number_frames=1000):
+    """Compare frames/s of each algorithm, one frame at a time and in one batch."""
+    frames = generate_frames(sensors_layout, occupancy, number_frames)
+    print("%s frames, %s layout, %.1f%% occupancy" % (number_frames, sensors_layout, occupancy * 100))
+    for function in (process_addition, process_discrimination):
+        for pixel_grid_size in (3, 5):
+            single = benchmark(function, frames[:100], pixel_grid_size, 1)
+            batched = benchmark(function, frames, pixel_grid_size, number_frames)
+            print("  %-22s %sx%s: %9.1f frames/s per frame, %9.1f frames/s batched" %
+                  (function.__name__, pixel_grid_size, pixel_grid_size, single, batched))
+
+
+if __name__ == '__main__':
+    try:
+        sensors_layout = sys.argv[1] if len(sys.argv) > 1 else "2x6"
+        occupancy = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+        number_frames = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        benchmark_charge_sharing(sensors_layout, occupancy, number_frames)
+    except (IndexError, ValueError):
+        print("Correct usage: ")
+        print("benchmark_charge_sharing.py [sensors_layout] [occupancy] [frames]")
+        print(" i.e. benchmark_charge_sharing.py 2x6 0.01 1000")
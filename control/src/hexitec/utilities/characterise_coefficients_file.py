@@ -4,21 +4,19 @@ Characterise range of values within a coefficients file.
 Christian Angelsen, STFC Detector Systems Software Group
 """
 import sys
-import numpy as np
+
+from hexitec.CoefficientStore import CoefficientStoreError, coefficient_store
 
 
 def characterise_coefficients_file(fname, datatype):
     """Determine number of coefficients, minimum and maximum of the targeted file."""
     try:
-        f = open(fname)
-        vals_str = f.read()
-        f.close()
-    except IOError as e:
+        # Parsed once, then loaded from its cached .npy file
+        n = coefficient_store.load(fname, dtype=datatype)
+    except CoefficientStoreError as e:
         print("Error: %s" % e)
         return
 
-    n = np.fromstring(vals_str, dtype=datatype, sep=' ')
-
     items = len(n)
     minimum = n.min()
     maximum = n.max()
@@ -6,102 +6,8 @@ Christian Angelsen, STFC Detector Systems Software Group
 
 import sys
 
-
-def epac_triggering_farm_mode_config(self, ip_addresses, macs, ports, frames_per_trigger):
-    """Determine Farm Mode configuration, based on Odin instances and frames per trigger.
-
-    Round-robin, N frames (per trigger) to each Odin instance."""
-    lut_entries = frames_per_trigger * (len(ip_addresses) // 2)
-    ip_lut1 = []
-    ip_lut2 = []
-    mac_lut1 = []
-    mac_lut2 = []
-    port_lut1 = []
-    port_lut2 = []
-    frame_count = 0
-    current_instance = 0
-    index = 0
-    offset = 0
-    while index < lut_entries:
-        if (offset % 2) == 0:
-            if (index % 2) == 0:  # Even
-                ip_lut1.append(ip_addresses[current_instance])
-                mac_lut1.append(macs[current_instance])
-                port_lut1.append(ports[current_instance])
-            else:
-                ip_lut2.append(ip_addresses[current_instance+1])
-                mac_lut2.append(macs[current_instance+1])
-                port_lut2.append(ports[current_instance+1])
-        else:
-            if (index % 2) == 0:  # Even
-                ip_lut1.append(ip_addresses[current_instance+1])
-                mac_lut1.append(macs[current_instance+1])
-                port_lut1.append(ports[current_instance+1])
-            else:
-                ip_lut2.append(ip_addresses[current_instance])
-                mac_lut2.append(macs[current_instance])
-                port_lut2.append(ports[current_instance])
-        frame_count += 1
-        if frame_count == frames_per_trigger:
-            frame_count = 0
-            current_instance += 2
-            offset += 1
-        index += 1
-    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
-
-def nxct_untriggering_farm_mode_config(self, ip_addresses, macs, ports):
-    """Determine NXCT's Farm Mode configuration, untriggered mode.
-
-    Round-robin, one frame to Odin instance."""
-    lut_entries = len(ip_addresses)
-    print(f" LUT entries: {lut_entries}")
-    ip_lut1 = []
-    ip_lut2 = []
-    mac_lut1 = []
-    mac_lut2 = []
-    port_lut1 = []
-    port_lut2 = []
-    index = 0
-    while index < lut_entries:
-        if (index % 2) == 0:
-            ip_lut1.append(ip_addresses[index])
-            mac_lut1.append(macs[index])
-            port_lut1.append(ports[index])
-        else:
-            ip_lut2.append(ip_addresses[index])
-            mac_lut2.append(macs[index])
-            port_lut2.append(ports[index])
-        index += 1
-    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
-
-def epac_untriggering_farm_mode_config(self, ip_addresses, macs, ports):
-    """Determine EPAC's Farm Mode configuration, untriggered mode.
-
-    Round-robin, one frame to Odin instance."""
-    lut_entries = len(ip_addresses)
-    print(f" LUT entries: {lut_entries}")
-    ip_lut1 = []
-    ip_lut2 = []
-    mac_lut1 = []
-    mac_lut2 = []
-    port_lut1 = []
-    port_lut2 = []
-    index = 0
-    added_entries = 0
-    while index < lut_entries:
-        if (added_entries % 2) == 0:
-            print(f" {index} Adding to LUT1: IP {ip_addresses[index]}, Port {ports[index]}")
-            ip_lut1.append(ip_addresses[index])
-            mac_lut1.append(macs[index])
-            port_lut1.append(ports[index])
-        else:
-            print(f" {index} Adding to LUT2: IP {ip_addresses[index]}, Port {ports[index]}")
-            ip_lut2.append(ip_addresses[index])
-            mac_lut2.append(macs[index])
-            port_lut2.append(ports[index])
-        index += 2
-        added_entries += 1
-    return ip_lut1, ip_lut2, mac_lut1, mac_lut2, port_lut1, port_lut2
+from hexitec.FarmMode import epac_triggering_farm_mode_config, nxct_untriggering_farm_mode_config, \
+    epac_untriggering_farm_mode_config
 
 
 if __name__ == '__main__':
@@ -156,11 +62,11 @@ if __name__ == '__main__':
             sys.exit(1)
         frames_per_trigger = int(sys.argv[3])
         if choice == 0:
-            print(epac_triggering_farm_mode_config("", addresses, macs, ports, frames_per_trigger))
+            print(epac_triggering_farm_mode_config(addresses, macs, ports, frames_per_trigger))
         elif choice == 1:
-            print(nxct_untriggering_farm_mode_config("", addresses, macs, ports))
+            print(nxct_untriggering_farm_mode_config(addresses, macs, ports))
         elif choice == 2:
-            print(epac_untriggering_farm_mode_config("", addresses, macs, ports))
+            print(epac_untriggering_farm_mode_config(addresses, macs, ports))
         else:
             print("Invalid choice. Use 0 for even frames or 1 for odd frames.")
     except IndexError:
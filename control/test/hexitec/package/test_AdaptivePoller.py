@@ -0,0 +1,48 @@
+"""
+Test Cases for the AdaptivePoller in hexitec.AdaptivePoller.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+from hexitec.AdaptivePoller import AdaptivePoller
+
+
+class TestAdaptivePoller(unittest.TestCase):
+    """Unit tests for the AdaptivePoller class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.poller = AdaptivePoller(minimum=0.01, maximum=0.5)
+
+    def test_init_rejects_invalid_range(self):
+        """Test constructor rejects nonsensical interval range."""
+        with pytest.raises(ValueError):
+            AdaptivePoller(minimum=0.5, maximum=0.1)
+        with pytest.raises(ValueError):
+            AdaptivePoller(minimum=0, maximum=0.1)
+
+    def test_next_interval_backs_off_while_idle(self):
+        """Test interval doubles each idle poll, until maximum reached."""
+        intervals = [self.poller.next_interval() for _ in range(7)]
+        assert intervals == [0.02, 0.04, 0.08, 0.16, 0.32, 0.5, 0.5]
+
+    def test_next_interval_resets_on_progress(self):
+        """Test interval returns to minimum when progress made without an estimate."""
+        self.poller.interval = 0.5
+        assert self.poller.next_interval(progressed=True) == 0.01
+
+    def test_next_interval_tracks_time_remaining(self):
+        """Test interval follows estimated time remaining, within limits."""
+        assert self.poller.next_interval(True, 0.4) == 0.2
+        assert self.poller.next_interval(True, 10) == 0.5
+        assert self.poller.next_interval(True, 0.001) == 0.01
+        assert self.poller.next_interval(True, -3) == 0.01
+
+    def test_reset(self):
+        """Test reset restores minimum interval."""
+        self.poller.interval = 0.3
+        assert self.poller.reset() == 0.01
+        assert self.poller.interval == 0.01
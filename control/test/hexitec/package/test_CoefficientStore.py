@@ -0,0 +1,132 @@
+"""
+Test Cases for the CoefficientStore in hexitec.CoefficientStore.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import tempfile
+
+from unittest.mock import patch
+
+import numpy as np
+
+from hexitec.CoefficientStore import CoefficientStore, CoefficientStoreError, layout_shape, \
+    default_cache_dir
+
+
+class TestCoefficientStore(unittest.TestCase):
+    """Unit tests for the CoefficientStore class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+        self.filename = os.path.join(self.directory.name, "m.txt")
+        np.savetxt(self.filename, np.linspace(0.5, 2.0, 6400))
+        self.store = CoefficientStore(self.cache_dir)
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_layout_shape(self):
+        """Test sensors layout converted into pixel rows, columns."""
+        assert layout_shape("2x6") == (160, 480)
+        with pytest.raises(CoefficientStoreError, match="Invalid sensors layout"):
+            layout_shape("2by6")
+
+    def test_load_converts_file_once(self):
+        """Test text parsed once, then served from memory mapped .npy file."""
+        values = self.store.load(self.filename, "1x1")
+        assert values.shape == (80, 80)
+        assert values.dtype == np.float32
+        assert values[0, 0] == pytest.approx(0.5)
+        assert isinstance(values.base, np.memmap)
+        assert not values.flags.writeable
+        assert len(os.listdir(self.cache_dir)) == 1
+        assert self.store.misses == 1
+        # Unchanged file not read again
+        self.store.load(self.filename)
+        assert self.store.hits == 1
+        # Another process (store) loads converted array
+        other = CoefficientStore(self.cache_dir)
+        np.testing.assert_array_equal(other.load(self.filename, "1x1"), values)
+        assert (other.hits, other.misses) == (1, 0)
+
+    def test_load_keyed_by_dtype_and_contents(self):
+        """Test each data type, and changed contents, converted separately."""
+        assert self.store.load(self.filename, dtype=np.uint16)[-1] == 2
+        np.savetxt(self.filename, np.full(6400, 3.0))
+        os.utime(self.filename, (0, 0))
+        assert self.store.load(self.filename)[0] == 3.0
+        assert self.store.misses == 2
+        assert len(os.listdir(self.cache_dir)) == 2
+
+    def test_load_rejects_wrong_number_of_values(self):
+        """Test file not matching sensors layout rejected."""
+        with pytest.raises(CoefficientStoreError, match="Expected 76800 values but read 6400 values"):
+            self.store.load(self.filename, "2x6")
+
+    def test_load_rejects_bad_files(self):
+        """Test missing file, invalid coefficient rejected."""
+        with pytest.raises(CoefficientStoreError, match="Cannot read coefficients"):
+            self.store.load(os.path.join(self.directory.name, "missing.txt"))
+        with open(self.filename, 'w') as f:
+            f.write("1.0\nbad\n")
+        with pytest.raises(CoefficientStoreError, match="Invalid coefficient"):
+            self.store.load(self.filename)
+
+    def test_load_without_writable_cache(self):
+        """Test coefficients still loaded when .npy file cannot be written."""
+        with open(self.cache_dir, 'w') as f:
+            f.write("not a directory")
+        values = self.store.load(self.filename)
+        assert values.size == 6400
+        assert not values.flags.writeable
+
+    def test_default_cache_dir_per_user(self):
+        """Test default cache directory within user's cache directory, unless overridden."""
+        with patch.dict(os.environ, {"XDG_CACHE_HOME": "/home/user/.cache"}):
+            os.environ.pop("HEXITEC_COEFFICIENT_CACHE", None)
+            assert default_cache_dir() == "/home/user/.cache/hexitec/coefficients"
+            assert CoefficientStore().cache_dir == "/home/user/.cache/hexitec/coefficients"
+            os.environ["HEXITEC_COEFFICIENT_CACHE"] = self.cache_dir
+            assert CoefficientStore().cache_dir == self.cache_dir
+        with patch.dict(os.environ, {"XDG_CACHE_HOME": ""}):
+            assert default_cache_dir() == os.path.join(os.path.expanduser("~"), ".cache", "hexitec", "coefficients")
+
+    def test_cache_dir_private(self):
+        """Test cache directory created readable by its user alone."""
+        self.store.load(self.filename)
+        assert os.stat(self.cache_dir).st_mode & 0o777 == 0o700
+
+    def test_load_ignores_mismatched_npy_file(self):
+        """Test .npy file not matching expected number of values, or dtype, converted again."""
+        self.store.load(self.filename)
+        npy_filename = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        for bad_values, kwargs in ((np.zeros(10, dtype=np.float32), {"sensors_layout": "1x1"}),
+                                   (np.zeros(10, dtype=np.float32), {"size": 6400}),
+                                   (np.zeros(6400, dtype=np.float64), {})):
+            np.save(npy_filename, bad_values)
+            store = CoefficientStore(self.cache_dir)
+            with patch("logging.warning") as mock_log:
+                values = store.load(self.filename, **kwargs)
+                mock_log.assert_called_with("Ignoring mismatched cached coefficients: %s" % npy_filename)
+            assert (values.size, values.dtype) == (6400, np.float32)
+            assert values.flat[0] == pytest.approx(0.5)
+            assert store.misses == 1
+        # Replaced by a matching .npy file
+        assert CoefficientStore(self.cache_dir).load(self.filename).size == 6400
+
+    def test_load_ignores_truncated_npy_file(self):
+        """Test .npy file shorter than its header claims converted again."""
+        self.store.load(self.filename)
+        npy_filename = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(npy_filename, "r+b") as f:
+            f.truncate(os.path.getsize(npy_filename) - 400)
+        store = CoefficientStore(self.cache_dir)
+        assert store.load(self.filename).size == 6400
+        assert store.misses == 1
@@ -15,6 +15,7 @@ import time
 from odin.adapters.parameter_tree import ParameterTreeError
 
 from hexitec.HexitecDAQ import HexitecDAQ
+from hexitec.MetadataWriter import MetadataWriter
 from hexitec.adapter import HexitecAdapter
 
 from unittest.mock import Mock, MagicMock, call, patch, ANY, mock_open
@@ -617,18 +618,69 @@ class TestDAQ(unittest.TestCase):
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
 
             self.test_daq.adapter.hexitec.fem.hardware_busy = True
+            self.test_daq.daq.calculate_remaining_collection_time = Mock(return_value=10)
 
             self.test_daq.daq.acquisition_check_loop()
             instance = mock_loop.instance()
             instance.call_later.assert_called_with(.5, self.test_daq.daq.acquisition_check_loop)
 
-    def test_acquisition_check_loop_polls_processing_once_acquisition_complete(self):
-        """Test acquisition check loop polls processing status once fem(s) finished sending data."""
+    def test_acquisition_check_loop_polls_faster_near_completion(self):
+        """Test that function tightens poll interval as collection nears completion."""
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
-            self.test_daq.daq.frame_end_acquisition = 10
+
+            self.test_daq.adapter.hexitec.fem.hardware_busy = True
+            self.test_daq.daq.calculate_remaining_collection_time = Mock(return_value=0.1)
+
             self.test_daq.daq.acquisition_check_loop()
             instance = mock_loop.instance()
-            instance.call_later.assert_called_with(.5, self.test_daq.daq.processing_check_loop)
+            instance.call_later.assert_called_with(0.05, self.test_daq.daq.acquisition_check_loop)
+
+    def test_acquisition_check_loop_backs_off_while_idle(self):
+        """Test that function backs off poll interval while no frames are received."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+
+            self.test_daq.adapter.hexitec.fem.hardware_busy = True
+            self.test_daq.daq.frames_received = 3188
+            self.test_daq.daq.poller.interval = 0.04
+
+            self.test_daq.daq.acquisition_check_loop()
+            instance = mock_loop.instance()
+            instance.call_later.assert_called_with(0.08, self.test_daq.daq.acquisition_check_loop)
+
+    def test_acquisition_check_loop_polls_processing_once_acquisition_complete(self):
+        """Test acquisition check loop polls processing status once fem(s) finished sending data."""
+        with patch("hexitec.HexitecDAQ.IOLoop"):
+            self.test_daq.daq.processing_check_loop = Mock()
+            self.test_daq.daq.acquisition_check_loop()
+            self.test_daq.daq.processing_check_loop.assert_called()
+            assert self.test_daq.daq.acquisition_state == "Processing"
+
+    def test_notify_status_change_runs_pending_poll(self):
+        """Test function brings forward the pending poll."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.daq._schedule_poll(0.5, self.test_daq.daq.acquisition_check_loop)
+            handle = mock_loop.instance().call_later.return_value
+            self.test_daq.daq.notify_status_change()
+            mock_loop.instance().remove_timeout.assert_called_with(handle)
+            mock_loop.instance().add_callback.assert_called_with(
+                self.test_daq.daq.acquisition_check_loop)
+            assert self.test_daq.daq.pending_poll is None
+
+    def test_notify_status_change_ignores_overdue_poll(self):
+        """Test function leaves alone a poll that is already due."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.daq.pending_poll = (Mock(), self.test_daq.daq.acquisition_check_loop,
+                                              time.time() - 1)
+            self.test_daq.daq.notify_status_change()
+            mock_loop.instance().remove_timeout.assert_not_called()
+            mock_loop.instance().add_callback.assert_not_called()
+
+    def test_notify_status_change_handles_no_pending_poll(self):
+        """Test function does nothing when no poll scheduled."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.daq.pending_poll = None
+            self.test_daq.daq.notify_status_change()
+            mock_loop.instance().add_callback.assert_not_called()
 
     @patch('time.time', return_value=time.time()+1)
     def test_calculate_remaining_collection_time(self, mock_time):
@@ -645,8 +697,105 @@ class TestDAQ(unittest.TestCase):
             self.test_daq.daq.frame_end_acquisition = 10
             self.test_daq.daq.processing_check_loop()
             mock_loop.instance().add_callback.assert_called_with(self.test_daq.daq.flush_data)
-            mock_loop.instance().call_later.assert_called_with(0.1,
-                                                               self.test_daq.daq.hdf_closing_loop)
+            mock_loop.instance().call_later.assert_not_called()
+            assert self.test_daq.daq.acquisition_state == "Flushing"
+
+    def test_calculate_remaining_collection_time_uses_receive_rate(self):
+        """Test function predicts remaining time from measured receive rate when available."""
+        self.test_daq.daq.in_progress = True
+        self.test_daq.daq.received_remaining = 500
+        self.test_daq.daq.received_rates.update([0, 0], 10.0)
+        self.test_daq.daq.received_rates.update([500, 500], 11.0)
+        remaining_time = self.test_daq.daq.calculate_remaining_collection_time()
+        assert remaining_time == 0.5
+
+    def test_update_node_rates(self):
+        """Test function publishes per node rates and backlog, flags node falling behind."""
+        with patch("time.time") as mock_time:
+            self.test_daq.daq.number_frames = 4000
+            mock_time.return_value = 100.0
+            self.test_daq.daq.update_node_rates([0, 0], [0, 0])
+            mock_time.return_value = 101.0
+            self.test_daq.daq.update_node_rates([1000, 1000], [1000, 500])
+            assert self.test_daq.daq.received_rates.rates == [1000.0, 1000.0]
+            assert self.test_daq.daq.processed_rates.rates == [1000.0, 500.0]
+            assert self.test_daq.daq.node_backlog == [0, 500]
+            assert self.test_daq.daq.nodes_falling_behind == [False, True]
+            # 2500 frames left to process at 1500 frames/s
+            assert pytest.approx(self.test_daq.daq.processing_time_remaining) == 2500 / 1500
+            _, _, values = self.test_daq.daq.parent.telemetry.query(start=101.0, end=101.0)
+            columns = self.test_daq.daq.parent.telemetry.columns
+            assert values[-1][columns.index("frames_received_rate")] == 2000.0
+            assert values[-1][columns.index("frames_processed_rate")] == 1500.0
+
+    def test_write_telemetry(self):
+        """Test telemetry since shortly before run start written into file."""
+        hdf_file = Mock()
+        self.test_daq.daq.parent.telemetry = Mock()
+        self.test_daq.daq.telemetry_start_time = 1000.0
+        with patch("time.time") as mock_time:
+            mock_time.return_value = 2000.0
+            self.test_daq.daq.write_telemetry(hdf_file)
+        self.test_daq.daq.parent.telemetry.write.assert_called_with(hdf_file, "telemetry", 940.0, 2000.0)
+
+    def test_write_telemetry_handles_exception(self):
+        """Test failure to write telemetry logged, not raised."""
+        self.test_daq.daq.parent.telemetry = Mock()
+        self.test_daq.daq.parent.telemetry.write.side_effect = ValueError("Bad")
+        with patch("logging.error") as mock_error:
+            self.test_daq.daq.write_telemetry(Mock())
+            mock_error.assert_called_with("Unable to write telemetry: Bad")
+
+    def test_get_frames_per_node(self):
+        """Test functions list frame counts of each node."""
+        self.test_daq.fp_data["value"][0]["hdf"]["frames_processed"] = 7
+        assert self.test_daq.daq.get_frames_received_per_node() == [3188]
+        assert self.test_daq.daq.get_frames_processed_per_node("hdf") == [7]
+        assert self.test_daq.daq.get_total_frames_processed("hdf") == 7
+
+    def test_processing_check_loop_ends_once_lost_frames_accounted_for(self):
+        """Test processing check loop flushes once outstanding frames known to be lost."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.fp_data["value"][0]["hdf"]["frames_processed"] = 3180
+            self.test_daq.daq.number_frames = 3200
+            self.test_daq.daq.frames_processed = 3180
+            self.test_daq.daq.last_plugin_configured = "hdf"
+            self.test_daq.daq.frame_accounting.reset(3200)
+            # Every frame received or dropped
+            self.test_daq.fr_data["value"][0]["frames"]["dropped"] = 12
+            # Counters unchanged, frameReceiver buffers all empty, for longer than settle time
+            self.test_daq.daq.frame_accounting.update(self.test_daq.fr_data["value"],
+                                                      self.test_daq.fp_data["value"], "hdf",
+                                                      timestamp=time.time() - 10)
+            self.test_daq.daq.processing_check_loop()
+            mock_loop.instance().add_callback.assert_called_with(self.test_daq.daq.flush_data)
+            assert self.test_daq.daq.acquisition_state == "Flushing"
+            summary = self.test_daq.daq.frame_accounting.get_summary()
+            assert summary["dropped"] == 12
+            assert summary["not_received"] == 0
+            assert summary["not_processed"] == 8
+
+    def test_processing_check_loop_awaits_frames_not_received(self):
+        """Test processing check loop keeps polling while frames neither received nor dropped."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.fp_data["value"][0]["hdf"]["frames_processed"] = 3180
+            self.test_daq.daq.number_frames = 3200
+            self.test_daq.daq.frames_processed = 3180
+            self.test_daq.daq.last_plugin_configured = "hdf"
+            self.test_daq.daq.frame_accounting.reset(3200)
+            self.test_daq.daq.frame_accounting.update(self.test_daq.fr_data["value"],
+                                                      self.test_daq.fp_data["value"], "hdf",
+                                                      timestamp=time.time() - 10)
+            self.test_daq.daq.processing_check_loop()
+            mock_loop.instance().add_callback.assert_not_called()
+            assert self.test_daq.daq.frame_accounting.get_summary()["not_received"] == 12
+
+    def test_set_accounting_settle_time(self):
+        """Test frame accounting settle time set, if positive."""
+        self.test_daq.daq._set_accounting_settle_time(10.0)
+        assert self.test_daq.daq.frame_accounting.settle_time == 10.0
+        with pytest.raises(ParameterTreeError, match="Accounting settle time must be positive"):
+            self.test_daq.daq._set_accounting_settle_time(0)
 
     def test_processing_check_loop_handles_missing_frames(self):
         """Test processing check loop will stop acquisition if data ceases mid-flow."""
@@ -669,6 +818,20 @@ class TestDAQ(unittest.TestCase):
             self.test_daq.daq.processing_check_loop()
             assert pytest.approx(self.test_daq.daq.processing_timestamp) == time.time()
 
+    def test_processing_check_loop_estimates_processing_time_remaining(self):
+        """Test processing check loop polls sooner as processing nears completion."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.fp_data["value"][0]["hdf"]["frames_processed"] = 9
+            self.test_daq.daq.number_frames = 10
+            self.test_daq.daq.frames_processed = 5
+            self.test_daq.daq.last_plugin_configured = "hdf"
+            self.test_daq.daq.received_rates.update([3188], time.time() - 0.4)
+            self.test_daq.daq.processed_rates.update([5], time.time() - 0.4)
+            self.test_daq.daq.processing_check_loop()
+            # 4 frames in 0.4 s, 1 frame remaining: poll in half of the 0.1 s estimate
+            delay = mock_loop.instance().call_later.call_args[0][0]
+            assert pytest.approx(delay, abs=0.005) == 0.05
+
     def test_flush_data(self):
         """Test function flushes out histogram data, calls stop_acquisition."""
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
@@ -678,7 +841,7 @@ class TestDAQ(unittest.TestCase):
                 call("config/inject_eoa", ANY)
             ])
             instance = mock_loop.instance()
-            instance.call_later.assert_called_with(0.02, self.test_daq.daq.monitor_eoa_progress)
+            instance.call_later.assert_called_with(0.01, self.test_daq.daq.monitor_eoa_progress)
 
     def test_monitor_eoa_progress_handles_processed(self):
         """Test function calls stop_acquisition if eoa completed"""
@@ -692,32 +855,37 @@ class TestDAQ(unittest.TestCase):
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
             self.test_daq.daq.monitor_eoa_progress()
             instance = mock_loop.instance()
-            instance.call_later.assert_called_with(0.25, self.test_daq.daq.monitor_eoa_progress)
+            instance.call_later.assert_called_with(0.02, self.test_daq.daq.monitor_eoa_progress)
 
     def test_stop_acquisition_handles_file_shut(self):
         """Test function wraps up acquisition if file shut."""
         self.test_daq.daq.check_hdf_writing_true = Mock(return_value=False)
         self.test_daq.daq.set_file_writing = Mock()
+        self.test_daq.daq.hdf_closing_loop = Mock()
         self.test_daq.daq.hdf_retry = 3
         self.test_daq.daq.stop_acquisition()
         assert self.test_daq.daq.hdf_retry == 0
         assert self.test_daq.daq.file_writing is False
+        assert self.test_daq.daq.acquisition_state == "Closing"
         self.test_daq.daq.set_file_writing.assert_called()
+        self.test_daq.daq.hdf_closing_loop.assert_called()
 
     def test_stop_acquisition_handles_file_not_shut(self):
-        """Test function retries in a second if file not shut."""
+        """Test function retries if file not shut."""
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
             self.test_daq.daq.set_file_writing = Mock()
+            self.test_daq.daq.hdf_close_deadline = time.time() + 5
             self.test_daq.daq.stop_acquisition()
-            # assert self.test_daq.daq.hdf_retry == 1
             self.test_daq.daq.set_file_writing.assert_not_called()
-            mock_loop.instance().call_later.assert_called_with(1.0,
+            mock_loop.instance().call_later.assert_called_with(0.02,
                                                                self.test_daq.daq.stop_acquisition)
 
     def test_stop_acquisition_handles_file_failed_to_shut(self):
-        """Test function flags error fifth failed attempt."""
+        """Test function flags error once file closing times out."""
         self.test_daq.daq.set_file_writing = Mock()
+        self.test_daq.daq.hdf_closing_loop = Mock()
         self.test_daq.daq.hdf_retry = 5
+        self.test_daq.daq.hdf_close_deadline = time.time() - 1
         self.test_daq.daq.stop_acquisition()
         error = "DAQ timed out, file didn't close"
         assert self.test_daq.daq.hdf_retry == 0
@@ -789,6 +957,7 @@ class TestDAQ(unittest.TestCase):
                 key = 'detector/fem/hexitec_config'
                 assert key in self.test_daq.daq.config_ds
                 assert rc_value == 0
+                assert self.test_daq.daq.metadata_write_time > 0
 
     @patch("builtins.open", new_callable=mock_open, read_data="data")
     def test_write_metadata_handles_IOError(self, mock_file):
@@ -853,7 +1022,7 @@ class TestDAQ(unittest.TestCase):
         with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
             self.test_daq.fp_data["value"][0]["hdf"]["writing"] = True
             self.test_daq.daq.hdf_closing_loop()
-            mock_loop.instance().call_later.assert_called_with(0.5,
+            mock_loop.instance().call_later.assert_called_with(0.02,
                                                                self.test_daq.daq.hdf_closing_loop)
 
     def test_hdf_closing_loop_checks_files_exist_before_writing_meta(self):
@@ -897,6 +1066,7 @@ class TestDAQ(unittest.TestCase):
 
             assert self.test_daq.daq.hdf_retry == 0
             assert self.test_daq.daq.in_progress is False
+            assert self.test_daq.daq.acquisition_state == "Idle"
             assert self.test_daq.daq.parent.fem.status_message == "Meta data added to "
             assert self.test_daq.daq.parent.software_state == "Ready"
             self.test_daq.daq.signal_archiver.assert_called()
@@ -925,6 +1095,172 @@ class TestDAQ(unittest.TestCase):
             assert self.test_daq.daq.hdf_retry == 2
             assert self.test_daq.daq.in_progress is False
 
+    def test_stage_metadata(self):
+        """Test function snapshots parameter trees and writes them in the background."""
+        with patch.object(HexitecDAQ, "thread_executor") as mock_executor:
+            self.test_daq.fake_fp._param = {"config": {"hdf": {"frames": 0}}}
+            self.test_daq.daq.stage_metadata()
+            location = self.test_daq.file_dir + self.test_daq.file_name + ".h5.staging"
+            mock_executor.submit.assert_called_with(self.test_daq.daq.write_staged_metadata, location,
+                                                    self.test_daq.daq.staged_trees)
+            assert self.test_daq.daq.metadata_staging == mock_executor.submit.return_value
+            assert self.test_daq.daq.staged_file_location == location
+            assert self.test_daq.daq.staged_trees["hdf"] == self.test_daq.fake_fp._param
+            assert self.test_daq.daq.staged_trees["hdf"] is not self.test_daq.fake_fp._param
+            assert self.test_daq.daq.staged_trees["mode"] == "legacy"
+            assert self.test_daq.daq.staged_trees["settings"]["threshold_mode"] == self.test_daq.daq.threshold_mode
+
+    def test_write_staged_metadata(self):
+        """Test staged trees written with own writer, errors returned, DAQ state untouched."""
+        import h5py
+        import tempfile
+        self.test_daq.daq.metadata_write_time = 1.5
+        self.test_daq.daq._metadata_error = Mock()
+        staged_trees = {
+            "hexitec": {"detector": {"bad": {1, 2}, "fem": {"hexitec_config": "none.ini"}}},
+            "hdf": {"config": {"frames": 10}},
+            "settings": {"calibration_enable": False, "threshold_mode": "none", "run_date": "today"},
+            "mode": "legacy"
+        }
+        # Live settings differ from those snapshot
+        self.test_daq.daq.calibration_enable = True
+        with tempfile.TemporaryDirectory() as file_dir:
+            location = file_dir + "/run.h5.staging"
+            error_code, errors = self.test_daq.daq.write_staged_metadata(location, staged_trees)
+            with h5py.File(location, "r") as hdf_file:
+                assert hdf_file["config/frames"][()] == 10
+                assert hdf_file["hexitec"].attrs["runDate"] == "today"
+        assert error_code == -3
+        assert errors[0][0] == "Parsing key: /detector/bad value: {1, 2}"
+        self.test_daq.daq._metadata_error.assert_not_called()
+        assert self.test_daq.daq.metadata_write_time == 1.5
+        assert not hasattr(self.test_daq.daq, "config_ds")
+
+    def test_discard_staged_metadata(self):
+        """Test staging cancelled, or its file removed once written."""
+        import tempfile
+        from concurrent.futures import Future
+        with tempfile.TemporaryDirectory() as file_dir:
+            self.test_daq.daq.staged_file_location = file_dir + "/run.h5.staging"
+            # Cancelled before it started
+            self.test_daq.daq.metadata_staging = Future()
+            self.test_daq.daq.discard_staged_metadata()
+            assert self.test_daq.daq.metadata_staging is None
+            # Being written; File removed once written
+            staging = Future()
+            staging.set_running_or_notify_cancel()
+            self.test_daq.daq.metadata_staging = staging
+            self.test_daq.daq.discard_staged_metadata()
+            open(self.test_daq.daq.staged_file_location, "w").close()
+            staging.set_result((0, []))
+            assert not os.path.isfile(self.test_daq.daq.staged_file_location)
+            # Nothing staged
+            self.test_daq.daq.discard_staged_metadata()
+
+    def test_stage_metadata_handles_snapshot_failure(self):
+        """Test function leaves meta data to be written after acquisition if snapshot fails."""
+        with patch.object(HexitecDAQ, "thread_executor") as mock_executor:
+            self.test_daq.daq.adapters = {}
+            self.test_daq.daq.stage_metadata()
+            mock_executor.submit.assert_not_called()
+            assert self.test_daq.daq.metadata_staging is None
+
+    def test_prepare_hdf_file_awaits_staged_metadata(self):
+        """Test function waits while meta data still being staged."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop:
+            self.test_daq.daq.metadata_staging = Mock(done=Mock(return_value=False))
+            self.test_daq.daq.prepare_hdf_file()
+            mock_loop.instance().call_later.assert_called_with(0.02,
+                                                               self.test_daq.daq.prepare_hdf_file)
+
+    def test_prepare_hdf_file_finalises_staged_metadata(self):
+        """Test function patches end of run values into staged file, then renames it."""
+        import h5py
+        import tempfile
+        with tempfile.TemporaryDirectory() as file_dir:
+            self.test_daq.daq.file_dir = file_dir + "/"
+            self.test_daq.daq.parent.archiver_configured = False
+            self.test_daq.daq.parent.param_tree.get = Mock(return_value={"detector": {
+                "daq": {"frames_processed": 10}}})
+            self.test_daq.fake_fp._param = {"config": {"hdf": {"frames": 0}}}
+            with patch.object(HexitecDAQ, "thread_executor") as mock_executor:
+                self.test_daq.daq.stage_metadata()
+            with h5py.File(self.test_daq.daq.staged_file_location, "w") as hdf_file:
+                hdf_file.create_group("hexitec")
+                hdf_file["detector/daq/frames_processed"] = 0
+                hdf_file["staged_only"] = 1
+            staging = mock_executor.submit.return_value
+            staging.done.return_value = True
+            staging.result.return_value = (0, [("Parsing key: bad value: {1, 2}", "error")])
+            self.test_daq.daq.staged_trees["hexitec"] = {"detector": {"daq": {"frames_processed": 0}}}
+            # Mode changed during run; File still patched in the mode it was staged in
+            self.test_daq.daq.metadata_writer.set_mode("compact")
+            self.test_daq.daq.parent.fem.flag_error = Mock()
+
+            self.test_daq.daq.prepare_hdf_file()
+
+            self.test_daq.daq.parent.fem.flag_error.assert_called_with("Parsing key: bad value: {1, 2}", "error")
+
+            assert os.path.isfile(self.test_daq.daq.hdf_file_location)
+            assert not os.path.isfile(self.test_daq.daq.staged_file_location)
+            with h5py.File(self.test_daq.daq.hdf_file_location, "r") as hdf_file:
+                assert hdf_file["detector/daq/frames_processed"][()] == 10
+                assert hdf_file["staged_only"][()] == 1
+                assert "frameProcessor_0" in hdf_file
+            assert self.test_daq.daq.metadata_staging is None
+            assert self.test_daq.daq.acquisition_state == "Idle"
+            message = "Meta data added to {}".format(self.test_daq.daq.hdf_file_location)
+            assert self.test_daq.daq.parent.fem.status_message == message
+
+    def test_replace_staged_file_retries_rename(self):
+        """Test function retries renaming staged file in case file temporary busy."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop, patch("os.replace") as mock_replace:
+            mock_replace.side_effect = OSError("Device or resource busy")
+            self.test_daq.daq.in_progress = True
+            self.test_daq.daq.hdf_retry = 0
+            self.test_daq.daq.replace_staged_file(0)
+
+            assert self.test_daq.daq.hdf_retry == 1
+            mock_loop.instance().call_later.assert_called_with(0.5, self.test_daq.daq.replace_staged_file, 0)
+            assert self.test_daq.daq.in_progress is True
+
+            mock_replace.side_effect = None
+            self.test_daq.daq.replace_staged_file(0)
+            assert self.test_daq.daq.hdf_retry == 0
+            assert self.test_daq.daq.in_progress is False
+            assert self.test_daq.daq.acquisition_state == "Idle"
+
+    def test_replace_staged_file_writes_metadata_in_full_after_retries(self):
+        """Test function writes meta data in full once renaming staged file keeps failing."""
+        with patch("hexitec.HexitecDAQ.IOLoop") as mock_loop, patch("os.replace") as mock_replace, \
+                patch("h5py.File"):
+            mock_replace.side_effect = OSError("Device or resource busy")
+            self.test_daq.daq.in_progress = True
+            self.test_daq.daq.write_metadata = Mock(return_value=0)
+            self.test_daq.daq._remove_staged_file = Mock()
+            self.test_daq.daq.staged_file_location = "run.h5.staging"
+            self.test_daq.daq.hdf_retry = 6
+            self.test_daq.daq.replace_staged_file(0)
+
+            mock_loop.instance().call_later.assert_not_called()
+            self.test_daq.daq._remove_staged_file.assert_called_with("run.h5.staging")
+            assert self.test_daq.daq.write_metadata.call_count == 3
+            assert self.test_daq.daq.hdf_retry == 0
+            assert self.test_daq.daq.in_progress is False
+
+    def test_prepare_hdf_file_handles_failed_staging(self):
+        """Test function writes meta data in full if staging failed."""
+        with patch("hexitec.HexitecDAQ.IOLoop"), patch("h5py.File"):
+            self.test_daq.daq.in_progress = True
+            self.test_daq.daq.write_metadata = Mock(return_value=0)
+            self.test_daq.daq.metadata_staging = Mock(done=Mock(return_value=True),
+                                                      result=Mock(side_effect=OSError("Disk full")))
+            self.test_daq.daq.prepare_hdf_file()
+
+            assert self.test_daq.daq.write_metadata.call_count == 3
+            assert self.test_daq.daq.metadata_staging is None
+            assert self.test_daq.daq.in_progress is False
+
     def test_flatten_dict(self):
         """Test help function."""
         test_dict = {"test": 5, "tree": {"branch_1": 1.1, "branch_2": 1.2}}
@@ -1350,6 +1686,19 @@ class TestDAQ(unittest.TestCase):
         assert exc_info.type is ParameterTreeError
         assert exc_info.value.args[0] == error
 
+    def test_get_metadata_mode(self):
+        """Test function gets meta data mode."""
+        self.test_daq.daq._set_metadata_mode("legacy")
+        assert self.test_daq.daq._get_metadata_mode() == "legacy"
+
+    def test_set_metadata_mode(self):
+        """Test function rejects invalid meta data mode."""
+        error = "Invalid metadata mode; Valid options: {}".format(MetadataWriter.MODES)
+        with pytest.raises(ParameterTreeError) as exc_info:
+            self.test_daq.daq._set_metadata_mode("bad_mode")
+        assert exc_info.type is ParameterTreeError
+        assert exc_info.value.args[0] == error
+
     @patch('hexitec.HexitecDAQ.GenerateConfigFiles')
     @patch('hexitec.HexitecDAQ.IOLoop.instance')
     def test_commit_configuration_with_pass_processed(self, mock_ioloop_instance,
@@ -0,0 +1,87 @@
+"""
+Test Cases for the Farm Mode look up tables in hexitec.FarmMode.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import json
+import os
+import tempfile
+
+from hexitec.FarmMode import load_farm_mode_targets, farm_mode_config, frame_destinations, FarmModeError
+
+
+class TestFarmMode(unittest.TestCase):
+    """Unit tests for the Farm Mode functions."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "farm_mode.json")
+        self.config = {
+            "farm_server_1_ip": "10.0.2.1",
+            "farm_server_1_mac": "9c:69:b4:60:b8:26",
+            "farm_server_2_ip": "10.0.1.1",
+            "farm_server_2_mac": "9c:69:b4:60:b8:25",
+            "farm_target_ip": "10.0.2.1 10.0.1.1 10.0.2.1 10.0.1.1",
+            "farm_target_mac": "9c:69:b4:60:b8:26 9c:69:b4:60:b8:25 9c:69:b4:60:b8:26 9c:69:b4:60:b8:25",
+            "farm_target_port": "61649 61649 61659 61659"
+        }
+        self.ips = self.config["farm_target_ip"].split(" ")
+        self.macs = self.config["farm_target_mac"].split(" ")
+        self.ports = [61649, 61649, 61659, 61659]
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def write_config(self, config):
+        """Write config to file."""
+        with open(self.filename, "w") as f:
+            f.write(config if isinstance(config, str) else json.dumps(config))
+
+    def test_load_farm_mode_targets(self):
+        """Test farm targets split into lists."""
+        self.write_config(self.config)
+        targets = load_farm_mode_targets(self.filename)
+        assert targets["farm_target_ip"] == self.ips
+        assert targets["farm_target_mac"] == self.macs
+        assert targets["farm_target_port"] == self.ports
+        assert targets["farm_server_2_ip"] == "10.0.1.1"
+
+    def test_load_farm_mode_targets_handles_bad_file(self):
+        """Test missing, malformed and incomplete config files rejected."""
+        with pytest.raises(FarmModeError, match="Farm Mode: Config File"):
+            load_farm_mode_targets(self.filename)
+        self.write_config("{")
+        with pytest.raises(FarmModeError, match="Farm Mode: Bad json"):
+            load_farm_mode_targets(self.filename)
+        del self.config["farm_target_port"]
+        self.write_config(self.config)
+        with pytest.raises(FarmModeError, match="lacks farm_target_ip/mac/port"):
+            load_farm_mode_targets(self.filename)
+        self.config["farm_target_port"] = "61649 one"
+        self.write_config(self.config)
+        with pytest.raises(FarmModeError, match="Bad farm_target_port"):
+            load_farm_mode_targets(self.filename)
+        self.config["farm_target_port"] = "61649"
+        self.write_config(self.config)
+        with pytest.raises(FarmModeError, match="lengths differ"):
+            load_farm_mode_targets(self.filename)
+
+    def test_farm_mode_config(self):
+        """Test look up tables of each operating mode, triggered or not."""
+        ips1, ips2, _, _, ports1, ports2 = farm_mode_config(self.ips, self.macs, self.ports, "NXCT")
+        assert frame_destinations(ips1, ips2, ports1, ports2) == list(zip(self.ips, self.ports))
+        ips1, ips2, _, _, ports1, ports2 = farm_mode_config(self.ips, self.macs, self.ports, "EPAC")
+        assert frame_destinations(ips1, ips2, ports1, ports2) == [("10.0.2.1", 61649), ("10.0.2.1", 61659)]
+        ips1, ips2, _, _, ports1, ports2 = farm_mode_config(self.ips, self.macs, self.ports, "EPAC", 2)
+        # 2 frames per instance, alternate instances' lanes swapped
+        assert frame_destinations(ips1, ips2, ports1, ports2) == \
+            [("10.0.2.1", 61649), ("10.0.1.1", 61649), ("10.0.1.1", 61659), ("10.0.2.1", 61659)]
+        with pytest.raises(FarmModeError, match="Invalid operating mode"):
+            farm_mode_config(self.ips, self.macs, self.ports, "LATRD")
+        with pytest.raises(FarmModeError, match="equal, non-zero, length"):
+            frame_destinations([], [], [], [])
@@ -0,0 +1,110 @@
+"""
+Test Cases for the FrameAccounting in hexitec.FrameAccounting.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+
+from hexitec.FrameAccounting import FrameAccounting
+
+
+class TestFrameAccounting(unittest.TestCase):
+    """Unit tests for the FrameAccounting class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.accounting = FrameAccounting(settle_time=5.0)
+        self.accounting.reset(100)
+        # Every frame received (1 incomplete, timed out) or dropped, 92 processed
+        self.fr_statuses = [
+            {"frames": {"timedout": 1, "received": 50, "released": 50, "dropped": 0},
+             "buffers": {"total": 100, "empty": 100, "mapped": 0}},
+            {"frames": {"timedout": 0, "received": 47, "released": 47, "dropped": 3},
+             "buffers": {"total": 100, "empty": 100, "mapped": 0}}
+        ]
+        self.fp_statuses = [
+            {"histogram": {"frames_processed": 47}},
+            {"histogram": {"frames_processed": 45}}
+        ]
+
+    def test_init_default_settle_time(self):
+        """Test settle time defaults to 1 s."""
+        assert FrameAccounting().settle_time == 1.0
+
+    def test_update_awaits_settle_time(self):
+        """Test accounting incomplete until counters unchanged for settle time."""
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0) is False
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 12.0) is False
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 15.0) is True
+
+    def test_update_restarts_settle_time_on_change(self):
+        """Test changing counter, timed out frames included, restarts settle time."""
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        self.fp_statuses[1]["histogram"]["frames_processed"] = 46
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 15.0) is False
+        self.fr_statuses[1]["frames"]["timedout"] = 1
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 19.0) is False
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 24.0) is True
+
+    def test_update_tolerates_processing_pause(self):
+        """Test frameProcessor pausing after frameReceiver released every frame doesn't end run."""
+        self.fp_statuses[1]["histogram"]["frames_processed"] = 20
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 11.0) is False
+        self.fp_statuses[1]["histogram"]["frames_processed"] = 45
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 12.0) is False
+
+    def test_update_awaits_every_frame_received_or_dropped(self):
+        """Test frames not yet received (or dropped) never deemed lost, however long counters settle."""
+        self.fr_statuses[0]["frames"]["received"] = 46
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 100.0) is False
+
+    def test_update_completes_once_final_frame_seen(self):
+        """Test whole frames lost, final frame seen by a decoder, accounted for once settled."""
+        self.fr_statuses[0]["frames"]["received"] = 46
+        self.fr_statuses[0]["decoder"] = {"packets_lost": 0, "last_frame_number": 98}
+        self.fr_statuses[1]["decoder"] = {"packets_lost": 0, "last_frame_number": 97}
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 100.0) is False
+        self.fr_statuses[1]["decoder"]["last_frame_number"] = 99
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 101.0) is False
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 106.0) is True
+        assert self.accounting.get_summary()["not_received"] == 4
+
+    def test_update_awaits_frames_in_flight(self):
+        """Test accounting incomplete while frameReceiver holds frame(s) in buffers."""
+        self.fr_statuses[0]["buffers"]["empty"] = 99
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 20.0) is False
+
+    def test_update_completes_once_all_processed(self):
+        """Test accounting complete as soon as all frames processed."""
+        self.accounting.reset(92)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0) is True
+
+    def test_update_handles_no_nodes(self):
+        """Test accounting never completes without node statuses, or before acquisition prepared."""
+        self.accounting.update([], [], "histogram", 10.0)
+        assert self.accounting.update([], [], "histogram", 20.0) is False
+        self.accounting.reset(0)
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        assert self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 20.0) is False
+
+    def test_get_summary(self):
+        """Test summary accounts for every frame."""
+        self.fr_statuses[1]["frames"]["received"] = 43
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 10.0)
+        summary = self.accounting.get_summary()
+        assert summary == {"expected": 100, "processed": 92, "dropped": 3, "timedout": 1,
+                           "not_received": 4, "not_processed": 1, "outstanding": 8,
+                           "complete": False}
+        self.fr_statuses[1]["frames"]["received"] = 47
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 11.0)
+        self.accounting.update(self.fr_statuses, self.fp_statuses, "histogram", 16.0)
+        summary = self.accounting.get_summary()
+        assert summary["outstanding"] == 0
+        assert summary["complete"] is True
+        lost = summary["dropped"] + summary["not_received"] + summary["not_processed"]
+        assert summary["processed"] + lost == summary["expected"]
@@ -0,0 +1,71 @@
+"""
+Test Cases for the FrameWriter in hexitec.FrameWriter.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import tempfile
+
+import h5py
+import numpy as np
+
+from hexitec.FrameWriter import FrameWriter, FrameWriterError, blosc_available
+
+
+class TestFrameWriter(unittest.TestCase):
+    """Unit tests for the FrameWriter class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "capture.h5")
+        self.frames = np.random.default_rng(0).integers(0, 4000, (37, 80, 80)).astype(np.uint16)
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_write_frames(self):
+        """Test frames appended to resizable dataset of DAQ's raw_frames layout."""
+        with FrameWriter(self.filename, 80, 80, batch_frames=16) as writer:
+            for frame in self.frames:
+                writer.write(frame)
+            assert writer.frames_written == 32
+            assert writer.buffer.shape == (16, 80, 80)
+        assert writer.frames_written == 37
+        with h5py.File(self.filename, 'r') as f:
+            dataset = f["raw_frames"]
+            assert dataset.dtype == np.uint16
+            assert dataset.chunks == (1, 80, 80)
+            assert dataset.maxshape == (None, 80, 80)
+            np.testing.assert_array_equal(dataset[()], self.frames)
+
+    def test_batch_rounded_to_whole_chunks(self):
+        """Test buffer holds whole chunks."""
+        with FrameWriter(self.filename, 80, 80, frames_per_chunk=4, batch_frames=6) as writer:
+            assert writer.buffer.shape[0] == 8
+            for frame in self.frames[:5]:
+                writer.write(frame)
+        with h5py.File(self.filename, 'r') as f:
+            assert f["raw_frames"].chunks == (4, 80, 80)
+            np.testing.assert_array_equal(f["raw_frames"][()], self.frames[:5])
+
+    def test_rejects_bad_settings(self):
+        """Test invalid compression type, unwritable file rejected."""
+        with pytest.raises(FrameWriterError, match="Invalid compression type"):
+            FrameWriter(self.filename, 80, 80, compression_type="gzip")
+        with pytest.raises(FrameWriterError, match="Couldn't open"):
+            FrameWriter(os.path.join(self.directory.name, "missing", "capture.h5"), 80, 80)
+
+    @pytest.mark.skipif(not blosc_available(), reason="HDF5 Blosc filter not available")
+    def test_write_blosc_compressed_frames(self):
+        """Test frames written through Blosc filter."""
+        with FrameWriter(self.filename, 80, 80, compression_type="blosc") as writer:
+            for frame in self.frames:
+                writer.write(frame)
+        with h5py.File(self.filename, 'r') as f:
+            assert f["raw_frames"].id.get_create_plist().get_filter(0)[0] == 32001
+            np.testing.assert_array_equal(f["raw_frames"][()], self.frames)
@@ -0,0 +1,107 @@
+"""
+Test Cases for the HexitecConfig, HexitecConfigCache in hexitec.HexitecConfig.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import tempfile
+
+from hexitec.HexitecConfig import HexitecConfig, HexitecConfigCache, HexitecConfigError
+
+
+class TestHexitecConfig(unittest.TestCase):
+    """Unit tests for the HexitecConfig class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.parameters = {'Control-Settings/HV_Bias': '15'}
+        for ordinal, channel in zip(HexitecConfig.ORDINALS, ['11111111000000000000', '10000000000000000000',
+                                                             '00000000000000000000', '00000000000000000001']):
+            self.parameters['Sensor-Config_V1_S2/ColumnCal%sChannel' % ordinal] = channel
+
+    def test_from_contents(self):
+        """Test INI contents parsed into case sensitive, unquoted values."""
+        contents = b'[Control-Settings]\r\nHV_Bias = "15"\r\nRow -> S1 = "25"\r\n'
+        config = HexitecConfig.from_contents(contents, "test.ini")
+        assert config.parameters == {'Control-Settings/HV_Bias': '15', 'Control-Settings/Row -> S1': '25'}
+        assert config.digest is not None
+
+    def test_from_contents_rejects_malformed_file(self):
+        """Test unparseable contents rejected."""
+        with pytest.raises(HexitecConfigError):
+            HexitecConfig.from_contents(b'HV_Bias = "15"\n', "test.ini")
+
+    def test_get_enables(self):
+        """Test enables compiled into ten bytes, first character of each byte its LSB."""
+        config = HexitecConfig(self.parameters)
+        enables = config.get_enables("ColumnCal", 1, 2, "Channel")
+        assert enables == [0xFF, 0x00, 0x10, 0, 0, 0, 0, 0, 0, 0x80]
+        assert config.get_enables("ColumnCal", 1, 1, "Channel") == [-1]
+
+    def test_compile_enables_rejects_invalid_length(self):
+        """Test enable string of wrong length rejected."""
+        self.parameters['Sensor-Config_V1_S2/ColumnCal2ndChannel'] = '1111'
+        with pytest.raises(HexitecConfigError, match="Invalid length of value in"):
+            HexitecConfig(self.parameters)
+
+    def test_compile_enables_rejects_invalid_character(self):
+        """Test enable string containing other than 0, 1 rejected."""
+        self.parameters['Sensor-Config_V1_S2/ColumnCal2ndChannel'] = '1111111111111111111x'
+        with pytest.raises(HexitecConfigError, match="Invalid enable"):
+            HexitecConfig(self.parameters)
+
+    def test_diff_changed_vsrs(self):
+        """Test keys that differ, and VSRs affected, identified."""
+        applied = HexitecConfig(dict(self.parameters))
+        self.parameters['Control-Settings/HV_Bias'] = '20'
+        self.parameters['Sensor-Config_V1_S2/ColumnCal1stChannel'] = '00000000000000000000'
+        config = HexitecConfig(self.parameters)
+        assert config.diff(applied) == {'Control-Settings/HV_Bias', 'Sensor-Config_V1_S2/ColumnCal1stChannel'}
+        assert config.changed_vsrs(applied) == [1]
+        assert config.diff(None) == set(self.parameters)
+        assert config.changed_vsrs(config) == []
+
+
+class TestHexitecConfigCache(unittest.TestCase):
+    """Unit tests for the HexitecConfigCache class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "hexitec.ini")
+        with open(self.filename, 'w') as f:
+            f.write('[Control-Settings]\nHV_Bias = "15"\n')
+        self.cache = HexitecConfigCache()
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_load_unchanged_file_once(self):
+        """Test file compiled once, while unchanged."""
+        config = self.cache.load(self.filename)
+        assert self.cache.load(self.filename) is config
+        # Touched, but contents unchanged
+        os.utime(self.filename, (0, 0))
+        assert self.cache.load(self.filename) is config
+        assert self.cache.misses == 1
+        assert self.cache.hits == 2
+
+    def test_load_changed_file(self):
+        """Test file recompiled once modified."""
+        config = self.cache.load(self.filename)
+        with open(self.filename, 'w') as f:
+            f.write('[Control-Settings]\nHV_Bias = "200"\n')
+        os.utime(self.filename, (0, 0))
+        changed = self.cache.load(self.filename)
+        assert changed is not config
+        assert changed.parameters['Control-Settings/HV_Bias'] == '200'
+
+    def test_load_missing_file(self):
+        """Test missing file yields configuration without parameters."""
+        config = self.cache.load(os.path.join(self.directory.name, "missing.ini"))
+        assert config.parameters == {}
+        assert self.cache.configs == {}
@@ -0,0 +1,166 @@
+"""
+Test Cases for the MetadataWriter in hexitec.MetadataWriter.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import json
+import os
+import tempfile
+
+import h5py
+import numpy as np
+
+from hexitec.MetadataWriter import MetadataWriter
+
+from unittest.mock import Mock
+
+
+class TestMetadataWriter(unittest.TestCase):
+    """Unit tests for the MetadataWriter class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.tree = {
+            "detector": {
+                "status_message": "Ready",
+                "number_frames": 10,
+                "fem": {
+                    "frame_rate": 7154.63,
+                    "health": True,
+                    "temperatures": [20.1, 21.2],
+                    "errors_history": [["timestamp", "error"]],
+                    "acquire_start_time": None
+                },
+                "daq": {
+                    "empty_list": [],
+                    "nodes": [{"name": "fp0"}, {"name": "fp1"}]
+                }
+            }
+        }
+        handle, self.file_name = tempfile.mkstemp(suffix=".h5")
+        os.close(handle)
+
+    def tearDown(self):
+        """Remove temporary file."""
+        os.remove(self.file_name)
+
+    def test_init_rejects_invalid_mode(self):
+        """Test constructor rejects unknown mode."""
+        with pytest.raises(ValueError) as exc_info:
+            MetadataWriter(mode="bad_mode")
+        error = "Invalid metadata mode; Valid options: {}".format(MetadataWriter.MODES)
+        assert exc_info.value.args[0] == error
+
+    def test_convert(self):
+        """Test conversion substitutes unstorable values, drops skipped keys, leaves input intact."""
+        writer = MetadataWriter()
+        converted = writer.convert(self.tree)
+        fem = converted["detector"]["fem"]
+        assert "errors_history" not in fem
+        assert fem["acquire_start_time"] == "None"
+        assert converted["detector"]["daq"]["empty_list"] == ["(empty)"]
+        assert writer.convert({"a": np.int64(3), "b": np.arange(2)}) == {"a": 3, "b": [0, 1]}
+        assert self.tree["detector"]["fem"]["acquire_start_time"] is None
+
+    def test_write_compact(self):
+        """Test compact mode writes one JSON blob per subtree, scalars as group attributes."""
+        writer = MetadataWriter(mode="compact")
+        with h5py.File(self.file_name, "w") as hdf_file:
+            write_time = writer.write(hdf_file, '/', self.tree)
+        assert write_time == writer.write_time
+        assert write_time > 0
+        with h5py.File(self.file_name, "r") as hdf_file:
+            group = hdf_file["detector"]
+            assert json.loads(group.attrs["number_frames"]) == 10
+            assert json.loads(group.attrs["status_message"]) == "Ready"
+            assert group["fem"].attrs["format"] == "json"
+            fem = json.loads(group["fem"][()])
+            assert fem["temperatures"] == [20.1, 21.2]
+            assert "errors_history" not in fem
+            daq = json.loads(group["daq"][()])
+            assert daq["nodes"][1] == {"name": "fp1"}
+            assert sorted(group.keys()) == ["daq", "fem"]
+
+    def test_write_legacy(self):
+        """Test legacy mode writes one dataset per key."""
+        writer = MetadataWriter(mode="legacy")
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', self.tree)
+        with h5py.File(self.file_name, "r") as hdf_file:
+            assert hdf_file["detector/number_frames"][()] == 10
+            assert list(hdf_file["detector/fem/temperatures"][()]) == [20.1, 21.2]
+            assert hdf_file["detector/daq/nodes/nodes1/name"][()] == b"fp1"
+            assert "errors_history" not in hdf_file["detector/fem"]
+
+    def test_write_legacy_reports_unwritable_key(self):
+        """Test legacy mode reports key it cannot write."""
+        callback = Mock()
+        writer = MetadataWriter(mode="legacy", error_callback=callback)
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', {"list_list": [["String"]]})
+        error = "No conversion path for dtype: dtype('<U6')"
+        callback.assert_called_with("Parsing key: /list_list value: [['String']]", error)
+
+    def test_write_compact_reports_unwritable_key(self):
+        """Test compact mode reports key it cannot serialise."""
+        callback = Mock()
+        writer = MetadataWriter(mode="compact", error_callback=callback)
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', {"bad": {"value": {1, 2}}})
+        assert callback.call_args[0][0] == "Parsing key: /bad/value value: {1, 2}"
+
+    def test_patch_compact(self):
+        """Test compact mode patch rewrites changed blobs and attributes only."""
+        writer = MetadataWriter(mode="compact")
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', self.tree)
+            fem_id = hdf_file["detector/fem"].id.get_offset()
+        tree = writer.convert(self.tree)
+        tree["detector"]["number_frames"] = 20
+        tree["detector"]["daq"]["nodes"][0]["name"] = "fp2"
+        with h5py.File(self.file_name, "a") as hdf_file:
+            write_time = writer.patch(hdf_file, '/', self.tree, tree)
+            assert write_time > 0
+            assert hdf_file["detector/fem"].id.get_offset() == fem_id
+            assert json.loads(hdf_file["detector"].attrs["number_frames"]) == 20
+            daq = json.loads(hdf_file["detector/daq"][()])
+            assert daq["nodes"][0] == {"name": "fp2"}
+
+    def test_patch_legacy(self):
+        """Test legacy mode patch rewrites changed keys."""
+        writer = MetadataWriter(mode="legacy")
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', self.tree)
+        tree = writer.convert(self.tree)
+        tree["detector"]["fem"]["temperatures"] = [25.0, 26.0]
+        tree["detector"]["fem"]["new_key"] = "new"
+        with h5py.File(self.file_name, "a") as hdf_file:
+            writer.patch(hdf_file, '/', self.tree, tree)
+            assert list(hdf_file["detector/fem/temperatures"][()]) == [25.0, 26.0]
+            assert hdf_file["detector/fem/new_key"][()] == b"new"
+            assert hdf_file["detector/number_frames"][()] == 10
+
+    def test_patch_legacy_list_of_dictionaries(self):
+        """Test legacy mode patch rewrites changed list entries (key0, key1, ..) only, removing dropped ones."""
+        writer = MetadataWriter()
+        assert writer.mode == "legacy"
+        with h5py.File(self.file_name, "w") as hdf_file:
+            writer.write(hdf_file, '/', self.tree)
+            node_id = hdf_file["detector/daq/nodes/nodes0/name"].id.get_offset()
+        tree = writer.convert(self.tree)
+        tree["detector"]["daq"]["nodes"][1]["name"] = "fp2"
+        with h5py.File(self.file_name, "a") as hdf_file:
+            writer.patch(hdf_file, '/', self.tree, tree)
+            assert hdf_file["detector/daq/nodes/nodes0/name"].id.get_offset() == node_id
+            assert hdf_file["detector/daq/nodes/nodes1/name"][()] == b"fp2"
+        staged = tree
+        tree = writer.convert(staged)
+        tree["detector"]["daq"]["nodes"] = [{"name": "fp0"}]
+        del tree["detector"]["fem"]["health"]
+        with h5py.File(self.file_name, "a") as hdf_file:
+            writer.patch(hdf_file, '/', staged, tree)
+            assert list(hdf_file["detector/daq/nodes"]) == ["nodes0"]
+            assert "health" not in hdf_file["detector/fem"]
@@ -0,0 +1,108 @@
+"""
+Test Cases for the packet header analysis in hexitec.PacketAnalysis.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import os
+import struct
+import tempfile
+
+import h5py
+import numpy as np
+
+from hexitec.PacketAnalysis import PACKETS, packets_per_frame, primary_packet_size, read_headers, \
+    analyse_packets, write_table
+from test_PcapStream import hexitec_payloads, udp_packet, write_pcap
+
+
+def packets_of(headers):
+    """Return (PACKETS) array of (frame number, packet number) pairs, 4 packets per frame, 1 us apart."""
+    packets = np.zeros(len(headers), dtype=PACKETS)
+    for index, (frame_number, packet_number) in enumerate(headers):
+        packets[index] = (index * 1000, frame_number, packet_number, packet_number == 0, packet_number == 3, 8000)
+    return packets
+
+
+class TestPacketAnalysis(unittest.TestCase):
+    """Unit tests for the packet header analysis."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_packets_per_frame(self):
+        """Test packets per frame of each sensors layout."""
+        assert packets_per_frame(160, 480, 7680) == 20
+        assert packets_per_frame(160, 160, 8000) == 7
+        assert packets_per_frame(80, 80, 8000) == 2
+        assert primary_packet_size(packets_of([(0, 0), (0, 1)])) == 8000
+
+    def test_read_headers(self):
+        """Test headers, timestamps and payload sizes read from either header size."""
+        frames = np.zeros((2, 80, 80), dtype=np.uint16)
+        filename = os.path.join(self.directory.name, "capture.pcap")
+        write_pcap(filename, [udp_packet(payload) for payload in hexitec_payloads(frames, 8000)])
+        packets = read_headers(filename, True)
+        assert packets["frame_number"].tolist() == [0, 0, 1, 1]
+        assert packets["packet_number"].tolist() == [0, 1, 0, 1]
+        assert packets["start_of_frame"].tolist() == [True, False, True, False]
+        assert packets["end_of_frame"].tolist() == [False, True, False, True]
+        assert packets["size"].tolist() == [8000, 4800, 8000, 4800]
+        assert packets["timestamp"][1] - packets["timestamp"][0] == 1000000
+        # (8 byte) headers
+        payloads = [struct.pack("<II", 5, (1 << 30) | 3) + bytes(16)]
+        write_pcap(filename, [udp_packet(payload) for payload in payloads])
+        packets = read_headers(filename, False)
+        assert packets[["frame_number", "packet_number", "end_of_frame", "size"]].tolist() == [(5, 3, True, 16)]
+
+    def test_analyse_complete_capture(self):
+        """Test capture without loss summarised."""
+        summary, frames = analyse_packets(packets_of([(f, p) for f in range(3) for p in range(4)]), 4)
+        assert summary["complete_frames"] == 3
+        assert summary["missing_packets"] == summary["duplicate_packets"] == summary["out_of_order_packets"] == 0
+        assert summary["frame_gaps"] == 0
+        assert summary["mean_interval_ns"] == 4000
+        assert summary["interval_jitter_ns"] == 0
+        assert frames["interval"].tolist() == [0, 4000, 4000]
+
+    def test_analyse_losses(self):
+        """Test lost, duplicated, reordered packets and missing frames counted per frame."""
+        headers = [(0, 0), (0, 1), (0, 3), (0, 2),      # Reordered
+                   (2, 0), (2, 1), (2, 1), (2, 2), (2, 3),      # Duplicate
+                   (4, 0), (4, 2), (4, 3),      # Lost
+                   (6, 0), (6, 1), (6, 2), (6, 3),
+                   (8, 0), (5, 1)]       # Frame 5's packet late
+        summary, frames = analyse_packets(packets_of(headers), 4)
+        assert frames["frame_number"].tolist() == [0, 2, 4, 5, 6, 8]
+        assert frames["missing_packets"].tolist() == [0, 0, 1, 3, 0, 3]
+        assert frames["duplicate_packets"].tolist() == [0, 1, 0, 0, 0, 0]
+        assert frames["out_of_order_packets"].tolist() == [1, 0, 0, 1, 0, 0]
+        assert frames["complete"].tolist() == [True, True, False, False, True, False]
+        assert summary["incomplete_frames"] == 3
+        assert summary["duplicate_packets"] == 1
+        assert summary["out_of_order_packets"] == 2
+        assert summary["frame_number_interval"] == 2
+        assert summary["frame_gaps"] == 2
+        assert summary["missing_frames"] == 0
+
+    def test_write_table(self):
+        """Test per frame table written to CSV, HDF5 files."""
+        summary, frames = analyse_packets(packets_of([(f, p) for f in (0, 1, 3) for p in range(4)]), 4)
+        assert summary["missing_frames"] == 1
+        filename = os.path.join(self.directory.name, "frames.csv")
+        write_table(filename, frames, summary)
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        assert lines[0].startswith("frame_number,packets,missing_packets")
+        assert lines[3].startswith("3,4,0,0,0,1,1,1,")
+        filename = os.path.join(self.directory.name, "frames.h5")
+        write_table(filename, frames, summary)
+        with h5py.File(filename, 'r') as f:
+            assert f["frames"]["frame_number"].tolist() == [0, 1, 3]
+            assert f["frames"].attrs["missing_frames"] == 1
@@ -0,0 +1,167 @@
+"""
+Test Cases for the PcapStream, FrameAssembler in hexitec.PcapStream.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from hexitec.PcapStream import PcapStream, PcapStreamError, FrameAssembler, parse_header
+
+
+def udp_packet(payload, port=61649, vlan=False, protocol=17):
+    """Return Ethernet frame, of IPv4 UDP packet to port, carrying payload."""
+    udp = struct.pack(">HHHH", 61000, port, 8 + len(payload), 0) + payload
+    ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0x4000, 64, protocol, 0,
+                     b"\x0a\x00\x00\x01", b"\x0a\x00\x00\x02")
+    ethernet = b"\x00" * 12 + (b"\x81\x00\x00\x05" if vlan else b"") + b"\x08\x00"
+    return ethernet + ip + udp
+
+
+def hexitec_payloads(frames, packet_size, frame_offset=0):
+    """Return payloads, with extended headers, of frames split into packets of packet_size bytes."""
+    payloads = []
+    for index, frame in enumerate(frames):
+        data = frame.astype(np.uint16).tobytes()
+        packets = [data[i:i + packet_size] for i in range(0, len(data), packet_size)]
+        for number, packet in enumerate(packets):
+            flags = ((number == 0) << 31) | ((number == len(packets) - 1) << 30)
+            payloads.append(struct.pack("<QII", index + frame_offset, number, flags) + packet)
+    return payloads
+
+
+def write_pcap(filename, packets, nanoseconds=False):
+    """Write packets into (little endian) pcap file, one per millisecond."""
+    with open(filename, 'wb') as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b23c4d if nanoseconds else 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for index, packet in enumerate(packets):
+            fraction = index * (1000000 if nanoseconds else 1000)
+            f.write(struct.pack("<IIII", 10, fraction, len(packet), len(packet)) + packet)
+
+
+def pcapng_block(block_type, body):
+    """Return (little endian) pcapng block, padding body to 32 bits."""
+    body += b"\x00" * (-len(body) % 4)
+    return struct.pack("<II", block_type, len(body) + 12) + body + struct.pack("<I", len(body) + 12)
+
+
+def write_pcapng(filename, packets):
+    """Write packets into pcapng file, interface of nanosecond resolution, one per millisecond."""
+    with open(filename, 'wb') as f:
+        f.write(pcapng_block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)))
+        options = struct.pack("<HHB3x", 9, 1, 9) + struct.pack("<HH", 0, 0)
+        f.write(pcapng_block(1, struct.pack("<HHI", 1, 0, 0) + options))
+        # A statistics block, to be skipped
+        f.write(pcapng_block(5, struct.pack("<III", 0, 0, 0)))
+        for index, packet in enumerate(packets):
+            timestamp = 10000000000 + index * 1000000
+            f.write(pcapng_block(6, struct.pack("<IIIII", 0, timestamp >> 32, timestamp & 0xFFFFFFFF,
+                                                len(packet), len(packet)) + packet))
+
+
+class TestPcapStream(unittest.TestCase):
+    """Unit tests for the PcapStream, FrameAssembler classes."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.frames = rng.integers(0, 4000, (3, 80, 80)).astype(np.uint16)
+        self.payloads = hexitec_payloads(self.frames, 4000)
+        self.packets = [udp_packet(payload, vlan=(index % 2 == 1)) for index, payload in enumerate(self.payloads)]
+        # Add an ICMP packet and a UDP packet to another port
+        self.packets.insert(1, udp_packet(b"ping", protocol=1))
+        self.packets.insert(3, udp_packet(b"other", port=1234))
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def stream(self, write, *args):
+        """Return PcapStream of packets written by write."""
+        filename = os.path.join(self.directory.name, "capture")
+        write(filename, self.packets, *args)
+        return PcapStream(filename)
+
+    def test_udp_payloads_of_pcap(self):
+        """Test UDP payloads, timestamps located in pcap file."""
+        with self.stream(write_pcap) as stream:
+            assert stream.format == "pcap"
+            records = [(timestamp, bytes(payload)) for timestamp, payload in stream.udp_payloads(61649)]
+            assert [payload for _, payload in records] == self.payloads
+            assert records[1][0] - records[0][0] == 2000000
+            assert stream.non_udp_packets == 1
+
+    def test_udp_payloads_of_nanosecond_pcap(self):
+        """Test nanosecond resolution pcap file timestamps."""
+        with self.stream(write_pcap, True) as stream:
+            timestamps = [timestamp for timestamp, _ in stream.udp_payloads()]
+            assert timestamps[:2] == [10000000000, 10002000000]
+            assert len(timestamps) == len(self.payloads) + 1
+
+    def test_udp_payloads_of_pcapng(self):
+        """Test UDP payloads, timestamps located in pcapng file."""
+        with self.stream(write_pcapng) as stream:
+            assert stream.format == "pcapng"
+            records = [(timestamp, bytes(payload)) for timestamp, payload in stream.udp_payloads(61649)]
+            assert [payload for _, payload in records] == self.payloads
+            assert records[0][0] == 10000000000
+
+    def test_rejects_other_files(self):
+        """Test missing, empty and non-capture files rejected."""
+        filename = os.path.join(self.directory.name, "capture")
+        with pytest.raises(PcapStreamError, match="Cannot open"):
+            PcapStream(filename)
+        open(filename, 'w').close()
+        with pytest.raises(PcapStreamError, match="Cannot open"):
+            PcapStream(filename)
+        with open(filename, 'w') as f:
+            f.write("not a capture")
+        with pytest.raises(PcapStreamError, match="neither a pcap nor pcapng file"):
+            PcapStream(filename)
+
+    def test_parse_header(self):
+        """Test frame number, packet number and flags decoded from either header size."""
+        assert parse_header(struct.pack("<QII", 0x100000007, 5, 1 << 31), True) == (0x100000007, 5, True, False)
+        assert parse_header(struct.pack("<II", 9, (1 << 30) | 3), False) == (9, 3, False, True)
+
+    def test_frames_assembled(self):
+        """Test frames assembled from pcap file's payloads."""
+        assembler = FrameAssembler(80, 80)
+        with self.stream(write_pcapng) as stream:
+            frames = [(number, frame.copy()) for number, frame in
+                      assembler.frames(payload for _, payload in stream.udp_payloads(61649))]
+        assert [number for number, _ in frames] == [0, 1, 2]
+        np.testing.assert_array_equal(np.array([frame for _, frame in frames]), self.frames)
+        assert (assembler.complete_frames, assembler.incomplete_frames, assembler.packets) == (3, 0, 12)
+
+    def test_frames_with_lost_packets_dropped(self):
+        """Test frames missing a packet, or truncated, dropped."""
+        payloads = list(self.payloads)
+        # Lose second packet of first frame, last packet of last frame
+        del payloads[-1]
+        del payloads[1]
+        assembler = FrameAssembler(80, 80)
+        frames = [number for number, _ in assembler.frames(payloads)]
+        assert frames == [1]
+        assert assembler.incomplete_frames == 2
+        # (8 byte) headers' packet numbers share 32 bits with flags
+        payloads = []
+        for payload in self.payloads:
+            frame_number, packet_number, flags = struct.unpack_from("<QII", payload)
+            payloads.append(struct.pack("<II", frame_number, packet_number | flags) + payload[16:])
+        del payloads[5]
+        assembler = FrameAssembler(80, 80, extended_headers=False)
+        assert [number for number, _ in assembler.frames(payloads)] == [0, 2]
+        assert assembler.incomplete_frames == 1
+        # Frame of too many packets dropped
+        payloads = hexitec_payloads(self.frames[:1], 3200) + hexitec_payloads(np.zeros((1, 80, 81)), 3200)
+        assembler = FrameAssembler(80, 80)
+        assert [number for number, _ in assembler.frames(payloads)] == [0]
+        assert assembler.incomplete_frames == 1
@@ -0,0 +1,75 @@
+"""
+Test Cases for the RateEstimator in hexitec.RateEstimator.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+from hexitec.RateEstimator import RateEstimator
+
+
+class TestRateEstimator(unittest.TestCase):
+    """Unit tests for the RateEstimator class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.estimator = RateEstimator(alpha=0.5)
+        self.estimator.update([0, 0], timestamp=10.0)
+
+    def test_init_rejects_invalid_alpha(self):
+        """Test constructor rejects EWMA weight outside (0, 1]."""
+        with pytest.raises(ValueError):
+            RateEstimator(alpha=0)
+        with pytest.raises(ValueError):
+            RateEstimator(alpha=1.5)
+
+    def test_first_snapshot_has_no_rate(self):
+        """Test first snapshot only records counts."""
+        assert self.estimator.rates == [0.0, 0.0]
+        assert self.estimator.time_remaining(100) is None
+
+    def test_update_weights_rates(self):
+        """Test first rate sample taken as is, later samples averaged."""
+        self.estimator.update([100, 200], timestamp=11.0)
+        assert self.estimator.rates == [100.0, 200.0]
+        self.estimator.update([300, 300], timestamp=12.0)
+        assert self.estimator.rates == [150.0, 150.0]
+        assert self.estimator.total_rate() == 300.0
+
+    def test_update_ignores_stale_snapshot(self):
+        """Test snapshot no newer than previous leaves rates alone."""
+        self.estimator.update([100, 100], timestamp=10.0)
+        assert self.estimator.rates == [0.0, 0.0]
+        assert self.estimator.counts == [0, 0]
+
+    def test_update_handles_counter_reset(self):
+        """Test node whose count goes backwards starts its rate afresh."""
+        self.estimator.update([100, 100], timestamp=11.0)
+        self.estimator.update([10, 200], timestamp=12.0)
+        assert self.estimator.rates == [0.0, 100.0]
+        assert self.estimator.samples == [0, 2]
+
+    def test_update_handles_node_count_change(self):
+        """Test change in number of nodes restarts estimation."""
+        self.estimator.update([100, 100, 100], timestamp=11.0)
+        assert self.estimator.rates == [0.0, 0.0, 0.0]
+        assert self.estimator.counts == [100, 100, 100]
+
+    def test_time_remaining(self):
+        """Test time remaining predicted from combined rate."""
+        self.estimator.update([100, 100], timestamp=11.0)
+        assert self.estimator.time_remaining(400) == 2.0
+        assert self.estimator.time_remaining(-5) == 0.0
+
+    def test_time_remaining_handles_stalled_nodes(self):
+        """Test no prediction while nodes stalled."""
+        self.estimator.update([0, 0], timestamp=11.0)
+        assert self.estimator.time_remaining(400) is None
+
+    def test_reset(self):
+        """Test reset forgets nodes."""
+        self.estimator.reset()
+        assert self.estimator.rates == []
+        assert self.estimator.counts == []
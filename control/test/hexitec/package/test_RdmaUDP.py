@@ -0,0 +1,214 @@
+"""
+Test Cases for the (test_ui) RdmaUDP in hexitec.test_ui.RdmaUDP.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import socket
+import struct
+
+from hexitec.test_ui.RdmaUDP import RdmaUDP, HexitecRdmaError
+
+UART_ADDRESS = 0x200
+UART_STATUS = UART_ADDRESS + 0x10
+UART_RX_CTRL = UART_ADDRESS + 0x14
+
+
+class FakeRdmaSocket():
+    """Emulate the camera's RDMA endpoint: registers, a UART RX FIFO, replies queued for recv."""
+
+    def __init__(self, rx_bytes=()):
+        """Initialise registers, RX FIFO holding rx_bytes."""
+        self.registers = {}
+        self.fifo = list(rx_bytes)
+        self.rx_d = 0
+        # Level reported by status register, if not FIFO's actual level
+        self.reported_level = None
+        self.replies = []
+        self.sent = []
+        self.timeout = 0.05
+        # Replies returned newest first; Replies to drop, hold back (for a number of sends), by address
+        self.reverse = False
+        self.drop = {}
+        self.hold = {}
+        self.held = []
+
+    def settimeout(self, timeout):
+        """Set timeout."""
+        self.timeout = timeout
+
+    def gettimeout(self):
+        """Get timeout."""
+        return self.timeout
+
+    def close(self):
+        """Nothing to close."""
+        pass
+
+    def read_register(self, address):
+        """Return register's value; UART status carries RX level, empty flag, last strobed byte."""
+        if address == UART_STATUS:
+            level = len(self.fifo) if self.reported_level is None else self.reported_level
+            return (self.rx_d << 16) | (level << 8) | (0 if self.fifo else 0x8)
+        return self.registers.get(address, 0)
+
+    def write_register(self, address, value):
+        """Write register; Strobing UART RX control latches next FIFO byte."""
+        if address == UART_RX_CTRL and (value & 0x2) and self.fifo:
+            self.rx_d = self.fifo.pop(0)
+        self.registers[address] = value
+
+    def sendto(self, packet, destination):
+        """Carry out command, queueing its reply."""
+        burst_len, cmd_no, op_code, address = struct.unpack_from("=HBBI", packet)
+        self.sent.append((op_code, address, cmd_no))
+        payload = []
+        if op_code == 0:
+            data = struct.unpack_from("=" + "I" * burst_len, packet, 8)
+            for index, value in enumerate(data):
+                self.write_register(address + 4 * index, value)
+        else:
+            payload = [self.read_register(address + 4 * index) for index in range(burst_len)]
+            payload += [0] * (burst_len % 2)
+        reply = struct.pack("=HBBI" + "I" * len(payload), burst_len, cmd_no, op_code, address, *payload)
+        for held in self.held:
+            held[0] -= 1
+        self.replies.extend(reply for (sends, reply) in self.held if sends <= 0)
+        self.held = [held for held in self.held if held[0] > 0]
+        if self.drop.get(address, 0):
+            self.drop[address] -= 1
+        elif address in self.hold:
+            self.held.append([self.hold.pop(address), reply])
+        else:
+            self.replies.append(reply)
+
+    def recv(self, size):
+        """Return oldest (or newest) reply."""
+        if not self.replies:
+            raise socket.timeout()
+        return self.replies.pop(-1 if self.reverse else 0)
+
+
+class TestRdmaUDP(unittest.TestCase):
+    """Unit tests for the RdmaUDP class."""
+
+    def setUp(self):
+        """Set up RdmaUDP talking to fake RDMA endpoint."""
+        self.rdma = RdmaUDP(local_ip="127.0.0.1", local_port=0, rdma_ip="127.0.0.1", rdma_port=9,
+                            UDPTimeout=0.05)
+        self.rdma.socket.close()
+        self.fake = FakeRdmaSocket()
+        self.rdma.socket = self.fake
+
+    def test_uart_rx_drains_reported_level(self):
+        """Test bulk receive takes level's bytes with a strobe, deassert and status read each."""
+        self.fake.fifo = [0x23, 0x90, 0x41, 0x42, 0x0D]
+        assert self.rdma.uart_rx(UART_ADDRESS, bulk=True) == [0x23, 0x90, 0x41, 0x42, 0x0D]
+        # Initial status read, then three transactions per byte
+        assert len(self.fake.sent) == 1 + 5 * 3
+        assert self.fake.fifo == []
+
+    def test_uart_rx_bulk_pipelines_transactions(self):
+        """Test bulk receive sends a level's transactions without awaiting each reply, matching replies by number."""
+        self.fake.fifo = [0x23, 0x90, 0x41, 0x42, 0x0D]
+        self.fake.reverse = True
+        assert self.rdma.uart_rx_bulk(UART_ADDRESS, window=15) == [0x23, 0x90, 0x41, 0x42, 0x0D]
+        assert [cmd_no for (_, _, cmd_no) in self.fake.sent[1:]] == list(range(1, 16))
+
+    def test_uart_rx_matches_legacy_sequence(self):
+        """Test bulk and (default, status polled after every byte) legacy receive return the same bytes."""
+        self.fake.fifo = [0x23, 0x90, 0x0D]
+        legacy = self.rdma.uart_rx(UART_ADDRESS)
+        legacy_transactions = len(self.fake.sent)
+        assert legacy_transactions == 1 + 3 * 7
+        self.fake.fifo = [0x23, 0x90, 0x0D]
+        self.fake.sent = []
+        assert self.rdma.uart_rx(UART_ADDRESS, bulk=True) == legacy
+        assert len(self.fake.sent) < legacy_transactions
+
+    def test_uart_rx_empty_fifo(self):
+        """Test empty RX FIFO costs a single status read."""
+        assert self.rdma.uart_rx(UART_ADDRESS, bulk=True) == []
+        assert self.fake.sent == [(1, UART_STATUS, 0)]
+
+    def test_uart_rx_level_reads_zero(self):
+        """Test bytes taken one at a time while level reads 0 but FIFO not empty."""
+        self.fake.fifo = [0x23, 0x0D]
+        self.fake.reported_level = 0
+        assert self.rdma.uart_rx(UART_ADDRESS, bulk=True) == [0x23, 0x0D]
+
+    def test_uart_rx_partial_read(self):
+        """Test FIFO emptying before reported level drained is flagged."""
+        self.fake.fifo = [0x23, 0x0D]
+        self.fake.reported_level = 4
+        with pytest.raises(HexitecRdmaError, match="uart_rx: Expected 4 byte\\(s\\), received 2"):
+            self.rdma.uart_rx(UART_ADDRESS, bulk=True)
+
+    def registers(self, number):
+        """Fill number registers (from 0x1000) with distinct values, returning their addresses."""
+        addresses = [0x1000 + 4 * index for index in range(number)]
+        for address in addresses:
+            self.fake.registers[address] = address * 3
+        return addresses
+
+    def test_read_many_out_of_order_replies(self):
+        """Test replies, returned newest first, matched to their reads."""
+        addresses = self.registers(40)
+        self.fake.reverse = True
+        assert self.rdma.read_many(addresses, window=8) == [(address * 3,) for address in addresses]
+        assert [cmd_no for (_, _, cmd_no) in self.fake.sent] == list(range(1, 41))
+        # Unique command numbers off; cmd_no (of single transactions) untouched
+        assert self.rdma.cmd_no == 0
+
+    def test_read_many_burst(self):
+        """Test (padded) burst reads return burst_len words."""
+        addresses = self.registers(3)
+        assert self.rdma.read_many([addresses[0]], burst_len=3) == [tuple(address * 3 for address in addresses)]
+
+    def test_transact_many_writes(self):
+        """Test writes carried out, acknowledged."""
+        assert self.rdma.transact_many([(0, 0x2000, 1, [5]), (0, 0x2004, 1, [6])], window=2) == [(), ()]
+        assert self.fake.registers == {0x2000: 5, 0x2004: 6}
+
+    def test_transact_many_resends_unanswered(self):
+        """Test read without reply resent under a new command number."""
+        addresses = self.registers(4)
+        self.fake.drop = {addresses[1]: 1}
+        assert self.rdma.read_many(addresses, retries=1) == [(address * 3,) for address in addresses]
+        assert [cmd_no for (_, address, cmd_no) in self.fake.sent if address == addresses[1]] == [2, 5]
+
+    def test_transact_many_expires_unanswered(self):
+        """Test read unanswered after its retries fails."""
+        addresses = self.registers(2)
+        self.fake.drop = {addresses[1]: 2}
+        with pytest.raises(socket.error, match="No reply to op_code: 1 address: 0x1004 after 2 attempt"):
+            self.rdma.read_many(addresses, retries=1)
+        assert self.fake.timeout == 0.05
+
+    def test_transact_many_discards_stale_reply(self):
+        """Test reply sharing a command number, but not the command's address, discarded."""
+        addresses = self.registers(2)
+        self.fake.replies.append(struct.pack("=HBBII", 1, 1, 1, 0x3000, 99))
+        assert self.rdma.read_many(addresses) == [(address * 3,) for address in addresses]
+
+    def test_transact_many_wraps_unique_cmd_no(self):
+        """Test unique command numbers roll over 255, skipping numbers still awaiting reply."""
+        addresses = self.registers(300)
+        self.rdma.unique_cmd_no = True
+        self.rdma.cmd_no = 250
+        self.fake.timeout = 1.0
+        # First read's reply held back until beyond its number coming round again
+        self.fake.hold = {addresses[0]: 280}
+        assert self.rdma.read_many(addresses, window=255) == [(address * 3,) for address in addresses]
+        cmd_nos = [cmd_no for (_, _, cmd_no) in self.fake.sent]
+        assert cmd_nos[:7] == [251, 252, 253, 254, 255, 0, 1]
+        # Number 251 (first read, outstanding) skipped once it came round again
+        assert cmd_nos[255:258] == [250, 252, 253]
+        assert self.rdma.cmd_no == cmd_nos[-1]
+
+    def test_transact_many_rejects_bad_window(self):
+        """Test window outside 1-255 rejected."""
+        with pytest.raises(HexitecRdmaError, match="window must be 1-255, not 256"):
+            self.rdma.read_many([0x1000], window=256)
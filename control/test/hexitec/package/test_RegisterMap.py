@@ -0,0 +1,80 @@
+"""
+Test Cases for the RegisterMap, Register in hexitec.RegisterMap.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+import hexitec.ALL_RDMA_REGISTERS as HEX_REGISTERS
+from hexitec.RegisterMap import RegisterMap, Register, Field, HEX_REGISTERS as REGISTER_MAP
+
+
+class TestRegisterMap(unittest.TestCase):
+    """Unit tests for the RegisterMap class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.register_map = RegisterMap(HEX_REGISTERS)
+
+    def test_registers_compiled_lazily_once(self):
+        """Test register compiled on first access, then reused."""
+        assert self.register_map.compiled == {}
+        register = self.register_map.HEXITEC_2X6_HEXITEC_CTRL
+        assert isinstance(register, Register)
+        assert list(self.register_map.compiled) == ["HEXITEC_2X6_HEXITEC_CTRL"]
+        assert self.register_map.get("HEXITEC_2X6_HEXITEC_CTRL") is register
+
+    def test_register_compatible_with_dictionary(self):
+        """Test register subscripted like the generated dictionary."""
+        register = self.register_map.HEXITEC_2X6_HEXITEC_CTRL
+        assert register.addr == HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr']
+        assert register['addr'] == HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr']
+        assert register['fields'] is HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['fields']
+
+    def test_get_field(self):
+        """Test field mask, shift precomputed."""
+        register = self.register_map.HEXITEC_2X6_HEXITEC_CTRL
+        field = register.get_field("HEXITEC_ACQ_FALSE_TRIGGER_DONE")
+        assert field == Field("HEXITEC_ACQ_FALSE_TRIGGER_DONE", 0x20000000, 29, 1)
+        with pytest.raises(KeyError, match="has no field 'BAD_FIELD'"):
+            register.get_field("BAD_FIELD")
+
+    def test_get_rejects_unknown_register(self):
+        """Test unknown (or non register) name rejected."""
+        with pytest.raises(AttributeError, match="Memory map has no register 'BAD_REGISTER'"):
+            self.register_map.BAD_REGISTER
+        with pytest.raises(AttributeError):
+            self.register_map.get("IC_OFFSETS")
+
+    def test_lookup(self):
+        """Test register looked up by dictionary, address or itself."""
+        register = self.register_map.HEXITEC_2X6_HEADER_STATUS
+        assert self.register_map.lookup(HEX_REGISTERS.HEXITEC_2X6_HEADER_STATUS) is register
+        assert self.register_map.lookup(register.addr) is register
+        assert self.register_map.lookup(register) is register
+        with pytest.raises(KeyError, match="Memory map has no register at 0x3"):
+            self.register_map.lookup(0x3)
+
+    def test_decode_encode(self):
+        """Test fields extracted from, and modified within, register value."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL
+        assert self.register_map.decode(register, "HEXITEC_ACQ_FALSE_TRIGGER_DONE", 0x20000000) == 1
+        assert self.register_map.decode(register, "HEXITEC_ACQ_FALSE_TRIGGER_DONE", 0x10000000) == 0
+        compiled = self.register_map.lookup(register)
+        assert compiled.encode(0x1, {"HEXITEC_ACQ_ABORT": 1, "HEXITEC_RST": 0}) == 0x10
+
+    def test_module_imported_on_first_use(self):
+        """Test memory map named, rather than given, imported only once a register looked up."""
+        register_map = RegisterMap("hexitec.ALL_RDMA_REGISTERS")
+        assert register_map.module is None
+        assert register_map.HEXITEC_2X6_HEXITEC_CTRL.addr == HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr']
+        assert register_map.module is HEX_REGISTERS
+
+    def test_existing_names_served(self):
+        """Test shared map serves registers, compiled, and other names as generated."""
+        assert REGISTER_MAP.HEXITEC_2X6_HEXITEC_CTRL is REGISTER_MAP.get("HEXITEC_2X6_HEXITEC_CTRL")
+        assert REGISTER_MAP.HEXITEC_2X6_HEXITEC_CTRL == HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL
+        assert REGISTER_MAP.HEXITEC_2X6_HEXITEC_CTRL != HEX_REGISTERS.HEXITEC_2X6_HEADER_STATUS
+        assert REGISTER_MAP.IC_OFFSETS is HEX_REGISTERS.IC_OFFSETS
@@ -0,0 +1,133 @@
+"""
+Test Cases for the RegisterShadow in hexitec.RegisterShadow.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+import hexitec.ALL_RDMA_REGISTERS as HEX_REGISTERS
+from hexitec.RegisterShadow import RegisterShadow
+
+from unittest.mock import Mock, patch
+
+
+class TestRegisterShadow(unittest.TestCase):
+    """Unit tests for the RegisterShadow class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.shadow = RegisterShadow(HEX_REGISTERS)
+        self.rdma = Mock()
+        self.rdma.udp_rdma_read.return_value = [0x1]
+
+    def test_init_rejects_invalid_mode(self):
+        """Test constructor rejects unknown mode."""
+        with pytest.raises(ValueError) as exc_info:
+            RegisterShadow(HEX_REGISTERS, mode="bad_mode")
+        error = "Invalid register shadow mode; Valid options: {}".format(RegisterShadow.MODES)
+        assert exc_info.value.args[0] == error
+
+    def test_init_classifies_registers(self):
+        """Test control registers cached, status, firmware driven and externally written registers not."""
+        assert self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL)
+        assert not self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL)
+        assert self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_FRAME_PRELOAD_LOWER)
+        assert self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_ACQ_NOF_FRAMES_LOWER)
+        assert not self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_HEADER_STATUS)
+        assert not self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_FRAME_NUMBER_LOWER)
+        assert not self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_VSR_MODE_CTRL)
+        assert not self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_UART_RX_CTRL)
+
+    def test_update_fields_reads_control_register_once(self):
+        """Test successive field updates read the register only the first time."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL
+        self.shadow.update_fields(self.rdma, register, {"FRAME_COUNTER_RST": 1})
+        self.rdma.udp_rdma_write.assert_called_with(register['addr'], 0x5, burst_len=1)
+        self.shadow.update_fields(self.rdma, register, {"FRAME_COUNTER_LOAD": 0})
+        self.rdma.udp_rdma_write.assert_called_with(register['addr'], 0x4, burst_len=1)
+        assert self.rdma.udp_rdma_read.call_count == 1
+        assert self.shadow.reads_avoided == 1
+
+    def test_update_fields_keeps_firmware_driven_field(self):
+        """Test firmware setting a status field between two field updates isn't overwritten by stale value."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL
+        trigger_done = 0x20000000
+        self.rdma.udp_rdma_read.return_value = [0x0]
+        self.shadow.update_fields(self.rdma, register, {"HEXITEC_ACQ_TRIGGER_INIT": 1})
+        self.rdma.udp_rdma_write.assert_called_with(register['addr'], 0x10000000, burst_len=1)
+        # Firmware sets HEXITEC_ACQ_FALSE_TRIGGER_DONE
+        self.rdma.udp_rdma_read.return_value = [0x10000000 | trigger_done]
+        self.shadow.update_fields(self.rdma, register, {"HEXITEC_ACQ_TRIGGER_INIT": 0})
+        self.rdma.udp_rdma_write.assert_called_with(register['addr'], trigger_done, burst_len=1)
+        assert self.rdma.udp_rdma_read.call_count == 2
+        assert self.shadow.reads_avoided == 0
+
+    def test_update_fields_combines_fields_into_single_write(self):
+        """Test several fields of one register updated by one write."""
+        register = HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL
+        value = self.shadow.update_fields(self.rdma, register, {"DATA_EN": 0, "TRAINING_EN": 1})
+        assert value == 0x10
+        self.rdma.udp_rdma_write.assert_called_once_with(register['addr'], 0x10, burst_len=1)
+
+    def test_update_fields_rejects_unknown_field(self):
+        """Test updating a field the register doesn't have fails."""
+        with pytest.raises(KeyError):
+            self.shadow.update_fields(self.rdma, HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL,
+                                      {"NO_SUCH_FIELD": 1})
+
+    def test_status_register_always_read(self):
+        """Test volatile register never served from cache."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_STATUS
+        self.shadow.read(self.rdma, register)
+        self.shadow.read(self.rdma, register)
+        assert self.rdma.udp_rdma_read.call_count == 2
+
+    def test_write_updates_cache(self):
+        """Test written value used by subsequent field update."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL
+        self.shadow.write(self.rdma, register, 0x0)
+        self.shadow.update_fields(self.rdma, register, {"FRAME_COUNTER_LOAD": 1})
+        self.rdma.udp_rdma_read.assert_not_called()
+        self.rdma.udp_rdma_write.assert_called_with(register['addr'], 0x1, burst_len=1)
+
+    def test_off_mode_always_reads(self):
+        """Test caching disabled in off mode."""
+        self.shadow.set_mode("off")
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL
+        self.shadow.write(self.rdma, register, 0x0)
+        self.shadow.update_fields(self.rdma, register, {"FRAME_COUNTER_LOAD": 1})
+        self.rdma.udp_rdma_read.assert_called_once()
+
+    def test_invalidate(self):
+        """Test invalidated register read from hardware again."""
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL
+        self.shadow.write(self.rdma, register, 0x0)
+        self.shadow.invalidate(register)
+        assert self.shadow.read(self.rdma, register) == 0x1
+        self.shadow.write(self.rdma, register, 0x0)
+        self.shadow.invalidate()
+        assert self.shadow.values == {}
+
+    def test_verify_mode_rereads_stale_value(self):
+        """Test verify mode re-reads value older than verify_interval, warns of mismatch."""
+        shadow = RegisterShadow(HEX_REGISTERS, mode="verify", verify_interval=10.0)
+        register = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL
+        with patch("time.time") as mock_time:
+            mock_time.return_value = 100
+            shadow.write(self.rdma, register, 0x0)
+            mock_time.return_value = 105
+            assert shadow.read(self.rdma, register) == 0x0
+            self.rdma.udp_rdma_read.assert_not_called()
+            mock_time.return_value = 110
+            with patch("logging.warning") as mock_log:
+                assert shadow.read(self.rdma, register) == 0x1
+                mock_log.assert_called_with("Register 0x100 read 0x1, expected 0x0")
+
+    def test_registers_classified_on_first_use(self):
+        """Test registers classified as used, without scanning the memory map."""
+        assert self.shadow.control_addresses == {}
+        assert self.shadow.is_cached(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL)
+        assert self.shadow.control_addresses == {HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL['addr']: True}
+        assert self.shadow.register_map.names is None
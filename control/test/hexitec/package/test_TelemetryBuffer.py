@@ -0,0 +1,61 @@
+"""
+Test Cases for the TelemetryBuffer in hexitec.TelemetryBuffer.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+from hexitec.TelemetryBuffer import TelemetryBuffer
+
+
+class TestTelemetryBuffer(unittest.TestCase):
+    """Unit tests for the TelemetryBuffer class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.buffer = TelemetryBuffer(channels=2, capacity=3)
+
+    def test_init_rejects_invalid_capacity(self):
+        """Test constructor rejects buffer without room for a sample."""
+        with pytest.raises(ValueError):
+            TelemetryBuffer(channels=2, capacity=0)
+
+    def test_append_overwrites_oldest_sample(self):
+        """Test buffer keeps most recent capacity samples, oldest first."""
+        for timestamp in range(5):
+            self.buffer.append([timestamp, -timestamp], timestamp=timestamp)
+        timestamps, values = self.buffer.get()
+        assert list(timestamps) == [2, 3, 4]
+        assert values.tolist() == [[2, -2], [3, -3], [4, -4]]
+        assert self.buffer.count == 3
+        assert self.buffer.latest() == [4.0, -4.0]
+
+    def test_get_time_range(self):
+        """Test samples selected by time range."""
+        for timestamp in range(3):
+            self.buffer.append([timestamp, timestamp], timestamp=timestamp)
+        timestamps, _ = self.buffer.get(start=1)
+        assert list(timestamps) == [1, 2]
+        timestamps, _ = self.buffer.get(start=0, end=1)
+        assert list(timestamps) == [0, 1]
+
+    def test_statistics_ignore_missing_values(self):
+        """Test min, max, mean per channel, skipping missing values."""
+        self.buffer.append([1.0, None], timestamp=1)
+        self.buffer.append([3.0, None], timestamp=2)
+        statistics = self.buffer.statistics()
+        assert statistics == {"min": [1.0, None], "max": [3.0, None], "mean": [2.0, None]}
+
+    def test_statistics_empty(self):
+        """Test statistics of empty buffer."""
+        assert self.buffer.latest() is None
+        assert self.buffer.statistics()["mean"] == [None, None]
+
+    def test_clear(self):
+        """Test clear discards all samples."""
+        self.buffer.append([1, 2], timestamp=1)
+        self.buffer.clear()
+        assert self.buffer.count == 0
+        assert len(self.buffer.get()[0]) == 0
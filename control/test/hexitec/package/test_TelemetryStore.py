@@ -0,0 +1,91 @@
+"""
+Test Cases for the TelemetryStore in hexitec.TelemetryStore.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import h5py
+import os
+import tempfile
+import threading
+
+from hexitec.TelemetryStore import TelemetryStore
+
+
+class TestTelemetryStore(unittest.TestCase):
+    """Unit tests for the TelemetryStore class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.store = TelemetryStore(["ambient", "rate"], tiers=[(1.0, 10), (10.0, 5)])
+
+    def test_append_averages_samples_into_buckets(self):
+        """Test samples within the same second averaged, missing columns ignored."""
+        self.store.append({"ambient": 20.0, "rate": 100}, timestamp=5.2)
+        self.store.append({"ambient": 22.0}, timestamp=5.7)
+        self.store.append({"ambient": 30.0, "unknown": 1}, timestamp=6.1)
+        resolution, timestamps, values = self.store.query()
+        assert resolution == 1.0
+        assert list(timestamps) == [5.0, 6.0]
+        assert values[0].tolist() == [21.0, 100.0]
+        assert values[1][0] == 30.0
+
+    def test_append_from_several_threads(self):
+        """Test samples appended concurrently (while queried) all counted."""
+        def append(value):
+            for index in range(2000):
+                self.store.append({"ambient": value}, timestamp=5.0 + index / 4000)
+        threads = [threading.Thread(target=append, args=(value,)) for value in (10.0, 20.0)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            self.store.query()
+        for thread in threads:
+            thread.join()
+        assert self.store.counts[0][0] == 4000
+        assert self.store.query()[2][0][0] == 15.0
+
+    def test_query_coarser_tier(self):
+        """Test coarser tier averages across its longer buckets."""
+        for timestamp in range(20):
+            self.store.append({"ambient": timestamp}, timestamp=timestamp)
+        resolution, timestamps, values = self.store.query(resolution=10.0)
+        assert resolution == 10.0
+        assert list(timestamps) == [0.0, 10.0]
+        assert values[:, 0].tolist() == [4.5, 14.5]
+
+    def test_query_selects_tier_covering_start(self):
+        """Test query falls back onto coarser tier once finest tier no longer reaches start."""
+        for timestamp in range(30):
+            self.store.append({"ambient": timestamp}, timestamp=timestamp)
+        assert self.store.query(start=25)[0] == 1.0
+        assert self.store.query(start=5)[0] == 10.0
+
+    def test_query_rejects_invalid_resolution(self):
+        """Test query fails for resolution without a tier."""
+        with pytest.raises(ValueError):
+            self.store.query(resolution=2.0)
+
+    def test_as_dict(self):
+        """Test dictionary keyed by column, None in place of missing values."""
+        self.store.append({"ambient": 20.0}, timestamp=1)
+        data = self.store.as_dict()
+        assert data == {"resolution": 1.0, "timestamps": [1.0],
+                        "values": {"ambient": [20.0], "rate": [None]}}
+
+    def test_write(self):
+        """Test time range written into HDF5 group."""
+        for timestamp in range(5):
+            self.store.append({"ambient": timestamp, "rate": 2 * timestamp}, timestamp=timestamp)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "telemetry.h5")
+            with h5py.File(filename, 'w') as hdf_file:
+                assert self.store.write(hdf_file, "telemetry", start=2, end=3) == 2
+            with h5py.File(filename, 'r') as hdf_file:
+                group = hdf_file["telemetry"]
+                assert group["timestamps"][()].tolist() == [2.0, 3.0]
+                assert group["values"][()].tolist() == [[2.0, 4.0], [3.0, 6.0]]
+                assert list(group.attrs["columns"]) == ["ambient", "rate"]
+                assert group.attrs["resolution"] == 1.0
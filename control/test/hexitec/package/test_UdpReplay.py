@@ -0,0 +1,164 @@
+"""
+Test Cases for the PacketSet, TokenBucket, UdpReplay and farm_replay in hexitec.UdpReplay.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import socket
+import time
+
+import numpy as np
+
+from unittest.mock import patch
+
+from hexitec.PcapStream import FrameAssembler, parse_header
+from hexitec.UdpReplay import PacketSet, TokenBucket, UdpReplay, UdpReplayError, load_sendmmsg, \
+    farm_replay, sender_frame_numbers
+
+
+class TestUdpReplay(unittest.TestCase):
+    """Unit tests for the PacketSet, TokenBucket and UdpReplay classes."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.frames = np.random.default_rng(0).integers(0, 4000, (3, 80, 80)).astype(np.uint16)
+        self.receivers = []
+
+    def tearDown(self):
+        """Close receiving sockets."""
+        for receiver in self.receivers:
+            receiver.close()
+
+    def receiver(self):
+        """Return (socket, (host, port)) of a local receiving socket."""
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(2)
+        self.receivers.append(receiver)
+        return receiver, receiver.getsockname()
+
+    def test_packet_set(self):
+        """Test packets' headers and data laid out as a FEM sends them."""
+        packet_set = PacketSet(self.frames, packet_size=4000)
+        assert packet_set.packets_per_frame == 4
+        assert [len(packet) for packet in packet_set.packets[:4]] == [4016, 4016, 4016, 816]
+        assert [parse_header(packet, True) for packet in packet_set.packets[4:8]] == \
+            [(1, 0, True, False), (1, 1, False, False), (1, 2, False, False), (1, 3, False, True)]
+        assembler = FrameAssembler(80, 80)
+        frames = [frame.copy() for _, frame in assembler.frames(packet_set.packets)]
+        np.testing.assert_array_equal(np.array(frames), self.frames)
+        # (8 byte) headers, padded to 64 bytes
+        packet_set = PacketSet(self.frames, packet_size=8000, extended_headers=False, header_size=64)
+        assert parse_header(packet_set.packets[3], False) == (1, 1, False, True)
+        assembler = FrameAssembler(80, 80, extended_headers=False, header_size=64)
+        assert len(list(assembler.frames(packet_set.packets))) == 3
+
+    def test_packet_set_renumber(self):
+        """Test frame renumbered in each of its packets' headers."""
+        for extended_headers in (True, False):
+            packet_set = PacketSet(self.frames, packet_size=4000, extended_headers=extended_headers)
+            packet_set.renumber(2, 7)
+            assert [parse_header(packet, extended_headers)[0] for packet in packet_set.packets[8:]] == [7] * 4
+
+    def test_packet_set_rejects_bad_settings(self):
+        """Test invalid header size, frames rejected."""
+        with pytest.raises(UdpReplayError, match="Header size must be a multiple of 8 bytes, of at least 16"):
+            PacketSet(self.frames, header_size=8)
+        with pytest.raises(UdpReplayError, match="Expected \\(frames, rows, columns\\) array"):
+            PacketSet(self.frames[0])
+
+    def test_token_bucket(self):
+        """Test consumption paced to rate, beyond initial burst."""
+        bucket = TokenBucket(rate=1000, burst=10)
+        start = time.perf_counter()
+        for _ in range(6):
+            bucket.consume(10)
+        assert time.perf_counter() - start >= 0.045
+
+    def replay(self, **kwargs):
+        """Replay 5 frames, to two receivers, returning packets each received."""
+        receivers = [self.receiver(), self.receiver()]
+        packet_set = PacketSet(self.frames, packet_size=4000)
+        replay = UdpReplay(packet_set, [address for _, address in receivers], batch_packets=3, **kwargs)
+        statistics = replay.run(5, first_frame=10)
+        replay.close()
+        assert statistics["frames"] == 5
+        assert statistics["packets"] == 20
+        assert statistics["bytes"] == 5 * packet_set.frame_bytes
+        assert "frames/s" in replay.report()
+        received = []
+        for receiver, _ in receivers:
+            packets = []
+            try:
+                while True:
+                    receiver.settimeout(0.2)
+                    packets.append(receiver.recv(65536))
+            except socket.timeout:
+                pass
+            received.append(packets)
+        return received
+
+    def check_received(self, received):
+        """Check frames sent round robin to receivers, cycling through, renumbering, packet set's frames."""
+        assert [[parse_header(packet, True)[0] for packet in packets][::4] for packets in received] == \
+            [[10, 12, 14], [11, 13]]
+        assembler = FrameAssembler(80, 80)
+        frames = [frame.copy() for _, frame in assembler.frames(received[1])]
+        np.testing.assert_array_equal(np.array(frames), self.frames[[1, 0]])
+
+    @pytest.mark.skipif(load_sendmmsg() is None, reason="sendmmsg not available")
+    def test_replay_with_sendmmsg(self):
+        """Test frames replayed in sendmmsg batches."""
+        self.check_received(self.replay())
+
+    def test_replay_with_sendmsg(self):
+        """Test frames replayed a sendmsg call per packet, paced."""
+        start = time.perf_counter()
+        self.check_received(self.replay(use_sendmmsg=False, frame_interval=0.01))
+        assert time.perf_counter() - start >= 0.03
+
+    def test_replay_rejects_bad_destination(self):
+        """Test unresolvable destination, no destination rejected."""
+        packet_set = PacketSet(self.frames)
+        with pytest.raises(UdpReplayError, match="Cannot send to"):
+            UdpReplay(packet_set, [("no.such.host.invalid", 61651)])
+        with pytest.raises(UdpReplayError, match="No destination specified"):
+            UdpReplay(packet_set, [])
+
+    def test_sender_frame_numbers(self):
+        """Test frames shared among senders by destination entry."""
+        assert sender_frame_numbers(7, [0, 2], 3).tolist() == [0, 2, 3, 5, 6]
+        assert sender_frame_numbers(7, [1], 3).tolist() == [1, 4]
+
+    def test_farm_replay(self):
+        """Test frames replayed from several processes, each destination entry receiving its frames."""
+        receivers = [self.receiver(), self.receiver()]
+        destinations = [receivers[0][1], receivers[1][1], receivers[0][1]]
+        statistics = farm_replay(self.frames, destinations, 7, processes=2, packet_size=4000, batch_packets=3)
+        assert statistics["frames"] == 7
+        assert statistics["packets"] == 28
+        assert [sender["frames"] for sender in statistics["senders"]] == [5, 2]
+        received = []
+        for receiver, _ in receivers:
+            frame_numbers = set()
+            try:
+                while True:
+                    receiver.settimeout(0.5)
+                    frame_numbers.add(parse_header(receiver.recv(65536), True)[0])
+            except socket.timeout:
+                pass
+            received.append(sorted(frame_numbers))
+        assert received == [[0, 2, 3, 5, 6], [1, 4]]
+        with pytest.raises(UdpReplayError, match="Sender failed: UdpReplayError: Cannot send to"):
+            farm_replay(self.frames, [("no.such.host.invalid", 61651)], 1)
+
+    def test_farm_replay_handles_sender_exiting_without_result(self):
+        """Test a sender exiting without a result fails the replay, rather than waiting on it forever."""
+        with patch("hexitec.UdpReplay._sender", side_effect=lambda *args: os._exit(3)), \
+                patch("hexitec.UdpReplay.RESULT_POLL_SECONDS", 0.1):
+            with pytest.raises(UdpReplayError, match=r"Sender 0 exited \(exit code 3\) without a result"):
+                farm_replay(self.frames, [self.receiver()[1]], 1)
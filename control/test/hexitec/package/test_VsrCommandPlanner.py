@@ -0,0 +1,97 @@
+"""
+Test Cases for the VsrCommandPlanner in hexitec.VsrCommandPlanner.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+
+from hexitec.VsrCommandPlanner import VsrCommandPlanner, VsrCommandPlannerError
+
+from unittest.mock import Mock, call
+
+
+class TestVsrCommandPlanner(unittest.TestCase):
+    """Unit tests for the VsrCommandPlanner class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.planner = VsrCommandPlanner()
+        self.broadcast = Mock()
+        self.vsr1 = Mock(addr=0x90)
+        self.vsr2 = Mock(addr=0x91)
+        self.commands = [("set_trigger_mode_number_frames", (8,)),
+                         ("write_trigger_mode_number_frames", ()),
+                         ("stop_trigger_sm", ())]
+
+    def test_plan_identical_commands_all_common(self):
+        """Test commands identical for every VSR all deemed common."""
+        common, remaining = self.planner.plan({self.vsr1: self.commands, self.vsr2: self.commands})
+        assert common == self.commands
+        assert remaining == {self.vsr1: [], self.vsr2: []}
+
+    def test_plan_keeps_order_after_first_difference(self):
+        """Test only leading shared commands deemed common."""
+        vsr2_commands = [self.commands[0], ("start_trigger_sm", ()), self.commands[2]]
+        common, remaining = self.planner.plan({self.vsr1: self.commands, self.vsr2: vsr2_commands})
+        assert common == self.commands[:1]
+        assert remaining[self.vsr1] == self.commands[1:]
+        assert remaining[self.vsr2] == vsr2_commands[1:]
+
+    def test_plan_single_vsr_not_broadcast(self):
+        """Test a single VSR receives its commands individually."""
+        common, remaining = self.planner.plan({self.vsr1: self.commands})
+        assert common == []
+        assert remaining == {self.vsr1: self.commands}
+
+    def test_execute_broadcasts_common_commands(self):
+        """Test common commands sent once by broadcast, setters staged on every module."""
+        verify = Mock()
+        self.planner.execute(self.broadcast, {self.vsr1: self.commands, self.vsr2: self.commands},
+                             verify=verify)
+        self.broadcast.assert_has_calls([call.set_trigger_mode_number_frames(8),
+                                         call.write_trigger_mode_number_frames(),
+                                         call.stop_trigger_sm()])
+        for vsr in (self.vsr1, self.vsr2):
+            vsr.set_trigger_mode_number_frames.assert_called_with(8)
+            vsr.write_trigger_mode_number_frames.assert_not_called()
+            vsr.stop_trigger_sm.assert_not_called()
+        verify.assert_has_calls([call(self.vsr1), call(self.vsr2)])
+        assert self.planner.commands_sent == 2
+        assert self.planner.commands_saved == 2
+
+    def test_execute_sends_differing_commands_individually(self):
+        """Test commands differing between VSRs sent to each VSR."""
+        vsr2_commands = [("stop_trigger_sm", ())]
+        self.planner.execute(self.broadcast, {self.vsr1: self.commands, self.vsr2: vsr2_commands})
+        self.broadcast.assert_not_called()
+        self.vsr1.write_trigger_mode_number_frames.assert_called()
+        self.vsr2.stop_trigger_sm.assert_called()
+        self.vsr2.write_trigger_mode_number_frames.assert_not_called()
+        assert self.planner.commands_sent == 3
+
+    def test_plan_never_broadcasts_reads(self):
+        """Test commands expecting a reply sent to each VSR, even if identical."""
+        commands = [("stop_trigger_sm", ()), ("read_pll_status", ()), ("start_trigger_sm", ())]
+        common, remaining = self.planner.plan({self.vsr1: commands, self.vsr2: commands})
+        assert common == commands[:1]
+        assert remaining == {self.vsr1: commands[1:], self.vsr2: commands[1:]}
+
+    def test_execute_resends_to_vsr_failing_verify(self):
+        """Test VSR failing verification sent broadcast commands individually."""
+        verify = Mock(side_effect=[True, False, True])
+        self.planner.execute(self.broadcast, {self.vsr1: self.commands, self.vsr2: self.commands},
+                             verify=verify)
+        self.vsr1.stop_trigger_sm.assert_not_called()
+        self.vsr2.write_trigger_mode_number_frames.assert_called_once()
+        self.vsr2.stop_trigger_sm.assert_called_once()
+        verify.assert_has_calls([call(self.vsr1), call(self.vsr2), call(self.vsr2)])
+        assert self.planner.commands_sent == 4
+
+    def test_execute_fails_vsr_not_applying_commands(self):
+        """Test VSR failing verification after commands resent rejected."""
+        verify = Mock(side_effect=lambda vsr: vsr is self.vsr1)
+        with pytest.raises(VsrCommandPlannerError, match="VSR 0x91 did not apply command.*stop_trigger_sm"):
+            self.planner.execute(self.broadcast, {self.vsr1: self.commands, self.vsr2: self.commands},
+                                 verify=verify)
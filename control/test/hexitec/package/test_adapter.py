@@ -307,6 +307,29 @@ class TestDetector(unittest.TestCase):
                 config=defaults.fem
             )
 
+    def test_detector_init_metadata_mode(self):
+        """Test meta data layout defaults to legacy, compact opted into through options."""
+        with patch("hexitec.adapter.HexitecFem"), patch("hexitec.adapter.HexitecDAQ"):
+            detector = Hexitec({})
+            detector.daq._set_metadata_mode.assert_called_with("legacy")
+            detector = Hexitec({"metadata_mode": "compact"})
+            detector.daq._set_metadata_mode.assert_called_with("compact")
+            detector.daq._set_metadata_mode.side_effect = ParameterTreeError("Invalid metadata mode")
+            with patch("logging.error") as mock_log:
+                Hexitec({"metadata_mode": "bad_mode"})
+                mock_log.assert_any_call("Ignoring metadata_mode option: %s", detector.daq._set_metadata_mode.side_effect)
+
+    def test_detector_init_accounting_settle_time(self):
+        """Test frame accounting settle time set through options, if given."""
+        with patch("hexitec.adapter.HexitecFem"), patch("hexitec.adapter.HexitecDAQ"):
+            detector = Hexitec({})
+            detector.daq._set_accounting_settle_time.assert_not_called()
+            detector = Hexitec({"accounting_settle_time": "0.5"})
+            detector.daq._set_accounting_settle_time.assert_called_with(0.5)
+            with patch("logging.error") as mock_log:
+                Hexitec({"accounting_settle_time": "soon"})
+                assert mock_log.call_args_list[0][0][0] == "Ignoring accounting_settle_time option: %s"
+
     def test_start_polling(self):
         """Test start polling works."""
         with patch("hexitec.adapter.IOLoop") as mock_loop:
@@ -892,6 +915,46 @@ class TestDetector(unittest.TestCase):
             self.test_adapter.detector.set_elog("different message")
         assert exc_info.value.args[0] == error
 
+    def test_get_telemetry_data_defaults_to_recent_span(self):
+        """Test telemetry returned for span preceding now, unless time range set."""
+        detector = self.test_adapter.detector
+        detector.telemetry.append({"fem_health": 0.0}, timestamp=1000.0)
+        detector.telemetry.append({"fem_health": 1.0}, timestamp=1500.0)
+        with patch("time.time") as mock_time:
+            mock_time.return_value = 1550.0
+            detector.set_telemetry_span(100)
+            assert detector.get_telemetry_data()["values"]["fem_health"] == [1.0]
+        detector.set_telemetry_start(900)
+        detector.set_telemetry_end(1100)
+        assert detector.get_telemetry_data()["timestamps"] == [1000.0]
+
+    def test_telemetry_data_fetched_on_request(self):
+        """Test telemetry only gathered when fetched, not by every GET of the tree."""
+        detector = self.test_adapter.detector
+        detector.telemetry.append({"fem_health": 1.0}, timestamp=1000.0)
+        detector.set_telemetry_start(900)
+        detector.set_telemetry_end(1100)
+        with patch.object(detector.telemetry, "as_dict", wraps=detector.telemetry.as_dict) as as_dict:
+            assert detector.param_tree.get("")["detector"]["telemetry"]["data"] == {}
+            as_dict.assert_not_called()
+            detector.param_tree.set("detector/telemetry/fetch", True)
+            as_dict.assert_called_once_with(900, 1100, None)
+        assert detector.param_tree.get("detector/telemetry/data")["data"]["timestamps"] == [1000.0]
+
+    def test_set_telemetry_range_rejects_invalid_values(self):
+        """Test telemetry time range and resolution validated."""
+        detector = self.test_adapter.detector
+        with pytest.raises(ParameterTreeError, match="Telemetry start cannot be negative"):
+            detector.set_telemetry_start(-1)
+        with pytest.raises(ParameterTreeError, match="Telemetry end cannot be negative"):
+            detector.set_telemetry_end(-1)
+        with pytest.raises(ParameterTreeError, match="Telemetry span must be positive"):
+            detector.set_telemetry_span(0)
+        with pytest.raises(ParameterTreeError, match="Invalid telemetry resolution"):
+            detector.set_telemetry_resolution(5)
+        detector.set_telemetry_resolution(60.0)
+        assert detector.telemetry_resolution == 60.0
+
     def test_set_number_odin_instances(self):
         """Test function sets number of Odin instances."""
         number_odin_instances = 3
@@ -1121,6 +1184,7 @@ class TestDetector(unittest.TestCase):
         self.test_adapter.detector.fem.cancel_acquisition = False
         self.test_adapter.detector.stop_acquisition()
         assert self.test_adapter.detector.fem.cancel_acquisition is True
+        self.test_adapter.detector.daq.discard_staged_metadata.assert_called()
 
     def test_collect_offsets(self):
         """Test function initiates collect offsets."""
@@ -11,7 +11,9 @@ import os
 
 from odin.adapters.parameter_tree import ParameterTreeError
 from hexitec.HexitecFem import HexitecFem, HexitecFemError
+from hexitec.HexitecConfig import HexitecConfig
 from hexitec.adapter import HexitecAdapter
+from hexitec.VsrCommandPlanner import VsrCommandPlannerError
 
 from socket import error as socket_error
 from datetime import datetime
@@ -19,7 +21,7 @@ from datetime import timezone
 import socket
 
 from unittest.mock import Mock, call, patch, mock_open, MagicMock
-import hexitec.ALL_RDMA_REGISTERS as HEX_REGISTERS
+from hexitec.RegisterMap import HEX_REGISTERS
 
 
 # Custom decorator to support testing of asynchronous functions
@@ -335,6 +337,59 @@ class TestFem(unittest.TestCase):
             assert self.test_fem.fem._get_status_error() == error
         assert self.test_fem.fem.parent.software_state == "Error"
 
+    @async_test
+    async def test_sample_telemetry(self):
+        """Test sample_telemetry records every VSR's sensors without flagging hardware busy."""
+        self.test_fem.fem.vsr_list = [Mock(), Mock()]
+        self.test_fem.fem.parent.software_state = "Ready"
+        self.test_fem.fem.parent.daq.in_progress = False
+        self.test_fem.fem.read_temperatures_humidity_values = Mock()
+        self.test_fem.fem.read_pwr_voltages = Mock()
+        self.test_fem.fem.ambient_list = [20.5, 21.5, 0, 0, 0, 0]
+        self.test_fem.fem.telemetry_in_progress = True
+        await self.test_fem.fem.sample_telemetry()
+        assert self.test_fem.fem.read_temperatures_humidity_values.call_count == 2
+        assert self.test_fem.fem.telemetry["ambient"].latest()[:2] == [20.5, 21.5]
+        assert self.test_fem.fem.telemetry_in_progress is False
+        assert self.test_fem.fem.hardware_busy is False
+
+    @async_test
+    async def test_sample_telemetry_yields_to_acquisition(self):
+        """Test sample_telemetry abandons sample once acquisition underway."""
+        self.test_fem.fem.vsr_list = [Mock()]
+        self.test_fem.fem.parent.daq.in_progress = True
+        self.test_fem.fem.read_temperatures_humidity_values = Mock()
+        await self.test_fem.fem.sample_telemetry()
+        self.test_fem.fem.read_temperatures_humidity_values.assert_not_called()
+        assert self.test_fem.fem.telemetry["ambient"].count == 0
+
+    def test_telemetry_tick_skips_sample_while_busy(self):
+        """Test telemetry_tick reschedules, without sampling, while hardware busy."""
+        self.test_fem.fem.hardware_connected = True
+        self.test_fem.fem.hardware_busy = True
+        self.test_fem.fem.sample_telemetry = Mock()
+        with patch("hexitec.HexitecFem.IOLoop") as mock_loop:
+            self.test_fem.fem.telemetry_tick()
+            self.test_fem.fem.sample_telemetry.assert_not_called()
+            mock_loop.instance().call_later.assert_called_with(10.0, self.test_fem.fem.telemetry_tick)
+
+    def test_telemetry_tick_samples_when_idle(self):
+        """Test telemetry_tick samples while system idle."""
+        self.test_fem.fem.hardware_connected = True
+        self.test_fem.fem.hardware_busy = False
+        self.test_fem.fem.parent.daq.in_progress = False
+        self.test_fem.fem.parent.software_state = "Idle"
+        self.test_fem.fem.sample_telemetry = Mock()
+        with patch("hexitec.HexitecFem.IOLoop"):
+            self.test_fem.fem.telemetry_tick()
+            self.test_fem.fem.sample_telemetry.assert_called()
+
+    def test_set_telemetry_interval_rejects_negative_interval(self):
+        """Test set_telemetry_interval fails negative interval."""
+        with pytest.raises(ParameterTreeError) as exc_info:
+            self.test_fem.fem.set_telemetry_interval(-1)
+        assert exc_info.value.args[0] == "Telemetry interval cannot be negative"
+
     @patch('hexitec_vsr.VsrModule')
     def test_disconnect(self, mocked_vsr_module):
         """Test function working okay."""
@@ -968,7 +1023,7 @@ class TestFem(unittest.TestCase):
         with patch("hexitec.HexitecFem.IOLoop") as mock_loop:
             self.test_fem.fem.acquire_data_await_dummy_trigger_processed()
             i = mock_loop.instance()
-            i.call_later.assert_called_with(0.1, self.test_fem.fem.acquire_data_await_dummy_trigger_processed)
+            i.call_later.assert_called_with(0.02, self.test_fem.fem.acquire_data_await_dummy_trigger_processed)
 
     def test_acquire_data_ready(self):
         """Test function handles normal configuration."""
@@ -976,7 +1031,7 @@ class TestFem(unittest.TestCase):
         with patch("hexitec.HexitecFem.IOLoop") as mock_loop:
             self.test_fem.fem.acquire_data_ready()
             i = mock_loop.instance()
-            i.call_later.assert_called_with(0.1, self.test_fem.fem.check_acquire_finished)
+            i.call_later.assert_called_with(0.01, self.test_fem.fem.check_acquire_finished)
             self.test_fem.fem.data_en.assert_has_calls([call(enable=False)])
             self.assertEqual(self.test_fem.fem.data_en.call_count, 1)
             assert self.test_fem.fem.parent.software_state == "Acquiring"
@@ -1023,6 +1078,17 @@ class TestFem(unittest.TestCase):
             i = mock_loop.instance()
             i.call_later.assert_called_with(0.1, self.test_fem.fem.check_acquire_finished)
 
+    def test_check_acquire_finished_polls_faster_near_completion(self):
+        """Test check_acquire_finished tightens poll interval as transmission nears its end."""
+        self.test_fem.fem.cancel_acquisition = False
+        self.test_fem.fem.x10g_rdma.udp_rdma_read = Mock()
+        self.test_fem.fem.x10g_rdma.udp_rdma_read.return_value = [0]
+        self.test_fem.fem.parent.daq.calculate_remaining_collection_time = Mock(return_value=0.03)
+        with patch("hexitec.HexitecFem.IOLoop") as mock_loop:
+            self.test_fem.fem.check_acquire_finished()
+            i = mock_loop.instance()
+            i.call_later.assert_called_with(0.015, self.test_fem.fem.check_acquire_finished)
+
     def test_check_acquire_finished_handles_HexitecFemError(self):
         """Test check_acquire_finished handles HexitecFemError exception."""
         self.test_fem.fem.cancel_acquisition = True
@@ -1292,6 +1358,169 @@ class TestFem(unittest.TestCase):
                 await self.test_fem.fem.initialise_system()
                 mock_log.assert_called()
 
+    def test_send_to_all_vsrs_broadcasts_without_verifying(self):
+        """Test broadcast commands sent once, no VSR read back unless verify_broadcasts set."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        self.test_fem.fem.vsr_list = [vsr1, vsr2]
+        self.test_fem.fem.broadcast_VSRs = Mock()
+        self.test_fem.fem.send_to_all_vsrs([("stop_trigger_sm", ()), ("_disable_training", ())])
+        self.test_fem.fem.broadcast_VSRs.stop_trigger_sm.assert_called_once()
+        self.test_fem.fem.broadcast_VSRs._disable_training.assert_called_once()
+        for vsr in [vsr1, vsr2]:
+            vsr.stop_trigger_sm.assert_not_called()
+            vsr.read_pll_status.assert_not_called()
+
+    def test_send_to_all_vsrs_verifies_each_vsr(self):
+        """Test broadcast commands verified per VSR if enabled, failing if a VSR does not apply them."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        vsr2.read_pll_status.side_effect = socket_error("UART timed out")
+        self.test_fem.fem.vsr_list = [vsr1, vsr2]
+        self.test_fem.fem.broadcast_VSRs = Mock()
+        self.test_fem.fem.verify_broadcasts = True
+        with pytest.raises(VsrCommandPlannerError, match="VSR 0x91 did not apply command"):
+            self.test_fem.fem.send_to_all_vsrs([("stop_trigger_sm", ())])
+        self.test_fem.fem.broadcast_VSRs.stop_trigger_sm.assert_called_once()
+        vsr1.stop_trigger_sm.assert_not_called()
+        vsr2.stop_trigger_sm.assert_called_once()
+        assert vsr2.read_pll_status.call_count == 2
+
+    def test_plan_reconfiguration_requires_full_initialisation(self):
+        """Test full initialisation planned until settings applied, or once timing changes."""
+        assert self.test_fem.fem.plan_reconfiguration() is None
+        self.test_fem.fem.set_hexitec_config("hexitec_test_config.ini")
+        self.test_fem.fem.applied_state = self.test_fem.fem.get_configuration_state()
+        self.test_fem.fem.row_s1 += 1
+        assert self.test_fem.fem.plan_reconfiguration() is None
+
+    def test_plan_reconfiguration_dac_and_triggering_changes(self):
+        """Test DAC change reinitialises every VSR, triggering change reconfigures triggering."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        self.test_fem.fem.vsr_list = [vsr1, vsr2]
+        self.test_fem.fem.set_hexitec_config("hexitec_test_config.ini")
+        self.test_fem.fem.applied_state = self.test_fem.fem.get_configuration_state()
+        assert self.test_fem.fem.plan_reconfiguration() == \
+            {"vsrs": [], "dac": False, "enables": [], "triggering": False}
+        self.test_fem.fem.umid_value += 1
+        self.test_fem.fem.enable_trigger_input = not self.test_fem.fem.enable_trigger_input
+        assert self.test_fem.fem.plan_reconfiguration() == \
+            {"vsrs": [vsr1, vsr2], "dac": True, "enables": [], "triggering": True}
+
+    def test_plan_reconfiguration_changed_enables(self):
+        """Test only VSRs whose enables changed are reinitialised."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        self.test_fem.fem.vsr_list = [vsr1, vsr2]
+        self.test_fem.fem.set_hexitec_config("hexitec_test_config.ini")
+        self.test_fem.fem.applied_state = self.test_fem.fem.get_configuration_state()
+        parameters = dict(self.test_fem.fem.hexitec_parameters)
+        parameters['Sensor-Config_V2_S1/ColumnCal1stChannel'] = '00000000000000000000'
+        self.test_fem.fem.hexitec_config_model = HexitecConfig(parameters)
+        assert self.test_fem.fem.plan_reconfiguration() == \
+            {"vsrs": [vsr2], "dac": False, "enables": [vsr2], "triggering": False}
+
+    def mock_reconfiguration(self):
+        """Mock two VSRs, all locked, and the FEM accesses reconfiguring them makes."""
+        vsr1, vsr2 = Mock(addr=0x90, slot=1), Mock(addr=0x91, slot=2)
+        self.test_fem.fem.vsr_list = [vsr1, vsr2]
+        self.test_fem.fem.umid_value = 1.5
+        self.test_fem.fem.vcal_value = 0.5
+        self.test_fem.fem.await_dc_capture_ready = Mock()
+        self.test_fem.fem.send_to_all_vsrs = Mock()
+        self.test_fem.fem.configure_hardware_triggering = Mock()
+        self.test_fem.fem.register_shadow = Mock()
+        self.test_fem.fem.x10g_rdma.udp_rdma_read = Mock(return_value=[0xFF] * 6)
+        self.test_fem.fem.x10g_rdma.udp_rdma_write = Mock()
+        return vsr1, vsr2
+
+    @async_test
+    async def test_reconfigure_system_dac_change(self):
+        """Test DAC change (i.e. Uref_mid) stages DAC values alone, then initialises, captures, trains."""
+        vsr1, vsr2 = self.mock_reconfiguration()
+        with patch("time.sleep"):
+            await self.test_fem.fem.reconfigure_system(
+                {"vsrs": [vsr1, vsr2], "dac": True, "enables": [], "triggering": False})
+        for vsr in (vsr1, vsr2):
+            assert vsr.method_calls == [call.set_dac_umid(1.5), call.set_dac_vcal(0.5), call.initialise()]
+        self.test_fem.fem.await_dc_capture_ready.assert_called_once()
+        assert self.test_fem.fem.await_dc_capture_ready.call_args[0][0] == [vsr1, vsr2]
+        data_ctrl = HEX_REGISTERS.HEXITEC_2X6_VSR_DATA_CTRL
+        self.test_fem.fem.register_shadow.write.assert_has_calls([
+            call(self.test_fem.fem.x10g_rdma, data_ctrl, 0x10),
+            call(self.test_fem.fem.x10g_rdma, data_ctrl, 0x00)])
+        self.test_fem.fem.send_to_all_vsrs.assert_has_calls([call([("stop_trigger_sm", ())]),
+                                                             call([("_disable_training", ())])])
+        self.test_fem.fem.configure_hardware_triggering.assert_called_once()
+        assert self.test_fem.fem.parent.software_state == "Ready"
+        assert self.test_fem.fem.system_initialised is True
+        assert self.test_fem.fem.applied_state is not None
+        assert self.test_fem.fem.hardware_busy is False
+
+    @async_test
+    async def test_reconfigure_system_enables_change(self):
+        """Test enables change stages the changed VSR's enables alone."""
+        vsr1, vsr2 = self.mock_reconfiguration()
+        self.test_fem.fem.load_pwr_cal_read_enables = Mock()
+        with patch("time.sleep"):
+            await self.test_fem.fem.reconfigure_system(
+                {"vsrs": [vsr2], "dac": False, "enables": [vsr2], "triggering": False})
+        self.test_fem.fem.load_pwr_cal_read_enables.assert_called_once_with(vsr2)
+        assert vsr1.method_calls == []
+        assert vsr2.method_calls == [call.initialise()]
+        assert self.test_fem.fem.await_dc_capture_ready.call_args[0][0] == [vsr2]
+
+    @async_test
+    async def test_reconfigure_system_triggering_change(self):
+        """Test triggering change reconfigures triggering, without DC capture or training."""
+        vsr1, vsr2 = self.mock_reconfiguration()
+        await self.test_fem.fem.reconfigure_system({"vsrs": [], "dac": False, "enables": [], "triggering": True})
+        assert vsr1.method_calls == vsr2.method_calls == []
+        self.test_fem.fem.await_dc_capture_ready.assert_not_called()
+        self.test_fem.fem.register_shadow.write.assert_not_called()
+        self.test_fem.fem.configure_hardware_triggering.assert_called_once()
+
+    @async_test
+    async def test_reconfigure_system_flags_lost_lock(self):
+        """Test reconfiguration fails, requiring full initialisation, if VSR loses lock."""
+        vsr1, vsr2 = self.mock_reconfiguration()
+        self.test_fem.fem.x10g_rdma.udp_rdma_read = Mock(return_value=[0x0F] * 6)
+        with patch("time.sleep"):
+            await self.test_fem.fem.reconfigure_system(
+                {"vsrs": [vsr1, vsr2], "dac": True, "enables": [], "triggering": False})
+        assert self.test_fem.fem.status_error == "Failed to reconfigure camera: VSR(s) lost lock, initialise in full"
+        assert self.test_fem.fem.applied_state is None
+
+    def test_initialise_hardware_reconfigures_incrementally(self):
+        """Test initialise_hardware skips data lanes, full initialisation when settings allow."""
+        self.test_fem.fem.hardware_connected = True
+        self.test_fem.fem.hardware_busy = False
+        self.test_fem.fem.plan_reconfiguration = Mock(return_value={"vsrs": [], "triggering": True})
+        self.test_fem.fem.reconfigure_system = Mock()
+        self.test_fem.fem.setup_data_lane_1 = Mock()
+        self.test_fem.fem.initialise_hardware()
+        self.test_fem.fem.reconfigure_system.assert_called_with({"vsrs": [], "triggering": True})
+        self.test_fem.fem.setup_data_lane_1.assert_not_called()
+
+    def test_await_dc_capture_ready_polls_all_vsrs_together(self):
+        """Test all VSRs' DC captures awaited concurrently, not one after another."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        vsr1.read_pll_status.side_effect = [6, 7]
+        vsr2.read_pll_status.side_effect = [6, 6, 7]
+        with patch("time.sleep") as mock_sleep:
+            self.test_fem.fem.await_dc_capture_ready([vsr1, vsr2], timeout=10)
+            assert mock_sleep.call_count == 2
+        assert vsr1.read_pll_status.call_count == 2
+        assert vsr2.read_pll_status.call_count == 3
+
+    def test_await_dc_capture_ready_times_out(self):
+        """Test function names a VSR that never becomes ready."""
+        vsr1, vsr2 = Mock(addr=0x90), Mock(addr=0x91)
+        vsr1.read_pll_status.return_value = 7
+        vsr2.read_pll_status.return_value = 6
+        with patch("time.sleep"), patch("time.time") as mock_time:
+            mock_time.side_effect = [0, 3]
+            with pytest.raises(HexitecFemError) as exc_info, patch("logging.error"):
+                self.test_fem.fem.await_dc_capture_ready([vsr1, vsr2], timeout=2)
+        assert exc_info.value.args[0] == "VSR2 Timed out awaiting DC Capture Ready"
+
     @patch('hexitec_vsr.VsrModule')
     @async_test
     async def test_initialise_system_flags_unsynced_vsr(self, mocked_vsr_module):
@@ -1452,6 +1681,25 @@ class TestFem(unittest.TestCase):
         self.test_fem.fem.vsr_list[0].disable_trigger_input_two_and_three.assert_called()
         self.test_fem.fem.vsr_list[0].stop_trigger_sm.assert_called()
 
+    def test_configure_hardware_triggering_broadcasts_to_multiple_vsrs(self):
+        """Test identical triggering configuration sent once, via broadcast module."""
+        self.test_fem.fem.vsr_list = [Mock(), Mock()]
+        self.test_fem.fem.broadcast_VSRs = Mock()
+        self.test_fem.fem.triggering_frames = 8
+        self.test_fem.fem.enable_trigger_mode = True
+        self.test_fem.fem.enable_trigger_input = False
+        self.test_fem.fem.start_trigger = True
+
+        self.test_fem.fem.configure_hardware_triggering()
+        broadcast = self.test_fem.fem.broadcast_VSRs
+        broadcast.write_trigger_mode_number_frames.assert_called_once()
+        broadcast.enable_trigger_mode_trigger_two_and_three.assert_called_once()
+        broadcast.disable_trigger_input_two_and_three.assert_called_once()
+        broadcast.start_trigger_sm.assert_called_once()
+        for vsr in self.test_fem.fem.vsr_list:
+            vsr.set_trigger_mode_number_frames.assert_called_with(8)
+            vsr.start_trigger_sm.assert_not_called()
+
     @patch('hexitec_vsr.VsrModule')
     def test_configure_hardware_triggering_handles_Exception(self, mocked_vsr_module):
         """Test function working okay."""
@@ -1562,6 +1810,18 @@ class TestFem(unittest.TestCase):
         self.test_fem.fem.set_hexitec_config(filename)
         assert self.test_fem.fem.status_error == error
 
+    def test_set_hexitec_config_compiles_file_once(self):
+        """Test unchanged file not parsed again, enables taken from compiled configuration."""
+        filename = "hexitec_test_config.ini"
+        self.test_fem.fem.set_hexitec_config(filename)
+        config = self.test_fem.fem.hexitec_config_model
+        self.test_fem.fem.set_hexitec_config(filename)
+        assert self.test_fem.fem.hexitec_config_model is config
+        assert self.test_fem.fem.config_cache.misses == 1
+        enables = self.test_fem.fem._extract_80_bits("ColumnCal", 1, 1, "Channel")
+        assert enables == config.get_enables("ColumnCal", 1, 1, "Channel")
+        assert enables[0] > -1
+
     def test_set_start_trigger(self):
         """Test function sets start trigger ok."""
         self.test_fem.fem.start_trigger = False
@@ -1928,6 +2188,27 @@ class TestFem(unittest.TestCase):
         # Omit last 9 characters as microseconds differ (timezone info form final 6 characters)
         assert timestamp[:-9] == ts[:-9]
 
+    def test_set_bit_reset_bit_read_control_register_once(self):
+        """Test successive bit updates to a control register read it only once."""
+        self.test_fem.fem.x10g_rdma.udp_rdma_read = Mock(return_value=[0x1])
+        self.test_fem.fem.x10g_rdma.udp_rdma_write = Mock()
+        address = HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL['addr']
+        self.test_fem.fem.set_bit(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL, "FRAME_COUNTER_RST")
+        self.test_fem.fem.reset_bit(HEX_REGISTERS.HEXITEC_2X6_HEADER_CTRL, "FRAME_COUNTER_RST")
+        self.test_fem.fem.x10g_rdma.udp_rdma_read.assert_called_once()
+        self.test_fem.fem.x10g_rdma.udp_rdma_write.assert_has_calls([
+            call(address, 0x5, burst_len=1), call(address, 0x1, burst_len=1)])
+
+    def test_set_bit_reset_bit_read_hexitec_ctrl_each_time(self):
+        """Test bit updates to HEXITEC_CTRL keep the firmware's HEXITEC_ACQ_FALSE_TRIGGER_DONE."""
+        self.test_fem.fem.x10g_rdma.udp_rdma_read = Mock(side_effect=[[0x0], [0x30000000]])
+        self.test_fem.fem.x10g_rdma.udp_rdma_write = Mock()
+        address = HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL['addr']
+        self.test_fem.fem.set_bit(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, "HEXITEC_ACQ_TRIGGER_INIT")
+        self.test_fem.fem.reset_bit(HEX_REGISTERS.HEXITEC_2X6_HEXITEC_CTRL, "HEXITEC_ACQ_TRIGGER_INIT")
+        self.test_fem.fem.x10g_rdma.udp_rdma_write.assert_has_calls([
+            call(address, 0x10000000, burst_len=1), call(address, 0x20000000, burst_len=1)])
+
 
 class TestHexitecFem(unittest.TestCase):
 
@@ -0,0 +1,285 @@
+"""
+Test Cases for the HexitecOffline class, and charge sharing functions, in hexitec.offline.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import tempfile
+
+import h5py
+import numpy as np
+
+from hexitec.offline import HexitecOffline, HexitecOfflineError, read_coefficients, \
+    process_addition, process_discrimination, plan_shards, process_shards, pad_frames, shared_events
+
+
+def plugin_add(extended, row, column, offsets):
+    """Addition of pixel (row, column), as HexitecAdditionPlugin::process_addition."""
+    maximum = (row, column)
+    for row_offset, column_offset in offsets:
+        neighbour = (row + row_offset, column + column_offset)
+        if extended[neighbour] <= 0:
+            continue
+        if extended[neighbour] >= extended[maximum]:
+            extended[neighbour] += extended[maximum]
+            extended[maximum] = 0
+            maximum = neighbour
+        else:
+            extended[maximum] += extended[neighbour]
+            extended[neighbour] = 0
+
+
+def plugin_discriminate(extended, row, column, offsets):
+    """Discrimination of pixel (row, column), as HexitecDiscriminationPlugin::process_discrimination."""
+    wipe = False
+    for row_offset, column_offset in offsets:
+        neighbour = (row + row_offset, column + column_offset)
+        if wipe:
+            extended[neighbour] = 0
+        elif extended[neighbour] > 0:
+            extended[neighbour] = 0
+            extended[row, column] = 0
+            wipe = True
+
+
+def plugin_charge_sharing(frame, pixel_grid_size, algorithm):
+    """Charge sharing, one pixel at a time as in HexitecAddition/DiscriminationPlugin."""
+    distance = pixel_grid_size // 2
+    offsets = [(row, column) for row in range(-distance, distance + 1)
+               for column in range(-distance, distance + 1) if (row, column) != (0, 0)]
+    rows, columns = frame.shape
+    extended = np.zeros((rows + 2 * distance, columns + 2 * distance), dtype=np.float32)
+    extended[distance:distance + rows, distance:distance + columns] = frame
+    for row in range(distance, distance + rows):
+        for column in range(distance, distance + columns):
+            if extended[row, column] > 0:
+                algorithm(extended, row, column, offsets)
+    return extended[distance:distance + rows, distance:distance + columns]
+
+
+class TestChargeSharing(unittest.TestCase):
+    """Unit tests for the batched addition, discrimination functions."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        rng = np.random.default_rng(1)
+        self.frames = np.zeros((4, 80, 80), dtype=np.float32)
+        events = rng.random(self.frames.shape) < 0.08
+        self.frames[events] = rng.integers(1, 1000, events.sum())
+        # Identical values exercise the >= comparison
+        self.frames[0, 10, 10:13] = 50
+
+    def test_process_addition_matches_plugin(self):
+        """Test addition of batch identical to plugin's, frame by frame."""
+        for pixel_grid_size in (3, 5):
+            expected = [plugin_charge_sharing(frame, pixel_grid_size, plugin_add) for frame in self.frames]
+            frames = process_addition(self.frames.copy(), pixel_grid_size)
+            np.testing.assert_array_equal(frames, expected)
+            # Addition only moves charge around
+            assert frames.sum() == pytest.approx(self.frames.sum())
+
+    def test_process_discrimination_matches_plugin(self):
+        """Test discrimination of batch identical to plugin's, frame by frame."""
+        for pixel_grid_size in (3, 5):
+            expected = [plugin_charge_sharing(frame, pixel_grid_size, plugin_discriminate) for frame in self.frames]
+            frames = process_discrimination(self.frames.copy(), pixel_grid_size)
+            np.testing.assert_array_equal(frames, expected)
+
+    def test_shared_events(self):
+        """Test only events with a non-zero neighbour within grid flagged."""
+        frames = np.zeros((1, 80, 80), dtype=np.float32)
+        frames[0, 0, 0] = frames[0, 0, 2] = 1
+        frames[0, 40, 40] = frames[0, 41, 41] = 1
+        frames[0, 79, 79] = 1
+        shared = shared_events(pad_frames(frames, 1), 1)[:, 1:81, 1:81]
+        assert sorted(zip(*np.nonzero(shared[0]))) == [(40, 40), (41, 41)]
+        shared = shared_events(pad_frames(frames, 2), 2)[:, 2:82, 2:82]
+        assert sorted(zip(*np.nonzero(shared[0]))) == [(0, 0), (0, 2), (40, 40), (41, 41)]
+
+    def test_process_charge_sharing_dense_frames(self):
+        """Test both algorithms still identical to plugins', when most events shared."""
+        rng = np.random.default_rng(2)
+        frames = np.zeros((2, 80, 80), dtype=np.float32)
+        events = rng.random(frames.shape) < 0.5
+        frames[events] = rng.integers(1, 20, events.sum())
+        for pixel_grid_size in (3, 5):
+            expected = [plugin_charge_sharing(frame, pixel_grid_size, plugin_add) for frame in frames]
+            np.testing.assert_array_equal(process_addition(frames.copy(), pixel_grid_size), expected)
+            expected = [plugin_charge_sharing(frame, pixel_grid_size, plugin_discriminate) for frame in frames]
+            np.testing.assert_array_equal(process_discrimination(frames.copy(), pixel_grid_size), expected)
+
+    def test_process_addition_handles_empty_frames(self):
+        """Test frames without events unchanged."""
+        frames = np.zeros((2, 80, 80), dtype=np.float32)
+        assert not process_addition(frames).any()
+
+
+class TestHexitecOffline(unittest.TestCase):
+    """Unit tests for the HexitecOffline class."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.thresholds = os.path.join(self.directory.name, "thresholds.txt")
+        np.savetxt(self.thresholds, np.full(6400, 20), fmt="%d")
+        self.gradients = os.path.join(self.directory.name, "m.txt")
+        np.savetxt(self.gradients, np.full(6400, 2.0))
+        self.intercepts = os.path.join(self.directory.name, "c.txt")
+        np.savetxt(self.intercepts, np.full(6400, 1.0))
+        self.config = {
+            "addition": {"enable": False, "pixel_grid_size": 3},
+            "calibration": {"enable": False, "gradients_filename": self.gradients,
+                            "intercepts_filename": self.intercepts},
+            "discrimination": {"enable": False, "pixel_grid_size": 3},
+            "histogram": {"bin_end": 100, "bin_start": 0, "bin_width": 10.0},
+            "summed_image": {"threshold_lower": 0, "threshold_upper": 60},
+            "threshold": {"threshold_filename": self.thresholds, "threshold_mode": "value",
+                          "threshold_value": 10}
+        }
+        self.raw_frames = np.zeros((3, 80, 80), dtype=np.uint16)
+        self.raw_frames[0, 0, 0] = 5
+        self.raw_frames[0, 40, 40] = 25
+        self.raw_frames[1, 40, 40] = 55
+        self.raw_frames[2, 79, 79] = 150
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_init(self):
+        """Test plugin chain, histogram settings follow config."""
+        self.config["calibration"]["enable"] = True
+        self.config["discrimination"]["enable"] = True
+        offline = HexitecOffline(self.config, "1x1")
+        assert offline.plugin_chain == ["reorder", "threshold", "calibration", "discrimination",
+                                        "summed_image", "histogram"]
+        assert offline.number_bins == 10
+        assert offline.spectra_bins.tolist() == [0, 10, 20, 30, 40, 50, 60, 70, 80, 90]
+        assert offline.pixel_spectra.shape == (80, 80, 10)
+
+    def test_init_rejects_bad_config(self):
+        """Test missing setting, or bad sensors layout, rejected."""
+        del self.config["threshold"]["threshold_mode"]
+        with pytest.raises(HexitecOfflineError, match="Config missing 'threshold/threshold_mode' setting"):
+            HexitecOffline(self.config, "1x1")
+        with pytest.raises(HexitecOfflineError, match="Invalid sensors layout"):
+            HexitecOffline(self.config, "bad")
+
+    def test_process(self):
+        """Test threshold value applied, summed image and histograms accumulated."""
+        offline = HexitecOffline(self.config, "1x1")
+        frames = offline.process(self.raw_frames)
+        assert frames.dtype == np.float32
+        assert frames[0, 0, 0] == 0
+        assert offline.events_in_frames == 3
+        assert offline.frames_processed == 3
+        assert offline.summed_image[40, 40] == 2
+        assert offline.summed_image.sum() == 2
+        assert offline.pixel_spectra[40, 40].tolist() == [0, 0, 1, 0, 0, 1, 0, 0, 0, 0]
+        # 150 beyond final bin
+        assert offline.summed_spectra.tolist() == [0, 0, 1, 0, 0, 1, 0, 0, 0, 0]
+
+    def test_process_threshold_file_and_calibration(self):
+        """Test per pixel thresholds, then calibration, applied."""
+        self.config["threshold"]["threshold_mode"] = "filename"
+        self.config["calibration"]["enable"] = True
+        offline = HexitecOffline(self.config, "1x1")
+        frames = offline.process(self.raw_frames)
+        assert frames[0, 40, 40] == 51
+        assert frames[1, 40, 40] == 111
+        assert np.count_nonzero(frames) == 3
+
+    def test_process_file(self):
+        """Test file reprocessed into frameProcessor's datasets."""
+        input_filename = os.path.join(self.directory.name, "run_000001.h5")
+        output_filename = os.path.join(self.directory.name, "reprocessed.h5")
+        with h5py.File(input_filename, 'w') as f:
+            f.create_dataset("raw_frames", data=self.raw_frames)
+        offline = HexitecOffline(self.config, "1x1", batch_size=2)
+        rate = offline.process_file(input_filename, output_filename, pass_processed=True)
+        assert rate > 0
+        with h5py.File(output_filename, 'r') as f:
+            assert f["processed_frames"].shape == (3, 80, 80)
+            assert f["processed_frames"][1, 40, 40] == 55
+            assert f["summed_images"].shape == (1, 80, 80)
+            assert f["summed_images"].dtype == np.uint32
+            assert f["spectra_bins"].shape == (1, 10)
+            assert f["pixel_spectra"].shape == (1, 80, 80, 10)
+            assert f["summed_spectra"].dtype == np.uint64
+            assert f["summed_spectra"][0].sum() == 2
+            assert f.attrs["frames_processed"] == 3
+        with pytest.raises(HexitecOfflineError, match="has no dataset 'processed_frames'"):
+            offline.process_file(input_filename, output_filename, dataset="processed_frames")
+
+    def test_plan_shards(self):
+        """Test shards cover each file's frames, in whole chunks."""
+        filenames = []
+        for node, chunks in enumerate([(1, 80, 80), (2, 80, 80)]):
+            filenames.append(os.path.join(self.directory.name, "run_00000%s.h5" % (node + 1)))
+            with h5py.File(filenames[-1], 'w') as f:
+                f.create_dataset("raw_frames", data=np.zeros((5, 80, 80), dtype=np.uint16), chunks=chunks)
+        shards = plan_shards(filenames, frames_per_shard=3)
+        assert shards == [(filenames[0], 0, 3), (filenames[0], 3, 5), (filenames[1], 0, 4), (filenames[1], 4, 5)]
+        with pytest.raises(HexitecOfflineError, match="has no dataset 'bad_frames'"):
+            plan_shards(filenames, "bad_frames")
+
+    def test_process_shards(self):
+        """Test worker's partial result holds its shards' results, but no coefficients."""
+        filename = os.path.join(self.directory.name, "run_000001.h5")
+        with h5py.File(filename, 'w') as f:
+            f.create_dataset("raw_frames", data=self.raw_frames, chunks=(1, 80, 80))
+        partial = process_shards(self.config, "1x1", 1000, "raw_frames", [(filename, 0, 1), (filename, 2, 3)])
+        expected = HexitecOffline(self.config, "1x1")
+        expected.process(self.raw_frames[[0, 2]])
+        assert partial.frames_processed == 2
+        assert partial.thresholds is None and partial.gradients is None and partial.intercepts is None
+        np.testing.assert_array_equal(partial.pixel_spectra, expected.pixel_spectra)
+
+    def test_merge(self):
+        """Test partial results folded, one at a time, into one."""
+        merged = HexitecOffline(self.config, "1x1")
+        for frame in self.raw_frames:
+            partial = HexitecOffline(self.config, "1x1")
+            partial.process(frame[np.newaxis])
+            assert merged.merge(partial) is merged
+        expected = HexitecOffline(self.config, "1x1")
+        expected.process(self.raw_frames)
+        assert merged.frames_processed == 3
+        np.testing.assert_array_equal(merged.summed_image, expected.summed_image)
+        np.testing.assert_array_equal(merged.pixel_spectra, expected.pixel_spectra)
+        np.testing.assert_array_equal(merged.summed_spectra, expected.summed_spectra)
+
+    def test_process_files(self):
+        """Test node files processed across worker processes, as if processed in one pass."""
+        filenames = []
+        for node in range(2):
+            filenames.append(os.path.join(self.directory.name, "run_00000%s.h5" % (node + 1)))
+            with h5py.File(filenames[-1], 'w') as f:
+                f.create_dataset("raw_frames", data=self.raw_frames, chunks=(1, 80, 80))
+        output_filename = os.path.join(self.directory.name, "reprocessed.h5")
+        offline = HexitecOffline(self.config, "1x1")
+        rate = offline.process_files(filenames, output_filename, workers=2, frames_per_shard=2)
+        assert rate > 0
+        assert offline.frames_per_second == rate
+        assert offline.frames_processed == 6
+        expected = HexitecOffline(self.config, "1x1")
+        expected.process(np.concatenate([self.raw_frames, self.raw_frames]))
+        with h5py.File(output_filename, 'r') as f:
+            np.testing.assert_array_equal(f["summed_images"][0], expected.summed_image)
+            np.testing.assert_array_equal(f["pixel_spectra"][0], expected.pixel_spectra)
+            np.testing.assert_array_equal(f["summed_spectra"][0], expected.summed_spectra)
+            assert f.attrs["frames_processed"] == 6
+
+    def test_read_coefficients_rejects_wrong_length(self):
+        """Test file of wrong number of values replaced by default values."""
+        values, read_ok = read_coefficients(self.gradients, 100, 1)
+        assert read_ok is False
+        assert values.tolist() == [1] * 100
+        values, read_ok = read_coefficients(os.path.join(self.directory.name, "missing.txt"), 4, 0)
+        assert read_ok is False
+        values, read_ok = read_coefficients(self.gradients, 6400, 1)
+        assert read_ok is True
+        assert values[0] == 2.0
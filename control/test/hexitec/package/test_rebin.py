@@ -0,0 +1,138 @@
+"""
+Test Cases for the rebinning functions in hexitec.rebin.
+
+Christian Angelsen, STFC Detector Systems Software Group
+"""
+
+import unittest
+import pytest
+import os
+import tempfile
+
+import h5py
+import numpy as np
+
+from hexitec.offline import HexitecOffline, HexitecOfflineError
+from hexitec.rebin import rebin_indices, rebin, rebin_spectra, open_block_cached
+
+
+class TestRebin(unittest.TestCase):
+    """Unit tests for the rebinning functions."""
+
+    def setUp(self):
+        """Set up test fixture for each unit test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "run_000001.h5")
+        self.spectra_bins = np.arange(0, 100, 10, dtype=np.float32)
+        rng = np.random.default_rng(0)
+        self.pixel_spectra = rng.integers(0, 5, (2, 80, 80, 10)).astype(np.float32)
+        self.summed_spectra = self.pixel_spectra.sum(axis=(1, 2)).astype(np.uint64)
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset("spectra_bins", data=self.spectra_bins[np.newaxis])
+            f.create_dataset("pixel_spectra", data=self.pixel_spectra, chunks=(1, 80, 80, 10))
+            f.create_dataset("summed_spectra", data=self.summed_spectra)
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.directory.cleanup()
+
+    def test_rebin_indices(self):
+        """Test aligned settings mapped onto stored bins."""
+        stored_bins, indices, new_bins = rebin_indices(self.spectra_bins, 0, 60, 20)
+        assert stored_bins == slice(0, 6)
+        assert indices.tolist() == [0, 2, 4]
+        assert new_bins.tolist() == [0, 20, 40]
+
+    def test_rebin_indices_rejects_unaligned_settings(self):
+        """Test settings not derivable from stored bins rejected."""
+        with pytest.raises(HexitecOfflineError, match="not a multiple of stored bin width"):
+            rebin_indices(self.spectra_bins, 0, 100, 15)
+        with pytest.raises(HexitecOfflineError, match="not a multiple of stored bin width"):
+            rebin_indices(self.spectra_bins, 0, 100, 5)
+        with pytest.raises(HexitecOfflineError, match="Bin start 20 differs from stored bin start 0"):
+            rebin_indices(self.spectra_bins, 20, 80, 20)
+        with pytest.raises(HexitecOfflineError, match="beyond stored bins' end"):
+            rebin_indices(self.spectra_bins, 0, 120, 20)
+        with pytest.raises(HexitecOfflineError, match="Cannot determine stored bin width"):
+            rebin_indices(self.spectra_bins[:1], 0, 10, 10)
+
+    def test_rebin(self):
+        """Test stored bins summed into new bins."""
+        stored_bins, indices, new_bins = rebin_indices(self.spectra_bins, 0, 60, 30)
+        assert rebin(np.arange(10), stored_bins, indices).tolist() == [0 + 1 + 2, 3 + 4 + 5]
+
+    def test_rebin_spectra_into_run_file(self):
+        """Test rebinned datasets written into run file."""
+        rebin_spectra(self.filename, 0, 100, 50, rows_per_block=7)
+        with h5py.File(self.filename, 'r') as f:
+            assert f["rebinned"].attrs["bin_width"] == 50
+            assert f["rebinned/spectra_bins"][()].tolist() == [[0, 50], [0, 50]]
+            expected = self.pixel_spectra.reshape(2, 80, 80, 2, 5).sum(axis=-1)
+            np.testing.assert_array_equal(f["rebinned/pixel_spectra"][()], expected)
+            np.testing.assert_array_equal(f["rebinned/summed_spectra"][()], expected.sum(axis=(1, 2)))
+            # Original datasets untouched
+            np.testing.assert_array_equal(f["pixel_spectra"][()], self.pixel_spectra)
+
+    def test_rebin_spectra_into_sidecar(self):
+        """Test rebinned datasets written into sidecar file, replacing any previous."""
+        sidecar = os.path.join(self.directory.name, "sidecar.h5")
+        rebin_spectra(self.filename, 0, 100, 50, sidecar)
+        rebin_spectra(self.filename, 0, 100, 20, sidecar)
+        with h5py.File(sidecar, 'r') as f:
+            assert f["rebinned/pixel_spectra"].shape == (2, 80, 80, 5)
+        with h5py.File(self.filename, 'r') as f:
+            assert "rebinned" not in f
+
+    def test_open_block_cached(self):
+        """Test chunk cache sized to the chunks a block of rows spans, not the whole dataset."""
+        with h5py.File(self.filename, 'a') as f:
+            f.create_dataset("row_chunked", data=self.pixel_spectra, chunks=(1, 8, 40, 10))
+            f.create_dataset("contiguous", data=self.pixel_spectra)
+        with h5py.File(self.filename, 'r') as f:
+            # Whole entry chunks; One chunk (80 * 80 * 10 float32s) per block
+            dataset = open_block_cached(f, "pixel_spectra", 16)
+            assert dataset.id.get_access_plist().get_chunk_cache()[1] == 80 * 80 * 10 * 4
+            np.testing.assert_array_equal(dataset[1, :16], self.pixel_spectra[1, :16])
+            # 16 rows may span three 8 row chunks, each of two columns' chunks
+            dataset = open_block_cached(f, "row_chunked", 16)
+            assert dataset.id.get_access_plist().get_chunk_cache()[1] == 3 * 2 * 8 * 40 * 10 * 4
+            assert open_block_cached(f, "contiguous", 16).chunks is None
+
+    def test_rebin_spectra_rejects_file_without_histograms(self):
+        """Test file lacking histogram datasets rejected."""
+        with h5py.File(self.filename, 'a') as f:
+            del f["pixel_spectra"]
+        with pytest.raises(HexitecOfflineError, match="has no dataset 'pixel_spectra'"):
+            rebin_spectra(self.filename, 0, 100, 50)
+
+    def test_rebin_matches_plugin_bins_counted_from_zero(self):
+        """Test rebinned run with non-zero bin start matches one processed with the new settings.
+
+        The histogram plugin (as HexitecOffline) counts bins from energy 0, not bin_start.
+        """
+        def process(bin_start, bin_end, bin_width):
+            config = {
+                "addition": {"enable": False}, "calibration": {"enable": False},
+                "discrimination": {"enable": False},
+                "histogram": {"bin_start": bin_start, "bin_end": bin_end, "bin_width": bin_width},
+                "summed_image": {"threshold_lower": 0, "threshold_upper": 4000},
+                "threshold": {"threshold_mode": "none", "threshold_value": 0}
+            }
+            offline = HexitecOffline(config, "1x1")
+            offline.process(raw_frames)
+            return offline
+
+        raw_frames = np.zeros((2, 80, 80), dtype=np.uint16)
+        raw_frames[0, 0, :8] = [3, 12, 27, 38, 45, 52, 61, 79]
+        raw_frames[1, 5, 5] = 33
+        stored = process(50, 150, 10.0)
+        with h5py.File(self.filename, 'w') as f:
+            stored.write(f)
+        rebin_spectra(self.filename, 50, 110, 20)
+        expected = process(50, 110, 20.0)
+        with h5py.File(self.filename, 'r') as f:
+            np.testing.assert_array_equal(f["rebinned/spectra_bins"][0], expected.spectra_bins)
+            np.testing.assert_array_equal(f["rebinned/pixel_spectra"][0], expected.pixel_spectra)
+            np.testing.assert_array_equal(f["rebinned/summed_spectra"][0], expected.summed_spectra)
+            # Energy 3 counted in the first bin, labelled bin_start
+            assert f["rebinned/pixel_spectra"][0, 0, 0].tolist() == [1, 0, 0]
@@ -93,6 +93,7 @@ namespace FrameReceiver
     int packet_header_size_;
 
     int current_frame_seen_;
+    int last_frame_seen_;
     int current_frame_buffer_id_;
     void* current_frame_buffer_;
     Hexitec::FrameHeader* current_frame_header_;
@@ -34,6 +34,7 @@ HexitecFrameDecoder::HexitecFrameDecoder() :
     sensors_config_(Hexitec::sensorConfigTwo),
     extended_packet_header_(true),
     current_frame_seen_(Hexitec::default_frame_number),
+    last_frame_seen_(Hexitec::default_frame_number),
     current_frame_buffer_id_(Hexitec::default_frame_number),
     current_frame_buffer_(0),
     current_frame_header_(0),
@@ -280,6 +281,12 @@ void HexitecFrameDecoder::process_packet_header(size_t bytes_received, int port,
       << " port: " << port
   );
 
+  // Highest frame number seen, so control can tell once the final frame has arrived
+  if (frame > last_frame_seen_)
+  {
+    last_frame_seen_ = frame;
+  }
+
   // Handle the packet header and frame logic
   if (frame != current_frame_seen_)
   {
@@ -561,6 +568,7 @@ void HexitecFrameDecoder::get_status(const std::string param_prefix,
 {
   status_msg.set_param(param_prefix + "name", std::string("HexitecFrameDecoder"));
   status_msg.set_param(param_prefix + "packets_lost", packets_lost_);
+  status_msg.set_param(param_prefix + "last_frame_number", last_frame_seen_);
 
   // Workaround for lack of array setters in IpcMessage
   rapidjson::Value fem_packets_lost_array(rapidjson::kArrayType);
@@ -720,5 +728,6 @@ void HexitecFrameDecoder::reset_statistics(void)
 
   // Reset the scratched and lost packet counters
   packets_lost_ = 0 ;
+  last_frame_seen_ = Hexitec::default_frame_number;
 
 }